@@ -10,11 +10,14 @@
 from .borehole import Borehole, Feature
 from .datasets import DataSet, PointDataSet, IntervalDataSet
 from .properties import Property, PropertyType
+from .storage import (BoreholeArchive, save_borehole, save_boreholes,
+                      load_borehole)
 from pysiss.borehole.siss.borehole_generator import SISSBoreholeGenerator
 from . import plotting, analysis
 
 __all__ = [Borehole, Feature,
            DataSet, PointDataSet, IntervalDataSet,
            Property, PropertyType,
+           BoreholeArchive, save_borehole, save_boreholes, load_borehole,
            SISSBoreholeGenerator,
            plotting, analysis]
@@ -7,6 +7,8 @@
     PointDataSet instance (i.e. detrending).
 """
 
+from ..datasets import PointDataSet
+
 import numpy
 import scipy.optimize
 
@@ -38,11 +40,40 @@ def _detrend_mean(data):
 
         Data is modified in place.
 
-        :param data: the one-dimensional input data
+        :param data: the input data, either one-dimensional or with one
+            column per signal
+        :type data: `numpy.array`
+        :returns: None (data modified in place)
+    """
+    data -= data.mean(axis=0)
+
+
+def _detrend_polynomial(data, degree, locations=None):
+    """ Detrend a signal by subtracting a best-fit polynomial.
+
+        The fit is a closed-form linear least-squares problem, so we can fit
+        every column of a two-dimensional array at once with a single call to
+        `numpy.linalg.lstsq` using a shared Vandermonde matrix. Data is
+        modified in place.
+
+        This function is internal to pysiss.borehole.analysis and should not
+        be called outside of it. See detrend instead.
+
+        :param data: the input data, either one-dimensional or with one
+            column per signal
         :type data: `numpy.array`
+        :param degree: the degree of the polynomial trend
+        :type degree: int
+        :param locations: the location of each row of data. Optional, defaults
+            to evenly spaced points on the unit interval.
+        :type locations: `numpy.array`
         :returns: None (data modified in place)
     """
-    data -= data.mean()
+    if locations is None:
+        locations = numpy.linspace(0, 1, len(data))
+    vander = numpy.vander(locations, degree + 1)
+    coeffs = numpy.linalg.lstsq(vander, data, rcond=-1)[0]
+    data -= numpy.dot(vander, coeffs)
 
 
 def _detrend_function(data, func, param_guess):
@@ -84,21 +115,19 @@ def _detrend_function(data, func, param_guess):
     return None
 
 
+# Degrees of the builtin polynomial trends
+POLYNOMIAL_TRENDS = {
+    'linear': 1,
+    'quadratic': 2,
+    'cubic': 3
+}
+
 BUILTIN_TRENDS = {
     'none': lambda data: None,  # Not sure why you'd use this
     'mean': _detrend_mean,
-    'linear': lambda data: _detrend_function(
-        data,
-        func=lambda b, x: b[1] * x + b[0],
-        param_guess=[1, 0]),
-    'quadratic': lambda data: _detrend_function(
-        data,
-        func=lambda b, x: b[2] * x ** 2 + b[1] * x + b[0],
-        param_guess=[1, 0, 0]),
-    'cubic': lambda data: _detrend_function(
-        data,
-        func=lambda b, x: b[3] * x ** 3 + b[2] * x ** 2 + b[1] * x + b[0],
-        param_guess=[1, 0, 0, 0])
+    'linear': lambda data: _detrend_polynomial(data, 1),
+    'quadratic': lambda data: _detrend_polynomial(data, 2),
+    'cubic': lambda data: _detrend_polynomial(data, 3)
 }
 
 
@@ -122,12 +151,20 @@ def detrend(data, trend=None, func=None, param_guess=None):
         If no extra parameters are specified, this function performs linear
         detrending.
 
-        Internally, the input data are rescaled to the unit inteval to improve
-        the detrending. This might cause a problem for cases where the range
-        of the data is very small relative to machine precision.
+        The data can be a one-dimensional array, a two-dimensional array with
+        one column per signal (i.e. depth x properties), or a PointDataSet. For
+        the builtin trends all the columns are detrended at once with a single
+        closed-form least-squares fit. For a PointDataSet all of the numeric
+        properties are detrended in place, and polynomial trends are fitted
+        against depth rather than sample number.
 
-        :param data: the one-dimensional input data
-        :type data: `numpy.array`
+        When using a custom `func`, the input data are rescaled to the unit
+        interval to improve the detrending. This might cause a problem for
+        cases where the range of the data is very small relative to machine
+        precision.
+
+        :param data: the input data
+        :type data: `numpy.array` or `pysiss.borehole.PointDataSet`
         :param trend: Optional, use a builtin trend model. One of 'none',
             'mean', 'linear', 'quadratic' or 'cubic'. Defaults to 'linear' if
             `func` is not specified.
@@ -152,11 +189,29 @@ def detrend(data, trend=None, func=None, param_guess=None):
         if param_guess is None:
             raise ValueError("You need to specify starting parameters for "
                              "your trend model.")
-        return _detrend_function(data, func, param_guess)
+
+    # If we have a dataset, we detrend all the numeric properties at once
+    locations = None
+    if isinstance(data, PointDataSet):
+        depths = data.depths
+        if len(depths) > 1:
+            locations = (depths - depths[0]) / float(depths[-1] - depths[0])
+        data = data.columns.numeric
+
+    # Custom functions need to be fit one signal at a time
+    if func is not None:
+        if data.ndim == 1:
+            return _detrend_function(data, func, param_guess)
+        for column in data.T:
+            _detrend_function(column, func, param_guess)
+        return None
 
     # If we're here, we are going to use a builtin funciton.
     default = 'linear'
     if (trend is not None) and (trend not in BUILTIN_TRENDS.keys()):
         raise ValueError("trend should be one of {0}"
                          .format(BUILTIN_TRENDS.keys()))
-    return BUILTIN_TRENDS[trend or default](data)
+    trend = trend or default
+    if locations is not None and trend in POLYNOMIAL_TRENDS:
+        return _detrend_polynomial(data, POLYNOMIAL_TRENDS[trend], locations)
+    return BUILTIN_TRENDS[trend](data)
@@ -161,10 +161,25 @@ class Borehole(id_object):
         """
         raise NotImplementedError
 
-    def add_merged_interval_dataset(self, name, source_name_a, source_name_b):
-        """ Add a new merged interval dataset from the two sources
+    def add_merged_interval_dataset(self, name, source_name_a, source_name_b,
+                                    *source_names):
+        """ Add and return a new IntervalDataSet merged from the sources.
+
+            The new dataset has intervals whose boundaries are the union of the
+            boundaries of the source IntervalDataSets, and carries the
+            properties of all the sources. Any number of sources can be merged
+            at once. See `pysiss.borehole.IntervalDataSet.merge` for details.
+
+            :param name: The identifier for the new IntervalDataSet
+            :type name: `string`
+            :param source_name_a, source_name_b, *source_names: The names of
+                the interval datasets to merge
+            :type source_name_a, source_name_b, *source_names: `string`
+            :returns: the new `pysiss.borehole.IntervalDataSet` instance.
         """
-        raise NotImplementedError
+        sources = [self.interval_datasets[source_name] for source_name
+                   in (source_name_a, source_name_b) + source_names]
+        return self.add_dataset(IntervalDataSet.merge(name, sources))
 
     def add_detail(self, name, values, property_type=None):
         """ Add a detail to this borehole object.
@@ -6,6 +6,9 @@
     description: Imports for pyborholes.datasets
 """
 
+from .column_store import ColumnStore
 from .dataset import DataSet
 from .point_dataset import PointDataSet
 from .interval_dataset import IntervalDataSet
+from .interval_index import IntervalIndex
+from .gap_tracker import GapTracker
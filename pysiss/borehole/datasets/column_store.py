@@ -0,0 +1,349 @@
+""" file:   column_store.py (pysiss.borehole.datasets)
+
+    description: Columnar backing store for the properties on a DataSet.
+
+    A ColumnStore keeps every numeric property defined on a dataset in a single
+    two-dimensional float block, and every categorical property in a second
+    object block. Columns are laid out contiguously (Fortran order) so that a
+    Property is just a cheap view onto its column, while whole-dataset
+    operations like slicing, resampling and exporting are single vectorized
+    operations on the blocks.
+"""
+
+import numpy
+
+
+class ColumnStore(object):
+
+    """ Columnar storage for the values of the properties on a dataset.
+
+        Numeric values are stored as floats in `numeric`, anything which
+        can't be converted to a one-dimensional float array (strings,
+        multivalued categories etc) is stored as objects in `categorical`.
+
+        Some important properties are:
+            numeric - a (size x n_numeric) float array of numeric values
+            categorical - a (size x n_categorical) object array of other
+                values
+            numeric_names - the property names for the numeric columns
+            categorical_names - the property names for the categorical
+                columns
+
+        :param size: The number of values in each column
+        :type size: int
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.numeric_names = []
+        self.categorical_names = []
+        self._numeric = numpy.empty((size, 0), dtype=float, order='F')
+        self._categorical = numpy.empty((size, 0), dtype=object, order='F')
+
+    def __repr__(self):
+        info = 'ColumnStore: {0} numeric and {1} categorical columns of ' \
+               'size {2}'
+        return info.format(len(self.numeric_names),
+                           len(self.categorical_names), self.size)
+
+    def __contains__(self, name):
+        return name in self.numeric_names or name in self.categorical_names
+
+    def __len__(self):
+        return len(self.numeric_names) + len(self.categorical_names)
+
+    @classmethod
+    def from_blocks(cls, numeric=None, numeric_names=None,
+                    categorical=None, categorical_names=None):
+        """ Make a new ColumnStore which wraps existing blocks of values.
+
+            The blocks are used as-is without copying, so they can be views
+            into other arrays or memory-mapped files.
+
+            :param numeric: The numeric values, with one column per property
+            :type numeric: two-dimensional `numpy.ndarray` of floats
+            :param numeric_names: The property names for each numeric column
+            :type numeric_names: list of strings
+            :param categorical: The categorical values, with one column per
+                property
+            :type categorical: two-dimensional `numpy.ndarray` of objects
+            :param categorical_names: The property names for each categorical
+                column
+            :type categorical_names: list of strings
+            :returns: the new ColumnStore instance
+        """
+        if numeric is None and categorical is None:
+            raise ValueError('You need to specify at least one block')
+        size = len(numeric if numeric is not None else categorical)
+        store = cls(size)
+        if numeric is not None:
+            assert numeric.ndim == 2 and len(numeric) == size, \
+                "numeric block must be two-dimensional with size rows"
+            assert numeric.shape[1] == len(numeric_names), \
+                "need one name for each numeric column"
+            store._numeric = numeric
+            store.numeric_names = list(numeric_names)
+        if categorical is not None:
+            assert categorical.ndim == 2 and len(categorical) == size, \
+                "categorical block must be two-dimensional with size rows"
+            assert categorical.shape[1] == len(categorical_names), \
+                "need one name for each categorical column"
+            store._categorical = categorical
+            store.categorical_names = list(categorical_names)
+        return store
+
+    @classmethod
+    def concatenate(cls, stores):
+        """ Join the columns of several stores into a new ColumnStore.
+
+            All of the stores must have the same size and different column
+            names.
+
+            :param stores: The stores to join
+            :type stores: list of ColumnStore instances
+            :returns: the new ColumnStore instance
+        """
+        names = sum((store.names for store in stores), [])
+        assert len(set(names)) == len(names), \
+            "stores must not share any column names"
+        return cls.from_blocks(
+            numpy.asfortranarray(
+                numpy.hstack([store.numeric for store in stores])),
+            sum((store.numeric_names for store in stores), []),
+            numpy.asfortranarray(
+                numpy.hstack([store.categorical for store in stores])),
+            sum((store.categorical_names for store in stores), []))
+
+    @property
+    def numeric(self):
+        """ Return the block of numeric values
+        """
+        return self._numeric[:self.size, :len(self.numeric_names)]
+
+    @property
+    def categorical(self):
+        """ Return the block of categorical values
+        """
+        return self._categorical[:self.size, :len(self.categorical_names)]
+
+    @property
+    def names(self):
+        """ Return the names of all the columns in the store
+        """
+        return self.numeric_names + self.categorical_names
+
+    def isnumeric(self, name):
+        """ Return whether the given column is stored as numeric data
+        """
+        if name in self.numeric_names:
+            return True
+        elif name in self.categorical_names:
+            return False
+        raise KeyError('Unknown column {0}'.format(name))
+
+    def column(self, name):
+        """ Return a view of the values for the given column
+
+            :param name: The name of the column
+            :type name: string
+        """
+        if self.isnumeric(name):
+            idx = self.numeric_names.index(name)
+            return self._numeric[:self.size, idx]
+        else:
+            idx = self.categorical_names.index(name)
+            return self._categorical[:self.size, idx]
+
+    def add(self, name, values, numeric=True):
+        """ Add a new column, replacing any existing column of the same name.
+
+            If numeric is True we try to store the values as floats in the
+            numeric block; if that fails (or numeric is False) the values are
+            stored in the categorical block instead.
+
+            :param name: The name of the column
+            :type name: string
+            :param values: The values to store
+            :type values: iterable of length `size`
+            :param numeric: Whether to try to store the values as numbers
+            :type numeric: bool
+        """
+        assert len(values) == self.size, \
+            "values must have the same number of elements as the store"
+        if numeric:
+            try:
+                values = numpy.asarray(values, dtype=float)
+                numeric = (values.ndim == 1)
+            except (TypeError, ValueError):
+                numeric = False
+
+        # Clear out any old column with the same name
+        if name in self:
+            if self.isnumeric(name) == numeric:
+                self.column(name)[:] = values if numeric \
+                    else _object_column(values)
+                return
+            self.remove(name)
+
+        # Add the new column to the relevant block
+        if numeric:
+            self._numeric = _reserve(self._numeric, len(self.numeric_names))
+            self._numeric[:self.size, len(self.numeric_names)] = values
+            self.numeric_names.append(name)
+        else:
+            self._categorical = _reserve(self._categorical,
+                                         len(self.categorical_names))
+            self._categorical[:self.size, len(self.categorical_names)] = \
+                _object_column(values)
+            self.categorical_names.append(name)
+
+    def extend(self, values, nrows):
+        """ Append rows to the end of every column.
+
+            Space for new rows is reserved by doubling the number of rows in
+            each block whenever we run out, so appending k rows in batches
+            costs O(k) row copies overall.
+
+            :param values: The new values for each column, keyed by column
+                name. Every column must be given.
+            :type values: dict of iterables of length nrows
+            :param nrows: The number of rows to append
+            :type nrows: int
+        """
+        if set(values) != set(self.names):
+            raise KeyError(
+                'Need new values for exactly the columns {0}, got '
+                '{1}'.format(sorted(self.names), sorted(values)))
+        for name, column_values in values.items():
+            assert len(column_values) == nrows, \
+                "values for column {0} must have nrows elements".format(name)
+
+        # Make sure there's room and copy the new values in
+        rows = slice(self.size, self.size + nrows)
+        self._numeric = _reserve_rows(self._numeric, self.size, nrows)
+        self._categorical = _reserve_rows(self._categorical, self.size,
+                                          nrows)
+        for idx, name in enumerate(self.numeric_names):
+            self._numeric[rows, idx] = numpy.asarray(values[name],
+                                                     dtype=float)
+        for idx, name in enumerate(self.categorical_names):
+            self._categorical[rows, idx] = _object_column(values[name])
+        self.size += nrows
+
+    def remove(self, name):
+        """ Remove the given column from the store
+        """
+        if self.isnumeric(name):
+            idx = self.numeric_names.index(name)
+            self._numeric = numpy.delete(self.numeric, idx, axis=1)
+            self.numeric_names.pop(idx)
+        else:
+            idx = self.categorical_names.index(name)
+            self._categorical = numpy.delete(self.categorical, idx, axis=1)
+            self.categorical_names.pop(idx)
+
+    def take(self, index):
+        """ Return a new ColumnStore with the given rows
+
+            If index is a slice then the new store is a view onto this one
+            and no values are copied.
+
+            :param index: The rows to select
+            :type index: slice or array of integers
+            :returns: a new ColumnStore instance
+        """
+        if isinstance(index, slice):
+            numeric = self.numeric[index]
+            categorical = self.categorical[index]
+        else:
+            numeric = _take_rows(self.numeric, index)
+            categorical = _take_rows(self.categorical, index)
+        return ColumnStore.from_blocks(numeric, self.numeric_names,
+                                       categorical, self.categorical_names)
+
+    def reindex(self, indices):
+        """ Return a new ColumnStore with the given rows, where a negative
+            index denotes a missing row.
+
+            Missing rows are filled with NaN in the numeric block and None in
+            the categorical block.
+
+            :param indices: The rows to select
+            :type indices: array of integers
+            :returns: a new ColumnStore instance
+        """
+        indices = numpy.asarray(indices, dtype=int)
+        missing = indices < 0
+        store = self.take(numpy.where(missing, 0, indices))
+        store.numeric[missing] = numpy.nan
+        store.categorical[missing] = None
+        return store
+
+    def rename(self, mapping):
+        """ Rename columns in place
+
+            :param mapping: Maps old column names to new names. Columns which
+                aren't in the mapping keep their names.
+            :type mapping: dict
+        """
+        self.numeric_names = [mapping.get(n, n) for n in self.numeric_names]
+        self.categorical_names = [mapping.get(n, n)
+                                  for n in self.categorical_names]
+
+    def copy(self):
+        """ Return a copy of the ColumnStore with its own data
+        """
+        return ColumnStore.from_blocks(
+            numpy.array(self.numeric, order='F'), self.numeric_names,
+            numpy.array(self.categorical, order='F'), self.categorical_names)
+
+
+def _reserve(block, ncols):
+    """ Make sure there is room for another column in the given block,
+        growing the block if required.
+
+        We double the number of columns each time we run out of space so that
+        adding k columns one at a time only costs O(k) column copies.
+    """
+    if block.shape[1] > ncols:
+        return block
+    new_block = numpy.empty((block.shape[0], max(4, 2 * ncols)),
+                            dtype=block.dtype, order='F')
+    new_block[:, :ncols] = block[:, :ncols]
+    return new_block
+
+
+def _reserve_rows(block, size, nrows):
+    """ Make sure there is room for another nrows rows after the first size
+        rows in the given block, growing the block if required.
+    """
+    if block.shape[0] >= size + nrows:
+        return block
+    new_block = numpy.empty((max(2 * block.shape[0], size + nrows),
+                             block.shape[1]), dtype=block.dtype, order='F')
+    new_block[:size] = block[:size]
+    return new_block
+
+
+def _take_rows(block, index):
+    """ Select rows from a block into a new column-contiguous block
+    """
+    index = numpy.asarray(index, dtype=int)
+    result = numpy.empty((len(index), block.shape[1]),
+                         dtype=block.dtype, order='F')
+    return numpy.take(block, index, axis=0, out=result)
+
+
+def _object_column(values):
+    """ Convert values into a one-dimensional object array
+
+        We can't just use numpy.asarray here since sequence values (e.g.
+        multivalued categories) would get turned into extra dimensions.
+    """
+    column = numpy.empty(len(values), dtype=object)
+    try:
+        column[:] = values
+    except ValueError:
+        for idx, value in enumerate(values):
+            column[idx] = value
+    return column
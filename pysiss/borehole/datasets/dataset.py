@@ -9,10 +9,13 @@
     or all the dataset data types; it should not be instantiated by users.
 """
 
+from .column_store import ColumnStore
 from ..properties import Property
 from ..details import Details, detail_type
 from ...utilities import id_object
 
+import pandas
+
 
 class DataSet(id_object):
 
@@ -22,6 +25,7 @@ class DataSet(id_object):
 
         Some important properties are:
             properties - dict mapping property name to Property
+            columns - the ColumnStore holding the values of all properties
             size - the size of all the values sequences
             name - an identifier
             subdatasets - a list of subdataset locations
@@ -39,6 +43,7 @@ class DataSet(id_object):
     def __init__(self, name, size, details=None):
         assert size > 0, "dataset must have at least one element"
         self.properties = dict()
+        self.columns = ColumnStore(size)
         self.size = size  # size of all values sequences
         self.name = name
         self.subdatasets = None
@@ -50,7 +55,10 @@ class DataSet(id_object):
         """
         assert self.size == len(values), ("values must have the same number "
                                           "of elements as the dataset")
-        self.properties[property_type.name] = Property(property_type, values)
+        self.columns.add(property_type.name, values,
+                         numeric=property_type.isnumeric)
+        self.properties[property_type.name] = \
+            Property(property_type, store=self.columns)
         return self.properties[property_type.name]
 
     def get_property_names(self):
@@ -63,6 +71,48 @@ class DataSet(id_object):
         """
         raise NotImplemented
 
+    def get_property_types(self):
+        """ Return a dict mapping property names to the PropertyTypes of the
+            properties defined over this dataset
+        """
+        return dict((name, prop.property_type)
+                    for name, prop in self.properties.items())
+
+    def _set_columns(self, columns, property_types):
+        """ Use the given ColumnStore as the backing store for this dataset.
+
+            :param columns: The new store of values
+            :type columns: pysiss.borehole.datasets.ColumnStore
+            :param property_types: The property types for the columns, keyed
+                by column name. Columns without a property type are ignored.
+            :type property_types: dict
+        """
+        assert columns.size == self.size, \
+            "columns must have the same number of elements as the dataset"
+        self.columns = columns
+        self.properties = dict(
+            (name, Property(property_types[name], store=columns))
+            for name in columns.names if name in property_types)
+
+    def _columns_to_dataframe(self, index, columns=None):
+        """ Make a dataframe from a column store (defaulting to the dataset's
+            columns) with the given index
+        """
+        if columns is None:
+            columns = self.columns
+        frames = []
+        if columns.numeric_names:
+            frames.append(pandas.DataFrame(columns.numeric, index=index,
+                                           columns=columns.numeric_names))
+        if columns.categorical_names:
+            frames.append(pandas.DataFrame(columns.categorical, index=index,
+                                           columns=columns.categorical_names))
+        if len(frames) == 1:
+            return frames[0]
+        elif len(frames) == 0:
+            return pandas.DataFrame(index=index)
+        return pandas.concat(frames, axis=1)
+
 
 class DatasetDetails(Details):
 
@@ -0,0 +1,134 @@
+""" file:   gap_tracker.py (pysiss.borehole.datasets)
+
+    description: Incremental gap detection for PointDataSets which grow over
+        time.
+
+    `PointDataSet.split_at_gaps` finds gaps where the sample spacing is more
+    than some threshold times the median spacing. Recomputing this from
+    scratch every time a batch of samples is appended costs O(N) per batch,
+    so instead a GapTracker keeps a running median of the spacings in two
+    heaps, and a short list of candidate gaps: the spacings which are big
+    enough that they might become gaps as the median changes. Only the
+    candidates need to be checked after each batch. The candidates are
+    rebuilt from scratch only if the median drops far enough that a spacing
+    which was not a candidate could now be a gap.
+"""
+
+import heapq
+import numpy
+
+
+class GapTracker(object):
+
+    """ Track the gaps in a growing sequence of depths.
+
+        A gap is a spacing between consecutive depths which is greater than
+        threshold times the median spacing.
+
+        :param threshold: The gap threshold, as a multiple of the median
+            sample spacing. Optional, defaults to 10.
+        :type threshold: float
+        :param slack: Spacings greater than slack * threshold times the median
+            are kept as candidate gaps. Smaller values make rebuilds rarer but
+            keep more candidates. Optional, defaults to 0.5.
+        :type slack: float
+    """
+
+    def __init__(self, threshold=10, slack=0.5):
+        assert 0 < slack <= 1, "slack must be between 0 and 1"
+        self.threshold = threshold
+        self.slack = slack
+        self.size = 0
+        self._lower = []    # max-heap (negated) of the smaller spacings
+        self._upper = []    # min-heap of the larger spacings
+        self._floor = None  # spacings above this are candidates
+        self._candidates = []
+        self._candidate_spacings = []
+
+    def __repr__(self):
+        info = 'GapTracker: {0} depths with median spacing {1}'
+        return info.format(self.size, self.median)
+
+    @property
+    def median(self):
+        """ Return the median spacing between depths
+        """
+        if not self._lower:
+            return numpy.nan
+        elif len(self._lower) > len(self._upper):
+            return -self._lower[0]
+        return (self._upper[0] - self._lower[0]) / 2.
+
+    def update(self, depths):
+        """ Update the tracker with any depths added since the last update
+
+            This takes O(k log N) time for k new depths, plus the cost of
+            checking the candidate gaps.
+
+            :param depths: All of the depths seen so far, in increasing order.
+                The first `size` depths must be the same as in the last
+                update.
+            :type depths: `numpy.ndarray`
+        """
+        if len(depths) <= self.size:
+            return
+        start = max(self.size - 1, 0)
+        spacings = numpy.diff(depths[start:])
+        if self.size == 0:
+            self._build_heaps(spacings)
+        else:
+            for spacing in spacings:
+                self._push(spacing)
+        self.size = len(depths)
+
+        # Check whether our candidates are still valid
+        if self._floor is None \
+                or not self.threshold * self.median >= self._floor:
+            self._build_candidates(depths)
+        else:
+            new = numpy.flatnonzero(spacings > self._floor)
+            self._candidates.extend(start + new)
+            self._candidate_spacings.extend(spacings[new])
+
+    def gap_indices(self):
+        """ Return the indices i such that the spacing between depths[i]
+            and depths[i + 1] is a gap
+        """
+        if not self._candidates:
+            return numpy.array([], dtype=int)
+        candidates = numpy.asarray(self._candidates, dtype=int)
+        spacings = numpy.asarray(self._candidate_spacings)
+        return candidates[spacings > self.threshold * self.median]
+
+    def _build_heaps(self, spacings):
+        """ Initialize the heaps with an array of spacings
+        """
+        spacings = numpy.sort(spacings)
+        split = (len(spacings) + 1) // 2
+        self._lower = list(-spacings[:split][::-1])
+        self._upper = list(spacings[split:])
+        heapq.heapify(self._lower)
+        heapq.heapify(self._upper)
+
+    def _push(self, spacing):
+        """ Add a spacing to the heaps, keeping them balanced so that the
+            median is at the top of the lower heap (or halfway between the
+            tops of both heaps)
+        """
+        if self._lower and spacing > -self._lower[0]:
+            heapq.heappush(self._upper, spacing)
+        else:
+            heapq.heappush(self._lower, -spacing)
+        if len(self._lower) > len(self._upper) + 1:
+            heapq.heappush(self._upper, -heapq.heappop(self._lower))
+        elif len(self._upper) > len(self._lower):
+            heapq.heappush(self._lower, -heapq.heappop(self._upper))
+
+    def _build_candidates(self, depths):
+        """ Rebuild the list of candidate gaps using the current median
+        """
+        self._floor = self.slack * self.threshold * self.median
+        spacings = numpy.diff(depths)
+        candidates = numpy.flatnonzero(spacings > self._floor)
+        self._candidates = list(candidates)
+        self._candidate_spacings = list(spacings[candidates])
@@ -18,10 +18,12 @@
 """
 
 from .dataset import DataSet
+from .column_store import ColumnStore
 from .point_dataset import PointDataSet
+from .interval_index import IntervalIndex
+from ..properties import PropertyType
 
 import numpy
-import pandas
 
 
 class IntervalDataSet(DataSet):
@@ -38,7 +40,9 @@ class IntervalDataSet(DataSet):
         PointDataSet.
 
         Intervals must be in depth order and not overlap, but there might
-        be gaps between intervals.
+        be gaps between intervals. The `index` attribute is an IntervalIndex
+        which can be used to look up which interval contains a given depth,
+        or which intervals overlap a given depth range.
 
         :param name: identifier for the dataSet
         :type name: string
@@ -51,25 +55,104 @@ class IntervalDataSet(DataSet):
         :param details: The metadata associated with the dataset. Optional,
             defaults to None.
         :type details: pysiss.borehole.dataset.DatasetDetails
+        :param trusted: If True, the intervals are assumed to be sorted and
+            non-overlapping already and are not checked. Optional, defaults
+            to False.
+        :type trusted: bool
     """
 
-    def __init__(self, name, from_depths, to_depths, details=None):
+    def __init__(self, name, from_depths, to_depths, details=None,
+                 trusted=False):
         super(IntervalDataSet, self).__init__(
             name, len(from_depths), details=details)
         from_depths = numpy.asarray(from_depths)
         to_depths = numpy.asarray(to_depths)
         assert len(from_depths) == len(to_depths), \
             "from_ and to_depths must be same length"
-        assert all(numpy.diff(from_depths) > 0), \
-            "from_depths must be monotonically increasing"
-        assert all(numpy.diff(to_depths) > 0), \
-            "to_depths must be monotonically increasing"
-        assert all(to_depths - from_depths > 0), \
-            "intervals must have positive length"
-        assert all(to_depths[:-1] <= from_depths[1:]), \
-            "intervals must not overlap"
+        if not trusted:
+            assert all(numpy.diff(from_depths) > 0), \
+                "from_depths must be monotonically increasing"
+            assert all(numpy.diff(to_depths) > 0), \
+                "to_depths must be monotonically increasing"
+            assert all(to_depths - from_depths > 0), \
+                "intervals must have positive length"
+            assert all(to_depths[:-1] <= from_depths[1:]), \
+                "intervals must not overlap"
         self.from_depths = from_depths
         self.to_depths = to_depths
+        self.index = IntervalIndex(from_depths, to_depths)
+
+    @classmethod
+    def merge(cls, name, datasets, details=None):
+        """ Merge several IntervalDataSets into a new IntervalDataSet
+
+            The new dataset has intervals whose boundaries are the union of the
+            boundaries of the source datasets, and carries the properties of
+            all of the sources mapped onto these refined intervals. Where a
+            source doesn't cover a refined interval its values are missing
+            (NaN for numeric properties, None for categorical properties).
+            Parts of the borehole which aren't covered by any of the sources
+            are left as gaps.
+
+            If more than one source has a property with the same name, the
+            later properties are renamed to '<dataset name>: <property name>'.
+
+            Each source's boundaries are already sorted, so we merge them with
+            a single stable sort over the presorted runs, and map each source
+            onto the refined intervals with one vectorized index lookup.
+
+            :param name: The identifier for the new dataset
+            :type name: string
+            :param datasets: The datasets to merge
+            :type datasets: list of IntervalDataSet instances
+            :param details: The metadata associated with the dataset.
+                Optional, defaults to None.
+            :type details: pysiss.borehole.dataset.DatasetDetails
+            :returns: the new IntervalDataSet instance
+        """
+        if len(datasets) == 0:
+            raise ValueError('You need at least one dataset to merge')
+
+        # Merge boundaries. Each dataset's boundaries are already in order
+        # since its intervals don't overlap.
+        boundaries = numpy.concatenate([
+            numpy.column_stack((d.from_depths, d.to_depths)).ravel()
+            for d in datasets])
+        boundaries.sort(kind='mergesort')
+        boundaries = boundaries[numpy.concatenate(
+            ([True], boundaries[1:] > boundaries[:-1]))]
+
+        # Find the source interval for each refined interval, dropping refined
+        # intervals which aren't covered by any of the sources
+        midpoints = (boundaries[:-1] + boundaries[1:]) / 2.
+        indices = [d.index.lookup(midpoints) for d in datasets]
+        covered = numpy.any([idx >= 0 for idx in indices], axis=0)
+        merged = cls(name, boundaries[:-1][covered], boundaries[1:][covered],
+                     details=details, trusted=True)
+
+        # Map the properties from each source onto the refined intervals
+        stores, property_types = [], {}
+        for dataset, idx in zip(datasets, indices):
+            store = dataset.columns.reindex(idx[covered])
+            source_types = dataset.get_property_types()
+            renamed = {}
+            for pname in store.names:
+                ptype = source_types.get(pname)
+                if pname in property_types:
+                    renamed[pname] = '{0}: {1}'.format(dataset.name, pname)
+                    if ptype is not None:
+                        ptype = PropertyType(
+                            name=renamed[pname], long_name=ptype.long_name,
+                            description=ptype.description, units=ptype.units,
+                            isnumeric=ptype.isnumeric,
+                            detection_limit=ptype.detection_limit)
+                property_types[renamed.get(pname, pname)] = ptype
+            store.rename(renamed)
+            stores.append(store)
+        merged._set_columns(
+            ColumnStore.concatenate(stores),
+            dict((k, v) for k, v in property_types.items() if v is not None))
+        return merged
 
     def __repr__(self):
         info = 'IntervalDataSet {0}: with {1} depth intervals and {2} '\
@@ -81,28 +164,32 @@ class IntervalDataSet(DataSet):
         """ Return the data between the given depths as as new IntervalDataSet
 
             Only intervals completely contained by the from_depth/to_depth
-            interval are returned.
+            interval are returned. Since the intervals are sorted these are
+            always a contiguous slice, so the new dataset is a view onto this
+            one and no data is copied. This means that modifying the values in
+            the new dataset will also modify them here.
         """
         # Specify a name if not already passed
         if dataset_name is None:
             dataset_name = '{0}: subdataset {1} to {2}'.format(
                 self.name, from_depth, to_depth)
 
-        # Select a data mask
-        indices = numpy.where(
-            numpy.logical_and(self.from_depths >= from_depth,
-                              self.to_depths <= to_depth))
-
         # Generate a new IntervalDataSet
+        window = self.get_interval_slice(from_depth, to_depth)
         newdom = IntervalDataSet(dataset_name,
-                                 self.from_depths[indices],
-                                 self.to_depths[indices])
-        for prop in self.properties.values():
-            newdom.add_property(
-                property_type=prop.property_type,
-                values=prop.values[indices])
+                                 self.from_depths[window],
+                                 self.to_depths[window],
+                                 trusted=True)
+        newdom._set_columns(self.columns.take(window),
+                            self.get_property_types())
         return newdom
 
+    def get_interval_slice(self, from_depth, to_depth):
+        """ Returns a slice selecting the intervals which are completely
+            contained by the given interval
+        """
+        return self.index.contained(from_depth, to_depth)
+
     def split_at_gaps(self):
         """ Split a dataset by finding significant gaps in the dataset.
 
@@ -136,7 +223,98 @@ class IntervalDataSet(DataSet):
                 self.to_depths[gap_indices[idx + 1]]))
         return self.subdatasets, self.gaps
 
-    def to_point_dataset(self, name=None, depths='midpoint'):
+    def composite(self, interval=1., from_depth=None, to_depth=None,
+                  min_coverage=0., dataset_name=None):
+        """ Composite the numeric properties onto regular intervals
+
+            Each new interval takes the length-weighted mean of the values in
+            the source intervals which overlap it, so partial overlaps only
+            count for the overlapping length. Gaps and missing (NaN) values
+            don't count towards the mean.
+
+            The composite is calculated for all the numeric properties at once
+            using cumulative sums of value times length down the hole, so it
+            costs one pass over the data plus one binary search per new
+            boundary. Categorical properties can't be averaged and are not
+            included in the new dataset.
+
+            :param interval: The length of the new intervals. Optional,
+                defaults to 1 metre.
+            :type interval: float
+            :param from_depth/to_depth: The depth range to composite over.
+                Optional, defaults to the range of this dataset. If the range
+                isn't a multiple of the interval length then the last interval
+                is shorter than the rest.
+            :type from_depth/to_depth: float
+            :param min_coverage: The minimum fraction of each new interval
+                which must be covered by (non-missing) source values. Values
+                for intervals with less coverage are set to NaN. Optional,
+                defaults to 0 (i.e. any overlap is enough).
+            :type min_coverage: float
+            :param dataset_name: The identifier for the new dataset. Optional,
+                defaults to "<current name> composited".
+            :type dataset_name: string
+            :returns: the new IntervalDataSet instance
+        """
+        # Specify name & range if not already passed
+        if dataset_name is None:
+            dataset_name = '{0} composited'.format(self.name)
+        if from_depth is None:
+            from_depth = self.from_depths[0]
+        if to_depth is None:
+            to_depth = self.to_depths[-1]
+        assert interval > 0, "interval length must be positive"
+        assert to_depth > from_depth, "to_depth must be below from_depth"
+
+        # Generate the new boundaries
+        nintervals = int(numpy.ceil((to_depth - from_depth) / float(interval)
+                                    - 1e-9))
+        boundaries = from_depth + interval * numpy.arange(nintervals + 1)
+        boundaries[-1] = to_depth
+
+        # Cumulative sums of value * length (and covered length) down the
+        # hole at each source interval's from depth
+        values = self.columns.numeric
+        valid = ~numpy.isnan(values)
+        values = numpy.where(valid, values, 0)
+        lengths = (self.to_depths - self.from_depths)[:, numpy.newaxis]
+        nprops = values.shape[1]
+        totals = numpy.zeros((len(lengths) + 1, nprops))
+        numpy.cumsum(values * lengths, axis=0, out=totals[1:])
+        covered = numpy.zeros((len(lengths) + 1, nprops))
+        numpy.cumsum(valid * lengths, axis=0, out=covered[1:])
+
+        # Evaluate the integrals at the new boundaries by adding the partial
+        # contribution from the source interval containing each boundary
+        idx = numpy.searchsorted(self.from_depths, boundaries,
+                                 side='right') - 1
+        inside = numpy.clip(idx, 0, len(lengths) - 1)
+        partial = numpy.clip(boundaries - self.from_depths[inside],
+                             0, lengths[inside, 0])
+        partial[idx < 0] = 0
+        partial = partial[:, numpy.newaxis]
+        totals = totals[inside] + values[inside] * partial
+        covered = covered[inside] + valid[inside] * partial
+
+        # Take differences to get the weighted means in each new interval
+        totals = numpy.diff(totals, axis=0)
+        covered = numpy.diff(covered, axis=0)
+        coverage = covered / numpy.diff(boundaries)[:, numpy.newaxis]
+        with numpy.errstate(invalid='ignore', divide='ignore'):
+            composited = totals / covered
+        composited[(covered <= 0) | (coverage < min_coverage)] = numpy.nan
+
+        # Generate a new dataset
+        newdom = IntervalDataSet(dataset_name, boundaries[:-1],
+                                 boundaries[1:], trusted=True)
+        newdom._set_columns(
+            ColumnStore.from_blocks(numpy.asfortranarray(composited),
+                                    self.columns.numeric_names),
+            self.get_property_types())
+        return newdom
+
+    def to_point_dataset(self, name=None, depths='midpoint',
+                         fill_value=numpy.nan):
         """ Convert an IntervalDataSet to a PointDataSet
 
             Uses the specified method to recalculate the depths of the
@@ -148,16 +326,40 @@ class IntervalDataSet(DataSet):
                 'from': Uses the upper depth of the sampled interval
                 'to': Uses the lower depths of the sampled interval
 
+            Alternatively you can pass an array of depths (or an existing
+            PointDataSet) to project the interval values onto those depths.
+            Each depth takes the values of the interval containing it (see
+            `IntervalIndex.lookup`), and depths which lie in gaps or outside
+            the intervals get `fill_value` for numeric properties and None for
+            categorical properties.
+
             :param name: The identifier for the new dataset. Optional, defaults
                 to the same name as the interval dataset.
             :type name: string
-            :param depths: the depth converter to use
+            :param depths: the depth converter to use, or the depths to project
+                the data onto
+            :type depths: string, iterable of floats or PointDataSet
+            :param fill_value: The value to use for numeric properties at
+                depths which aren't in any interval. Optional, defaults to NaN.
+            :type fill_value: float
             :returns: the new PointDataSet instance
         """
         # Generate name
         if name is None:
             name = self.name
 
+        # Project onto arbitrary depths if required
+        if isinstance(depths, PointDataSet):
+            depths = depths.depths
+        if not isinstance(depths, basestring):
+            depths = numpy.asarray(depths)
+            indices = self.index.lookup(depths)
+            columns = self.columns.reindex(indices)
+            columns.numeric[indices < 0] = fill_value
+            sdom = PointDataSet(name=name, depths=depths)
+            sdom._set_columns(columns, self.get_property_types())
+            return sdom
+
         # Generate new depths
         if depths == 'midpoint':
             depths = (self.from_depths + self.to_depths) / 2.
@@ -171,13 +373,11 @@ class IntervalDataSet(DataSet):
 
         # Generate new dataset
         sdom = PointDataSet(name=name, depths=depths)
-        sdom.properties = self.properties.copy()
+        sdom._set_columns(self.columns.copy(), self.get_property_types())
         return sdom
 
     def to_dataframe(self):
         """ Tranform the data in the dataset into a Pandas dataframe.
         """
-        return pandas.DataFrame(
-            data=dict(((k, self.properties[k].values)
-                       for k in self.properties.keys())),
+        return self._columns_to_dataframe(
             index=zip(self.from_depths, self.to_depths))
@@ -0,0 +1,117 @@
+""" file:   interval_index.py (pysiss.borehole.datasets)
+
+    description: Fast point and range queries over sorted, non-overlapping
+        intervals.
+
+    Since the intervals in an IntervalDataSet are sorted and don't overlap,
+    both the from depths and the to depths are sorted arrays, so every query
+    can be answered with a binary search using `numpy.searchsorted`. All of
+    the queries here are vectorized, so that you can look up millions of
+    depths without any Python loops.
+"""
+
+import numpy
+
+
+class IntervalIndex(object):
+
+    """ Index for looking up sorted, non-overlapping intervals.
+
+        Intervals are treated as half-open, so that a depth lying on the
+        boundary between two touching intervals belongs to the lower
+        interval. The exception is an interval with no interval directly
+        below it, which also contains its to depth.
+
+        :param from_depths: interval start point down-hole depths
+        :type from_depths: `numpy.ndarray`
+        :param to_depths: interval end point down-hole depths
+        :type to_depths: `numpy.ndarray`
+    """
+
+    def __init__(self, from_depths, to_depths):
+        self.from_depths = numpy.asarray(from_depths)
+        self.to_depths = numpy.asarray(to_depths)
+        self._closed = None
+
+    def __len__(self):
+        return len(self.from_depths)
+
+    def __repr__(self):
+        return 'IntervalIndex: {0} intervals'.format(len(self))
+
+    @property
+    def closed(self):
+        """ Return a boolean array which is True for intervals which contain
+            their to depth (i.e. which are followed by a gap or the end of the
+            dataset)
+        """
+        if self._closed is None:
+            self._closed = numpy.ones(len(self), dtype=bool)
+            self._closed[:-1] = self.from_depths[1:] > self.to_depths[:-1]
+        return self._closed
+
+    def lookup(self, depths):
+        """ Return the index of the interval containing each depth
+
+            This takes O(log N) time per depth for N intervals.
+
+            :param depths: The depths to look up
+            :type depths: float or iterable of floats
+            :returns: an integer array of the same shape as depths, containing
+                the index of the interval containing each depth, or -1 if the
+                depth lies in a gap or outside the intervals
+        """
+        depths = numpy.asarray(depths)
+        indices = numpy.searchsorted(self.from_depths, depths,
+                                     side='right') - 1
+        safe = numpy.clip(indices, 0, len(self) - 1)
+        to_depths = self.to_depths[safe]
+        inside = (indices >= 0) & (
+            (depths < to_depths)
+            | ((depths == to_depths) & self.closed[safe]))
+        return numpy.where(inside, indices, -1)
+
+    def overlapping(self, from_depth, to_depth):
+        """ Return the intervals which overlap the given depth range
+
+            Intervals which only touch the range at one end are not
+            included.
+
+            :param from_depth: The top of the range
+            :type from_depth: float
+            :param to_depth: The bottom of the range
+            :type to_depth: float
+            :returns: a slice selecting the overlapping intervals
+        """
+        start, stop = self.overlapping_ranges(from_depth, to_depth)
+        return slice(int(start), int(stop))
+
+    def overlapping_ranges(self, from_depths, to_depths):
+        """ Return the intervals which overlap each of the given depth ranges
+
+            This is the vectorized version of `overlapping`.
+
+            :param from_depths: The tops of the ranges
+            :type from_depths: float or iterable of floats
+            :param to_depths: The bottoms of the ranges
+            :type to_depths: float or iterable of floats
+            :returns: two integer arrays `start, stop` such that the intervals
+                overlapping range i are `start[i]:stop[i]`
+        """
+        start = numpy.searchsorted(self.to_depths, from_depths, side='right')
+        stop = numpy.searchsorted(self.from_depths, to_depths, side='left')
+        return start, numpy.maximum(start, stop)
+
+    def contained(self, from_depth, to_depth):
+        """ Return the intervals which are completely contained by the given
+            depth range
+
+            :param from_depth: The top of the range
+            :type from_depth: float
+            :param to_depth: The bottom of the range
+            :type to_depth: float
+            :returns: a slice selecting the contained intervals
+        """
+        start = numpy.searchsorted(self.from_depths, from_depth, side='left')
+        stop = numpy.searchsorted(self.to_depths, to_depth, side='right')
+        return slice(int(start), int(max(start, stop)))
@@ -8,10 +8,19 @@
 """
 
 from .dataset import DataSet
+from .column_store import ColumnStore
+from .gap_tracker import GapTracker
+from ..properties import PropertyType
 
 import numpy
-from scipy.interpolate import InterpolatedUnivariateSpline as Spline
-import pandas
+from scipy.interpolate import make_interp_spline
+
+# Methods available for filling gaps when resampling
+FILL_METHODS = ('interpolate', 'mean', 'median', 'local mean', 'local median')
+
+# Number of samples to process at a time when scanning over the depths, so
+# that memory-mapped datasets don't have to be read into memory all at once
+BLOCKSIZE = 2 ** 20
 
 
 class PointDataSet(DataSet):
@@ -22,7 +31,12 @@ class PointDataSet(DataSet):
         properties are sampled. Analogous to a coverage. One PointDataSet
         can be interpolated onto another.
 
-        Depths must be in monotonically increasing order.
+        Depths must be in monotonically increasing order. New samples can
+        be added to the end of the dataset with `append` or `extend`.
+
+        The depths and values can be memory-mapped arrays (see `from_npy`),
+        in which case operations which scan over the whole dataset work
+        through it a block at a time.
 
         :param name: identifier for the dataSet
         :type name: string
@@ -31,15 +45,76 @@ class PointDataSet(DataSet):
         :param details: The metadata associated with the dataset. Optional,
             defaults to None.
         :type details: pysiss.borehole.dataset.DatasetDetails
+        :param trusted: If True, the depths are assumed to be monotonically
+            increasing already and are not checked. Optional, defaults to
+            False.
+        :type trusted: bool
     """
 
-    def __init__(self, name, depths, details=None):
+    def __init__(self, name, depths, details=None, trusted=False):
         super(PointDataSet, self).__init__(
             name, len(depths), details=details)
         depths = numpy.asarray(depths)
-        assert all(numpy.diff(depths) > 0), \
-            "depths must be monotonically increasing"
+        if not trusted:
+            assert _is_increasing(depths), \
+                "depths must be monotonically increasing"
         self.depths = depths
+        self._depth_buffer = None
+        self._gap_tracker = None
+        self._gap_threshold = None
+
+    @classmethod
+    def from_npy(cls, name, depths_file, numeric_file=None,
+                 numeric_names=None, property_types=None, details=None,
+                 mmap_mode='r', trusted=False):
+        """ Make a PointDataSet whose depths and values are memory-mapped
+            from `.npy` files on disk.
+
+            This lets you work with datasets which are larger than memory:
+            values are only read from disk when they are used. The numeric
+            values should be a two-dimensional array with one column per
+            property, and should be saved in Fortran order so that each
+            property's values are contiguous on disk (e.g. using
+            `numpy.lib.format.open_memmap(..., fortran_order=True)`).
+
+            :param name: identifier for the dataSet
+            :type name: string
+            :param depths_file: The file containing the depths
+            :type depths_file: string
+            :param numeric_file: The file containing the numeric values.
+                Optional, if None then the dataset has no properties.
+            :type numeric_file: string
+            :param numeric_names: The property names for each column of
+                numeric values.
+            :type numeric_names: list of strings
+            :param property_types: The property types for the properties,
+                keyed by name. Optional, properties without a property type
+                are given a default one.
+            :type property_types: dict
+            :param details: The metadata associated with the dataset.
+                Optional, defaults to None.
+            :type details: pysiss.borehole.dataset.DatasetDetails
+            :param mmap_mode: How to memory-map the arrays, as in
+                `numpy.load`. Optional, defaults to 'r' (read-only).
+            :type mmap_mode: string
+            :param trusted: If True, the depths are not checked.
+                Optional, defaults to False, in which case the depths are
+                checked a block at a time.
+            :type trusted: bool
+            :returns: the new PointDataSet instance
+        """
+        dataset = cls(name, numpy.load(depths_file, mmap_mode=mmap_mode),
+                      details=details, trusted=trusted)
+        if numeric_file is not None:
+            property_types = dict(property_types or {})
+            for prop_name in numeric_names:
+                property_types.setdefault(prop_name, PropertyType(prop_name))
+            dataset._set_columns(
+                ColumnStore.from_blocks(
+                    numpy.load(numeric_file, mmap_mode=mmap_mode),
+                    numeric_names),
+                property_types)
+        return dataset
 
     def __repr__(self):
         info = 'PointDataSet {0}: with {1} depths and {2} '\
@@ -49,6 +124,11 @@ class PointDataSet(DataSet):
 
     def get_interval(self, from_depth, to_depth, dataset_name=None):
         """ Return the data between the given depths as as new PointDataSet
+
+            Since the depths are sorted the data in a depth window is always
+            a contiguous slice, so the new dataset is a view onto this one and
+            no data is copied. This means that modifying the values in the
+            new dataset will also modify them here.
         """
         # Specify a name if not already passed
         if dataset_name is None:
@@ -56,18 +136,54 @@ class PointDataSet(DataSet):
                 self.name, from_depth, to_depth)
 
         # Generate a new PointDataSet
-        indices = self.get_interval_indices(from_depth, to_depth)
-        newdom = PointDataSet(dataset_name, self.depths[indices])
-        for prop in self.properties.values():
-            newdom.add_property(prop.property_type, prop.values[indices])
+        window = self.get_interval_slice(from_depth, to_depth)
+        newdom = PointDataSet(dataset_name, self.depths[window], trusted=True)
+        newdom._set_columns(self.columns.take(window),
+                            self.get_property_types())
         return newdom
 
+    def get_interval_slice(self, from_depth, to_depth):
+        """ Returns a slice selecting the depths in the given interval
+        """
+        start = numpy.searchsorted(self.depths, from_depth, side='left')
+        stop = numpy.searchsorted(self.depths, to_depth, side='right')
+        return slice(start, max(start, stop))
+
     def get_interval_indices(self, from_depth, to_depth):
         """ Returns the indices for the depths in the given interval
         """
-        return numpy.where(
-            numpy.logical_and(self.depths >= from_depth,
-                              self.depths <= to_depth))[0]
+        window = self.get_interval_slice(from_depth, to_depth)
+        return numpy.arange(window.start, window.stop)
+
+    def get_nearest_indices(self, new_depths):
+        """ Returns the indices of the nearest existing depth for each of the
+            given depths.
+
+            Since our depths are monotonically increasing we can find the
+            neighbours of each new depth with a binary search rather than
+            comparing every pair of depths. This takes
+            O((N + M) log N) time and O(M) extra memory for N existing depths
+            and M new depths. Ties are broken towards the shallower sample.
+
+            :param new_depths: the depths to find neighbours for
+            :type new_depths: iterable of numeric values
+            :returns: a `numpy.ndarray` of integer indices into self.depths
+        """
+        depths = self.depths
+        new_depths = numpy.asarray(new_depths)
+        if len(depths) == 1:
+            return numpy.zeros(new_depths.shape, dtype=int)
+
+        # Find the samples either side of each new depth, clipping so that
+        # depths outside the dataset map onto the end samples
+        upper = numpy.searchsorted(depths, new_depths, side='left')
+        upper = numpy.clip(upper, 1, len(depths) - 1)
+        lower = upper - 1
+
+        # Pick whichever neighbour is closer
+        use_upper = ((depths[upper] - new_depths) ** 2
+                     < (depths[lower] - new_depths) ** 2)
+        return numpy.where(use_upper, upper, lower)
 
     def split_at_gaps(self, gap_metric='spacing_median', threshold=10):
         """ Split a dataset by finding significant gaps in the dataset.
@@ -82,22 +198,35 @@ class PointDataSet(DataSet):
                     samples which is an order of magnitude above the median
                     sample spacing in a dataset.
         """
-        # We need to add a small amount to the dataset so that the interval
-        # picker works well in the case of subdatasets with only one value
-        epsilon = 1e-10
-        jitter = lambda a, b: (a - epsilon, b + epsilon)
-
-        # Select gap metric to use, generate gap locations
+        # Select gap metric to use, generate gap locations a block at a time
         depths = self.depths
-        spacing = numpy.diff(depths)
-        if gap_metric is 'spacing_median':
-            med_spacing = numpy.median(spacing)
-            gap_indices = numpy.flatnonzero(spacing > threshold * med_spacing)
+        if gap_metric == 'spacing_median':
+            max_spacing = threshold * _median_spacing(depths)
+            gap_indices = [
+                start + numpy.flatnonzero(numpy.diff(block) > max_spacing)
+                for start, block in _iter_blocks(depths, overlap=1)]
+            gap_indices = numpy.concatenate(gap_indices or [[]]).astype(int)
         else:
             raise NotImplementedError(
                 "Unknown gap metric {0}".format(gap_metric))
 
+        # Reset gap tracking for extend
+        self._gap_threshold = threshold
+        self._gap_tracker = None
+        self._set_gaps(gap_indices)
+        return self.subdatasets, self.gaps
+
+    def _set_gaps(self, gap_indices):
+        """ Set the gaps and subdatasets from the indices of the depths just
+            before each gap
+        """
+        # We need to add a small amount to the dataset so that the interval
+        # picker works well in the case of subdatasets with only one value
+        epsilon = 1e-10
+        jitter = lambda a, b: (a - epsilon, b + epsilon)
+
         # Aggregate gap intervals
+        depths = self.depths
         self.gaps = []
         for idx in gap_indices:
             self.gaps.append((depths[idx], depths[idx + 1]))
@@ -116,7 +245,68 @@ class PointDataSet(DataSet):
             if gap_indices[idx] + 1 == gap_indices[idx + 1]:
                 from_depth, to_depth = jitter(from_depth, to_depth)
             self.subdatasets.append((from_depth, to_depth))
-        return self.subdatasets, self.gaps
+
+    def append(self, depth, values=None):
+        """ Add a single sample to the end of the dataset
+
+            See `extend` for details.
+
+            :param depth: The depth of the new sample
+            :type depth: float
+            :param values: The value of each property at the new sample,
+                keyed by property name.
+            :type values: dict
+        """
+        self.extend([depth], dict((name, [value]) for name, value
+                                  in (values or {}).items()))
+
+    def extend(self, depths, values=None):
+        """ Add new samples to the end of the dataset
+
+            The new depths must be increasing and deeper than all of the
+            existing depths, and new values must be given for every property.
+            Space is reserved in advance, so adding samples in batches only
+            costs time proportional to the size of the batch.
+
+            If the dataset has been split at gaps then the gaps and
+            subdatasets are kept up to date as samples are added, using a
+            `GapTracker` so that the gaps aren't recomputed from scratch each
+            time. The gaps are defined relative to the median spacing of all
+            of the samples seen so far, so adding samples can change which
+            existing spacings count as gaps.
+
+            :param depths: The depths of the new samples
+            :type depths: iterable of numeric values
+            :param values: The values of each property at the new samples,
+                keyed by property name.
+            :type values: dict of iterables
+        """
+        depths = numpy.asarray(depths, dtype=float)
+        nrows = len(depths)
+        if nrows == 0:
+            return
+        assert _is_increasing(depths) and depths[0] > self.depths[-1], \
+            "new depths must be monotonically increasing and deeper than " \
+            "the existing depths"
+        self.columns.extend(values or {}, nrows)
+
+        # Grow the depths, doubling the space each time we run out
+        size = self.size
+        if self._depth_buffer is None \
+                or len(self._depth_buffer) < size + nrows:
+            buffer = numpy.empty(max(2 * size, size + nrows))
+            buffer[:size] = self.depths
+            self._depth_buffer = buffer
+        self._depth_buffer[size:size + nrows] = depths
+        self.depths = self._depth_buffer[:size + nrows]
+        self.size = size + nrows
+
+        # Update gaps if we're tracking them
+        if self.gaps is not None and self._gap_threshold is not None:
+            if self._gap_tracker is None:
+                self._gap_tracker = GapTracker(self._gap_threshold)
+            self._gap_tracker.update(self.depths)
+            self._set_gaps(self._gap_tracker.gap_indices())
 
     def regularize(self, npoints=None, dataset_name=None, fill_method='median',
                    degree=0):
@@ -140,105 +330,16 @@ class PointDataSet(DataSet):
                     polynomial interpolation, a value of 0 uses nearest-
                     neighbour interpolation.
         """
-        # We need to identify gaps first
-        if self.gaps is None:
-            print ("Warning - your dataset hasn't been analysed for gaps yet. "
-                   "I'm going to assume you just want to use the default "
-                   "values")
-            self.split_at_gaps()
-
-       # Specify name & number of points if not already passed
-        if dataset_name is None:
-            dataset_name = '{0} resampled'.format(self.name)
+        # Specify number of points if not already passed
         if npoints is None:
-            spacing = float(numpy.median(numpy.diff(self.depths)))
+            spacing = _median_spacing(self.depths)
             npoints = abs(self.depths[-1] - self.depths[0]) / spacing
 
-        # Generate a new DataSet with the resampled data
-        new_depths = numpy.linspace(self.depths[0], self.depths[-1], npoints)
-        newdom = PointDataSet(dataset_name, new_depths)
-
-        # If we're doing nearest neighbours then we only need to work out the
-        # interpolation once
-        if degree == 0:
-            # This line generates a set of indices which will reconstruct a
-            # new signal using nearest neighbours, just do:
-            # property.values[interp_indices]
-            interp_indices = numpy.argmin(
-                numpy.asarray([
-                    (self.depths - new_depths[:, numpy.newaxis]) ** 2]),
-                axis=-1)[0]
-
-        # Get gap indices etc and store for faster lookup
-        if fill_method in ['mean', 'median', 'local mean', 'local median']:
-            # These methods need gap indices
-            gap_idxs = [newdom.get_interval_indices(*gap) for gap in self.gaps]
-        if fill_method in ['local mean', 'local median']:
-            # These methods need subdataset indices from the old dataset
-            sdom_idxs = [self.get_interval_indices(*sdom)
-                         for sdom in self.subdatasets]
-
-        # Resample properties
-        for prop in self.properties.values():
-            if prop.property_type.isnumeric is False:
-                # We can't interpolate non-numeric data
-                print ("Property {0} in dataset {1} is not numeric so I'm "
-                       "skipping it. If this is a suprise to you, maybe you "
-                       "should check whether you've correctly set the "
-                       "is_numeric flag in the PropertyType class for this "
-                       "property."
-                       ).format(prop.property_type.name, self.name)
-                continue
-
-            # Generate spline fit if required, else use nearest-neighbours
-            if degree == 0:
-                new_values = prop.values[interp_indices]
-            else:
-                spl = Spline(self.depths, prop.values, k=degree)
-                new_values = spl(new_depths)
-
-            # Deal with gaps
-            if fill_method == 'interpolate':
-                # We've already generated an interpolated value, so move on
-                # This option is here for error checking purposes
-                pass
-
-            elif fill_method == 'mean':
-                # Mean value in gaps, poly interp otherwise
-                meanval = prop.values.mean()
-                for gidx in gap_idxs:
-                    new_values[gidx] = meanval
-
-            elif fill_method == 'median':
-                # Median value in gaps
-                medval = numpy.median(prop.values)
-                for gidx in gap_idxs:
-                    new_values[gidx] = medval
-
-            elif fill_method == 'local mean':
-                # local mean value in gaps
-                smeans = [prop.values[s].mean() for s in sdom_idxs]
-                for sma, gidx, smb in zip(smeans[:-1], gap_idxs, smeans[1:]):
-                    new_values[gidx] = (sma + smb) / 2.
-
-            elif fill_method == 'local median':
-                # local median value in gaps
-                gap_neighbours = zip(sdom_idxs[:-1], gap_idxs, sdom_idxs[1:])
-                for sidxa, gidx, sidxb in gap_neighbours:
-                    new_values[gidx] = numpy.median(numpy.concatenate(
-                        prop.values[sidxa],
-                        prop.values[sidxb]))
-
-            else:
-                raise NotImplementedError
-
-            # Push back to new dataset
-            newdom.add_property(prop.property_type, new_values)
-
-        # Copy over gaps and subdatasets
-        newdom.gaps = self.gaps
-        newdom.subdatasets = self.subdatasets
-        return newdom
+        # Generate the regular grid and resample onto it
+        new_depths = numpy.linspace(self.depths[0], self.depths[-1],
+                                    int(npoints))
+        return self._resample(new_depths, dataset_name=dataset_name,
+                              fill_method=fill_method, degree=degree)
 
     def resample(self, new_depths, dataset_name=None, fill_method='median',
                  degree=0):
@@ -258,32 +359,62 @@ class PointDataSet(DataSet):
                     polynomial interpolation, a value of 0 uses nearest-
                     neighbour interpolation.
         """
+        return self._resample(numpy.asarray(new_depths),
+                              dataset_name=dataset_name,
+                              fill_method=fill_method, degree=degree)
+
+    def _resample(self, new_depths, dataset_name, fill_method, degree):
+        """ Resample all numeric properties onto the given depths.
+
+            This is the shared resampling pipeline behind `regularize` and
+            `resample`. Everything which depends only on the depths (the
+            interpolation indices or spline knots, and the gap and subdataset
+            indices) is worked out once per dataset. The numeric properties
+            are then stacked into a single (depths x properties) array so that
+            each step is applied to all of them at once.
+        """
         # We need to identify gaps first
         if self.gaps is None:
             print ("Warning - your dataset hasn't been analysed for gaps yet. "
                    "I'm going to assume you just want to use the default "
                    "values")
             self.split_at_gaps()
+        if fill_method not in FILL_METHODS:
+            raise NotImplementedError(
+                "Unknown fill method {0}".format(fill_method))
 
-       # Specify name & number of points if not already passed
+        # Specify name if not already passed
         if dataset_name is None:
             dataset_name = '{0} resampled'.format(self.name)
 
         # Generate a new DataSet with the resampled data
         newdom = PointDataSet(dataset_name, new_depths)
+        newdom.gaps = self.gaps
+        newdom.subdatasets = self.subdatasets
 
-        # If we're doing nearest neighbours then we only need to work out the
-        # interpolation once
+        # Numeric properties are already stacked up in the column store
+        for name in self.columns.categorical_names:
+            # We can't interpolate non-numeric data
+            print ("Property {0} in dataset {1} is not numeric so I'm "
+                   "skipping it. If this is a suprise to you, maybe you "
+                   "should check whether you've correctly set the "
+                   "is_numeric flag in the PropertyType class for this "
+                   "property."
+                   ).format(name, self.name)
+        if not self.columns.numeric_names:
+            return newdom
+        values = self.columns.numeric
+
+        # Generate spline fit if required, else use nearest-neighbours. The
+        # spline knots only depend on the depths, so we fit all the
+        # properties in one go.
         if degree == 0:
-            # This line generates a set of indices which will reconstruct a
-            # new signal using nearest neighbours, just do:
-            # property.values[interp_indices]
-            interp_indices = numpy.argmin(
-                numpy.asarray([
-                    (self.depths - new_depths[:, numpy.newaxis]) ** 2]),
-                axis=-1)[0]
-
-        # Get gap indices etc and store for faster lookup
+            new_values = values[self.get_nearest_indices(new_depths)]
+        else:
+            spline = make_interp_spline(self.depths, values, k=degree, axis=0)
+            new_values = spline(new_depths)
+
+        # Get gap indices etc for filling
         if fill_method in ['mean', 'median', 'local mean', 'local median']:
             # These methods need gap indices
             gap_idxs = [newdom.get_interval_indices(*gap) for gap in self.gaps]
@@ -292,72 +423,148 @@ class PointDataSet(DataSet):
             sdom_idxs = [self.get_interval_indices(*sdom)
                          for sdom in self.subdatasets]
 
-        # Resample properties
-        for prop in self.properties.values():
-            if prop.property_type.isnumeric is False:
-                # We can't interpolate non-numeric data
-                print ("Property {0} in dataset {1} is not numeric so I'm "
-                       "skipping it. If this is a suprise to you, maybe you "
-                       "should check whether you've correctly set the "
-                       "is_numeric flag in the PropertyType class for this "
-                       "property."
-                       ).format(prop.property_type.name, self.name)
-                continue
-
-            # Generate spline fit if required, else use nearest-neighbours
-            if degree == 0:
-                new_values = prop.values[interp_indices]
-            else:
-                spl = Spline(self.depths, prop.values, k=degree)
-                new_values = spl(new_depths)
-
-            # Deal with gaps
-            if fill_method == 'interpolate':
-                # We've already generated an interpolated value, so move on
-                # This option is here for error checking purposes
-                pass
-
-            elif fill_method == 'mean':
-                # Mean value in gaps, poly interp otherwise
-                meanval = prop.values.mean()
-                for gidx in gap_idxs:
-                    new_values[gidx] = meanval
-
-            elif fill_method == 'median':
-                # Median value in gaps
-                medval = numpy.median(prop.values)
-                for gidx in gap_idxs:
-                    new_values[gidx] = medval
-
-            elif fill_method == 'local mean':
-                # local mean value in gaps
-                smeans = [prop.values[s].mean() for s in sdom_idxs]
-                for sma, gidx, smb in zip(smeans[:-1], gap_idxs, smeans[1:]):
-                    new_values[gidx] = (sma + smb) / 2.
-
-            elif fill_method == 'local median':
-                # local median value in gaps
-                gap_neighbours = zip(sdom_idxs[:-1], gap_idxs, sdom_idxs[1:])
-                for sidxa, gidx, sidxb in gap_neighbours:
-                    new_values[gidx] = numpy.median(numpy.concatenate(
-                        prop.values[sidxa],
-                        prop.values[sidxb]))
+        # Deal with gaps
+        if fill_method == 'interpolate':
+            # We've already generated an interpolated value, so move on
+            # This option is here for error checking purposes
+            pass
 
+        elif fill_method in ['mean', 'median']:
+            # Global mean or median value in gaps
+            if fill_method == 'mean':
+                fillvals = values.mean(axis=0)
             else:
-                raise NotImplementedError
-
-            # Push back to new dataset
-            newdom.add_property(prop.property_type, new_values)
-
-        # Copy over gaps and subdatasets
-        newdom.gaps = self.gaps
-        newdom.subdatasets = self.subdatasets
+                fillvals = numpy.median(values, axis=0)
+            for gidx in gap_idxs:
+                new_values[gidx] = fillvals
+
+        elif fill_method == 'local mean':
+            # local mean value in gaps
+            smeans = [values[s].mean(axis=0) for s in sdom_idxs]
+            for sma, gidx, smb in zip(smeans[:-1], gap_idxs, smeans[1:]):
+                new_values[gidx] = (sma + smb) / 2.
+
+        elif fill_method == 'local median':
+            # local median value in gaps
+            gap_neighbours = zip(sdom_idxs[:-1], gap_idxs, sdom_idxs[1:])
+            for sidxa, gidx, sidxb in gap_neighbours:
+                new_values[gidx] = numpy.median(
+                    numpy.concatenate((values[sidxa], values[sidxb])),
+                    axis=0)
+
+        # Push back to new dataset
+        newdom._set_columns(
+            ColumnStore.from_blocks(new_values, self.columns.numeric_names),
+            self.get_property_types())
         return newdom
 
     def to_dataframe(self):
         """ Tranform the data in the dataset into a Pandas dataframe.
         """
-        return pandas.DataFrame(
-            data=dict(((k, self.properties[k].values)
-                       for k in self.properties.keys())),
-            index=self.depths)
+        return self._columns_to_dataframe(index=self.depths)
+
+    def iter_dataframes(self, blocksize=BLOCKSIZE):
+        """ Tranform the data in the dataset into a sequence of Pandas
+            dataframes, each containing at most blocksize rows.
+
+            This is useful for processing memory-mapped datasets without
+            reading all of the data into memory at once.
+
+            :param blocksize: The maximum number of rows in each dataframe
+            :type blocksize: int
+            :returns: an iterator over `pandas.DataFrame` instances
+        """
+        for start in range(0, self.size, blocksize):
+            window = slice(start, start + blocksize)
+            yield self._columns_to_dataframe(
+                index=self.depths[window],
+                columns=self.columns.take(window))
+
+
+def _iter_blocks(array, blocksize=BLOCKSIZE, overlap=0):
+    """ Iterate over (start, block) pairs covering the given array, where
+        each block is a view of array[start:start + blocksize + overlap]
+    """
+    last = max(len(array) - overlap, 1)
+    for start in range(0, last, blocksize):
+        yield start, array[start:start + blocksize + overlap]
+
+
+def _is_increasing(depths, blocksize=BLOCKSIZE):
+    """ Check that depths are monotonically increasing, a block at a time
+    """
+    return all((numpy.diff(block) > 0).all()
+               for _, block in _iter_blocks(depths, blocksize, overlap=1))
+
+
+def _median_spacing(depths, blocksize=BLOCKSIZE):
+    """ Return the median spacing between depths
+
+        For more than blocksize depths the median is found a block at a time
+        using `_select_spacing`, so that we never hold all of the spacings in
+        memory at once. The result is exactly the same as
+        `numpy.median(numpy.diff(depths))`.
+    """
+    nspacings = len(depths) - 1
+    if nspacings <= blocksize:
+        return float(numpy.median(numpy.diff(depths)))
+    middle = nspacings // 2
+    if nspacings % 2:
+        return _select_spacing(depths, middle, blocksize)
+    return (_select_spacing(depths, middle - 1, blocksize)
+            + _select_spacing(depths, middle, blocksize)) / 2.
+
+
+def _select_spacing(depths, k, blocksize=BLOCKSIZE, nbins=2 ** 16):
+    """ Return the k-th smallest spacing between depths (counting from 0)
+
+        Each pass over the depths counts the spacings in nbins equal bins
+        spanning the range which contains the k-th spacing, then narrows the
+        range to the bin which contains it. Once there are no more than
+        blocksize spacings left in the range they are sorted directly.
+    """
+    spacing_blocks = lambda: (
+        numpy.diff(block)
+        for _, block in _iter_blocks(depths, blocksize, overlap=1))
+
+    # The range [lower, upper] contains the k-th spacing, and there are
+    # `below` spacings smaller than lower
+    lower = min(spacings.min() for spacings in spacing_blocks())
+    upper = max(spacings.max() for spacings in spacing_blocks())
+    if numpy.isnan(lower) or numpy.isnan(upper):
+        return numpy.nan
+    below = 0
+    while True:
+        # Count the spacings in our range, and the spacings in each bin. The
+        # last bin includes the upper limit.
+        edges = numpy.linspace(lower, upper, nbins + 1)
+        counts = numpy.zeros(nbins, dtype=int)
+        for spacings in spacing_blocks():
+            spacings = spacings[(spacings >= lower) & (spacings <= upper)]
+            bins = numpy.searchsorted(edges, spacings, side='right') - 1
+            counts += numpy.bincount(numpy.minimum(bins, nbins - 1),
+                                     minlength=nbins)
+        total = counts.sum()
+
+        # Sort the remaining spacings once there are few enough of them, or
+        # if the range is too small to split any further
+        if total <= blocksize or upper <= numpy.nextafter(lower, upper):
+            if total > blocksize:
+                nlower = sum(int((spacings == lower).sum())
+                             for spacings in spacing_blocks())
+                return float(lower if k - below < nlower else upper)
+            remaining = numpy.concatenate([
+                spacings[(spacings >= lower) & (spacings <= upper)]
+                for spacings in spacing_blocks()])
+            return float(numpy.sort(remaining)[k - below])
+
+        # Narrow the range to the bin containing the k-th spacing
+        cumulative = numpy.cumsum(counts)
+        index = numpy.searchsorted(cumulative, k - below, side='right')
+        if index > 0:
+            below += cumulative[index - 1]
+        lower = edges[index]
+        if index < nbins - 1:
+            upper = numpy.nextafter(edges[index + 1], lower)
+        else:
+            upper = edges[index + 1]
@@ -6,6 +6,9 @@
     description: Imports for pysiss.borehole.properties
 """
 
+import numpy
+
+
 class Property(object):
 
     """ Container for values with type.
@@ -14,15 +17,25 @@ class Property(object):
         datasets, it must be a sequence of the same length as the depths. For a
         feature is should be a single value unless it is a multivalued category
 
+        Properties defined on a dataset don't hold their own values; instead
+        they are views onto a column in the dataset's
+        `pysiss.borehole.datasets.ColumnStore`.
+
         :param property_type: The property metadata for the property
         :type property_type: pysiss.borehole.properties.property_type
-        :param values: A list of values to store
+        :param values: A list of values to store. Ignored if `store` is given.
         :type values: iterable
+        :param store: The column store holding the values for this property.
+            Optional, defaults to None (i.e. the property holds its own
+            values).
+        :type store: pysiss.borehole.datasets.ColumnStore
     """
 
-    def __init__(self, property_type, values):
+    def __init__(self, property_type, values=None, store=None):
         self.property_type = property_type
-        self.values = values
+        self.store = store
+        if store is None:
+            self._values = values
 
     def __repr__(self):
         info = 'Property {0}: {1} values in units of {2}'
@@ -35,7 +48,27 @@ class Property(object):
         """
         return self.property_type.name
 
+    @property
+    def values(self):
+        """ Returns the values of the property
+        """
+        if self.store is not None:
+            return self.store.column(self.name)
+        return self._values
+
+    @values.setter
+    def values(self, values):
+        """ Set the values of the property
+        """
+        if self.store is not None:
+            self.store.add(self.name, values,
+                           numeric=self.property_type.isnumeric)
+        else:
+            self._values = values
+
     def copy(self):
         """ Return a copy of the Property instance
         """
+        if isinstance(self.values, numpy.ndarray):
+            return Property(self.property_type, self.values.copy())
         return Property(self.property_type, self.values[:])
@@ -16,10 +16,11 @@ o If the expectation is that only one borehole element should be
 import re
 import xml.etree.ElementTree
 from datetime import datetime
-from pint import UnitRegistry
+from lxml import etree
 
 from ..properties import PropertyType
 from ..borehole import Borehole, OriginPosition
+from ...utilities import get_unit_registry, parse_units, free_preceding
 
 # General namespace URIs for GeoSciML
 NS = {'gsml': 'urn:cgi:xmlns:CGI:GeoSciML:2.0',
@@ -33,6 +34,69 @@ GML_NS = {'gsml': 'http://www.opengis.net/gml',
 # GeoSciML version dependent shape namespace URIs
 SHAPE_NS = {'gsml': 'http://www.opengis.net/sampling/1.0',
             'gsmlbh': 'http://www.opengis.net/samplingSpatial/2.0'}
+
+# Search paths for borehole details. These are templates which are filled in
+# with the namespaces for each GeoSciML version by _make_paths, so that we
+# only have to build them once.
+_COMMON_PATHS = {
+    'borehole': './/%(ns)sBorehole',
+    'details': './/%(ns)sBoreholeDetails',
+    'latlon': './/%(ns)slocation/%(gml)sPoint/%(gml)spos',
+    'elevation units': './/%(ns)selevation[@uomLabels]',
+    'elevation axis': './/%(ns)selevation[@axisLabels]',
+    'location description':
+        './/%(ns)slocation/%(gml)sPoint/%(gml)sdescription',
+    'driller': './/%(ns)sdriller',
+    'start point': './/%(ns)sstartPoint',
+    'inclination type': './/%(ns)sinclinationType',
+}
+_VERSION_PATHS = {
+    'gsml': {
+        'drilling method': './/%(ns)sdrillingMethod',
+        'date of drilling': './/%(ns)sdateOfDrilling',
+        'shape': './/%(shape)sshape/%(gml)sLineString/%(gml)sposList',
+        'cored interval':
+            './/%(ns)scoredInterval/%(gml)sEnvelope[@uomLabels]',
+        'lower corner': './/%(gml)slowerCorner',
+        'upper corner': './/%(gml)supperCorner',
+    },
+    'gsmlbh': {
+        'drilling method': './/%(ns)sdownholeDrillingDetails'
+                           '/%(ns)sDrillingDetails/%(ns)sdrillingMethod',
+        'date of drilling': './/%(ns)sdateOfDrilling/%(gml)sTimePeriod'
+                            '/%(gml)sbegin/%(gml)sTimeInstant'
+                            '/%(gml)stimePosition',
+        'shape': './/%(shape)sshape/%(gml)sCompositeCurve'
+                 '/%(gml)scurveMember/%(gml)sLineString/%(gml)sposList',
+        'cored interval': './/%(ns)sdownholeDrillingDetails'
+                          '/%(ns)sDrillingDetails/%(ns)sinterval'
+                          '/%(gml)sLineString/%(gml)sposList',
+    }
+}
+
+
+def _make_paths(ns_key):
+    """ Return the search paths for the given GeoSciML version
+    """
+    prefixes = {'ns': '{%s}' % NS[ns_key],
+                'gml': '{%s}' % GML_NS[ns_key],
+                'shape': '{%s}' % SHAPE_NS[ns_key]}
+    templates = dict(_COMMON_PATHS, **_VERSION_PATHS[ns_key])
+    return dict((name, template % prefixes)
+                for name, template in templates.items())
+
+# Precomputed search paths for each GeoSciML version
+PATHS = dict((ns_key, _make_paths(ns_key)) for ns_key in _VERSION_PATHS)
+
+# xlink:title attribute name
+XLINK_TITLE = '{%s}title' % NS['xlink']
+
+# Expanded Borehole tag names for each GeoSciML version
+BOREHOLE_TAGS = dict(('{%s}Borehole' % NS[ns_key], ns_key)
+                     for ns_key in _VERSION_PATHS)
+
+# Available parsers for GeoSciML documents
+PARSERS = ('etree', 'iterparse')
               
 class SISSBoreholeGenerator:
 
@@ -51,8 +115,6 @@ class SISSBoreholeGenerator:
     def __init__(self):
         """ Construct a SISS borehole generator instance.
         """
-        self.unit_reg = UnitRegistry() 
-
         self.ns_key = None
 
         self.geosciml_handlers = {}
@@ -62,79 +124,137 @@ class SISSBoreholeGenerator:
         self.whitespace_pattern = re.compile(r'\s+')
                 
         self.borehole = None
+
+    @property
+    def unit_reg(self):
+        """ The unit registry used for borehole units. This is shared by all
+            generators, see `pysiss.utilities.get_unit_registry`.
+        """
+        return get_unit_registry()
     
-    def geosciml_to_borehole(self, name, geo_source):
+    def geosciml_to_borehole(self, name, geo_source, parser='etree'):
         """ Given a GeoSciML scanned borehole URL, return a Borehole object
             initialised with origin position and borehole details. In the case
             where there is more than one Borehole element, the first will be
             returned.
 
+            By default the whole document is parsed into an element tree
+            before searching it. With the 'iterparse' parser, the document is
+            streamed through lxml's iterparse instead: each Borehole element
+            is handled as soon as it has been parsed and is then thrown away,
+            so large documents are handled in one pass with little memory.
+
             :param name: The name to assign to the Borehole object
             :type name: string
             :param geo_source: A file-like object opened from a GeoSciML
                 scanned borehole URL
             :type geo_source: file-like object
+            :param parser: The parser to use, one of 'etree' or 'iterparse'.
+                Optional, defaults to 'etree'.
+            :type parser: string
             :returns: a Borehole object initialised with origin position and
                 borehole details
         """
+        if parser not in PARSERS:
+            raise ValueError('Unknown parser {0}, available parsers are '
+                             '{1}'.format(parser, PARSERS))
         if geo_source is not None:
-            geo_tree = xml.etree.ElementTree.parse(geo_source)
-            borehole_elts = self._get_borehole_elts(geo_tree)
-
-            if len(borehole_elts) != 0:
-                self.borehole = Borehole(name=name,
-                            origin_position=self._location(borehole_elts[0]))
-    
-                self._add_borehole_details(borehole_elts[0])
+            if parser == 'iterparse':
+                borehole_elts = _iter_borehole_elts(geo_source)
+            else:
+                geo_tree = xml.etree.ElementTree.parse(geo_source)
+                borehole_elts = self._get_borehole_elts(geo_tree)
+            for ns_key, borehole_elt in borehole_elts:
+                self.ns_key = ns_key
+                self.borehole = self._make_borehole(name, borehole_elt,
+                                                    ns_key)
+                break
 
         return self.borehole
 
+    def iter_boreholes(self, geo_source, parser='iterparse'):
+        """ Given a GeoSciML document, generate a Borehole object for every
+            Borehole element in it, initialised with origin position and
+            borehole details.
+
+            Each Borehole object is named with the gml:id of its element.
+            Unlike `geosciml_to_borehole`, this doesn't store anything on the
+            generator, so it is safe to call from multiple threads at once.
+            With the default 'iterparse' parser, the document is parsed in a
+            single streaming pass so memory use doesn't grow with the number
+            of boreholes.
+
+            :param geo_source: A filename or file-like object opened from a
+                GeoSciML document, such as a WFS GetFeature response
+            :type geo_source: string or file-like object
+            :param parser: The parser to use, one of 'etree' or 'iterparse'.
+                Optional, defaults to 'iterparse'.
+            :type parser: string
+            :returns: an iterator over Borehole objects
+        """
+        if parser not in PARSERS:
+            raise ValueError('Unknown parser {0}, available parsers are '
+                             '{1}'.format(parser, PARSERS))
+        if parser == 'iterparse':
+            borehole_elts = _iter_borehole_elts(geo_source)
+        else:
+            borehole_elts = self._get_borehole_elts(
+                xml.etree.ElementTree.parse(geo_source))
+        for ns_key, borehole_elt in borehole_elts:
+            name = borehole_elt.get('{%s}id' % GML_NS[ns_key])
+            yield self._make_borehole(name, borehole_elt, ns_key)
+
+    def _make_borehole(self, name, borehole_elt, ns_key):
+        """ Make a Borehole object from a Borehole element
+        """
+        borehole = Borehole(name=name,
+                            origin_position=self._location(borehole_elt,
+                                                           ns_key))
+        self._add_borehole_details(borehole, borehole_elt, ns_key)
+        return borehole
+
     def _get_borehole_elts(self, geo_tree):
         """ Return a list of GeoSciML Borehole elements taking into account
             tag namespace variations.
 
             :param geo_tree: a GeoSciML element tree
             :type geo_tree: xml.etree.ElementTree
-            :returns: a list of Borehole elements
+            :returns: a list of (namespace key, Borehole element) pairs
         """
         boreholes = []
         for ns_prefix in ['gsml', 'gsmlbh']:
-            boreholes = geo_tree.findall('.//{' + NS[ns_prefix] + '}Borehole')
+            boreholes = geo_tree.findall(PATHS[ns_prefix]['borehole'])
             if len(boreholes) != 0:
-                self.ns_key = ns_prefix
-                break
+                return [(ns_prefix, elt) for elt in boreholes]
 
         return boreholes
 
-    def _location(self, borehole_elt):
+    def _location(self, borehole_elt, ns_key):
         """Find the GeoSciML 2.0 or 3.0 borehole position (lat/lon) and 
            elevation and return an OriginPosition instance.
            
         :param borehole_elt: A GeoSciML 2.0 or 3.0 Borehole element
         :type borehole_elt: Element
+        :param ns_key: The GeoSciML namespace key ('gsml' or 'gsmlbh')
+        :type ns_key: string
         :returns: an OriginPosition instance (or None, if not found)
         """
         origin_position = None
         
-        latlon_xpath = './/{{{0}}}location/{{{1}}}Point/{{{2}}}pos'
-        latlon = _element_text(borehole_elt,
-                               latlon_xpath.format(NS[self.ns_key],
-                                                   GML_NS[self.ns_key],
-                                                   GML_NS[self.ns_key]))
+        paths = PATHS[ns_key]
+        latlon = _element_text(borehole_elt, paths['latlon'])
         if latlon is not None:
             (lat, lon) = latlon.split(' ')
          
-            elevation_xpath = './/{{{0}}}elevation[@uomLabels]'
-            elevation_elt = \
-                borehole_elt.find(elevation_xpath.format(NS[self.ns_key]))
+            elevation_elt = borehole_elt.find(paths['elevation units'])
             
             if elevation_elt is not None:
                 elevation_units = \
-                    self.unit_reg[elevation_elt.attrib['uomLabels']]
+                    parse_units(elevation_elt.attrib['uomLabels'])
             else:
                 elevation_units = None
                 
-            if self.ns_key == 'gsml':
+            if ns_key == 'gsml':
                 property_type = \
                     self._gsml_location_property(borehole_elt,
                                                  elevation_units)
@@ -142,8 +262,8 @@ class SISSBoreholeGenerator:
                 property_type = self._gsmlbh_location_property(borehole_elt)
                 
             origin_position = \
-                OriginPosition(latitude=float(lat) * self.unit_reg.degree,
-                    longitude=float(lon) * self.unit_reg.degree,
+                OriginPosition(latitude=float(lat) * parse_units('degree'),
+                    longitude=float(lon) * parse_units('degree'),
                     elevation=float(elevation_elt.text) * elevation_units,
                     property_type=property_type)
 
@@ -160,9 +280,8 @@ class SISSBoreholeGenerator:
         """
         property_type = None
         
-        elevation_desc_xpath = './/{{{0}}}elevation[@axisLabels]'
         elevation_elt = \
-            borehole_elt.find(elevation_desc_xpath.format(NS[self.ns_key]))
+            borehole_elt.find(PATHS['gsml']['elevation axis'])
         if elevation_elt is not None:
             elevation_axis_desc = \
                 'elevation: {0}'.format(elevation_elt.attrib['axisLabels'])
@@ -180,13 +299,8 @@ class SISSBoreholeGenerator:
         :type borehole_elt: Element
         :returns: a location (description) property (or None, if not found)
         """
-        description_xpath = \
-            './/{{{0}}}location/{{{1}}}Point/{{{2}}}description'
-            
-        description_text = _element_text(borehole_elt,
-                         description_xpath.format(NS[self.ns_key],
-                                                  GML_NS[self.ns_key],
-                                                  GML_NS[self.ns_key]))
+        description_text = _element_text(
+            borehole_elt, PATHS['gsmlbh']['location description'])
         
         description_text = 'description: {0}'.format(description_text)
         
@@ -194,86 +308,78 @@ class SISSBoreholeGenerator:
                             long_name='origin position',
                             description=description_text)
     
-    def _add_borehole_details(self, borehole_elt):
+    def _add_borehole_details(self, borehole, borehole_elt, ns_key):
         """ Add borehole details.
 
             This top-level method calls more specific methods to add
             borehole details.
 
+            :param borehole: The Borehole object to add details to
+            :type borehole: Borehole
             :param borehole_elt: A GeoSciML Borehole element
             :type borehole_elt: Element
+            :param ns_key: The GeoSciML namespace key ('gsml' or 'gsmlbh')
+            :type ns_key: string
         """
-        details_elt = \
-        borehole_elt.find('.//{{{0}}}BoreholeDetails'.format(NS[self.ns_key]))
+        details_elt = borehole_elt.find(PATHS[ns_key]['details'])
         if details_elt is not None:
-            return self.geosciml_handlers[self.ns_key](borehole_elt,
-                                                       details_elt)
+            return self.geosciml_handlers[ns_key](borehole, borehole_elt,
+                                                  details_elt)
 
-    def _add_gsml_borehole_details(self, borehole_elt, details_elt):
+    def _add_gsml_borehole_details(self, borehole, borehole_elt,
+                                   details_elt):
         """Add borehole details from a GeoSciML 2.0 Borehole or
             BoreholeDetails element.
         
+        :param borehole: The Borehole object to add details to
+        :type borehole: Borehole
         :param borehole_elt: A GeoSciML 2.0 Borehole element
         :type borehole_elt: Element
         :param details_elt: A GeoSciML 2.0 BoreholeDetails element
         :type details_elt: Element
         """
+        paths = PATHS['gsml']
+
         # Driller
-        self._add_driller(details_elt)
+        self._add_driller(borehole, details_elt, 'gsml')
 
         # Drilling method
-        drilling_method = \
-            _element_text(details_elt,
-                          './/{{{0}}}drillingMethod'.format(NS[self.ns_key]))
-        self.borehole.add_detail('drilling method', drilling_method)
+        drilling_method = _element_text(details_elt, paths['drilling method'])
+        borehole.add_detail('drilling method', drilling_method)
         
         # Date of drilling
         date_of_drilling = \
-            _element_text(details_elt,
-                          './/{{{0}}}dateOfDrilling'.format(NS[self.ns_key]))
+            _element_text(details_elt, paths['date of drilling'])
         year, month, day = date_of_drilling.split('-')
         date = datetime(year=int(year), month=int(month), day=int(day))
-        self.borehole.add_detail('date of drilling', date)
+        borehole.add_detail('date of drilling', date)
 
         # Borehole start point
-        start_point = \
-            _element_text(details_elt,
-                          './/{{{0}}}startPoint'.format(NS[self.ns_key]))
-        self.borehole.add_detail('start point', start_point)
+        start_point = _element_text(details_elt, paths['start point'])
+        borehole.add_detail('start point', start_point)
         
         # Borehole inclination type
         inclination_type = \
-            _element_text(details_elt,
-                          './/{{{0}}}inclinationType'.format(NS[self.ns_key]))
-        self.borehole.add_detail('inclination type', inclination_type)
+            _element_text(details_elt, paths['inclination type'])
+        borehole.add_detail('inclination type', inclination_type)
         
         # Borehole shape
         # Note: This is a child of the Borehole element rather than
         #       BoreholeDetails. 
-        shape_xpath = './/{{{0}}}shape/{{{1}}}LineString/{{{2}}}posList'
-        shape = \
-            _element_text(borehole_elt,
-                          shape_xpath.format(SHAPE_NS[self.ns_key],
-                                             GML_NS[self.ns_key],
-                                             GML_NS[self.ns_key]))
-        shape_list = [float(x) for x in self.whitespace_pattern.split(shape)]
-        self.borehole.add_detail('shape', shape_list)
+        shape = _element_text(borehole_elt, paths['shape'])
+        shape_list = [float(x) for x in
+                      self.whitespace_pattern.split(shape.strip())]
+        borehole.add_detail('shape', shape_list)
         
         # Borehole cored interval
-        cored_interval_xpath = \
-            './/{{{0}}}coredInterval/{{{1}}}Envelope[@uomLabels]'
-        cored_interval_elt = \
-            details_elt.find(cored_interval_xpath.format(NS[self.ns_key],
-                                                         GML_NS[self.ns_key]))
+        cored_interval_elt = details_elt.find(paths['cored interval'])
         cored_interval_units = \
-            self.unit_reg[cored_interval_elt.attrib['uomLabels']]
+            parse_units(cored_interval_elt.attrib['uomLabels'])
             
         cored_interval_lower_corner = \
-            _element_text(cored_interval_elt,
-                          './/{{{0}}}lowerCorner'.format(GML_NS[self.ns_key]))
+            _element_text(cored_interval_elt, paths['lower corner'])
         cored_interval_upper_corner = \
-            _element_text(cored_interval_elt,
-                          './/{{{0}}}upperCorner'.format(GML_NS[self.ns_key]))
+            _element_text(cored_interval_elt, paths['upper corner'])
             
         lower_corner = float(cored_interval_lower_corner) * cored_interval_units
         upper_corner = float(cored_interval_upper_corner) * cored_interval_units
@@ -282,123 +388,115 @@ class SISSBoreholeGenerator:
         
         # Question: How useful is the property here in fact if we have units
         #           for each value?
-        self.borehole.add_detail('cored interval', envelope_dict,
+        borehole.add_detail('cored interval', envelope_dict,
                             PropertyType(name='envelope',
                                          long_name='cored interval envelope',
                                          description='cored interval envelope '
                                                      'lower and upper corner',
                                          units=cored_interval_units))
                        
-    def _add_gsmlbh_borehole_details(self, borehole_elt, details_elt):
+    def _add_gsmlbh_borehole_details(self, borehole, borehole_elt,
+                                     details_elt):
         """Add borehole details from a GeoSciML 3.0 Borehole or
            BoreholeDetails element.
         
+        :param borehole: The Borehole object to add details to
+        :type borehole: Borehole
         :param borehole_elt: A GeoSciML 3.0 Borehole element
         :type borehole_elt: Element
         :param details_elt: A GeoSciML 3.0 BoreholeDetails element
         :type details_elt: Element
         """
+        paths = PATHS['gsmlbh']
 
         # Driller
-        self._add_driller(details_elt)
+        self._add_driller(borehole, details_elt, 'gsmlbh')
         
         # Drilling method
         # Note:  This is a child of the Borehole element rather than
         #        BoreholeDetails. 
-        drilling_method_xpath = ('.//{{{0}}}downholeDrillingDetails'
-                                 '/{{{1}}}DrillingDetails'
-                                 '/{{{2}}}drillingMethod'). \
-                                 format(NS[self.ns_key],
-                                        NS[self.ns_key],
-                                        NS[self.ns_key])
-                                                        
-        drilling_method_attrib_xpath = '{{{0}}}title'.format(NS['xlink'])
         drilling_method = _element_attrib(borehole_elt,
-                                          drilling_method_xpath,
-                                          drilling_method_attrib_xpath)
-        self.borehole.add_detail('drilling method', drilling_method)
+                                          paths['drilling method'],
+                                          XLINK_TITLE)
+        borehole.add_detail('drilling method', drilling_method)
 
         # Date of drilling
         # Note: Both start and end time are available; currently extracting
         #       only start time.
-        date_of_drilling_xpath = ('.//{{{0}}}dateOfDrilling/{{{1}}}TimePeriod'
-                            '/{{{2}}}begin/{{{3}}}TimeInstant'
-                            '/{{{4}}}timePosition').format(NS[self.ns_key],
-                                                           GML_NS[self.ns_key],
-                                                           GML_NS[self.ns_key],
-                                                           GML_NS[self.ns_key],
-                                                           GML_NS[self.ns_key])
         date_of_drilling = _element_text(details_elt,
-                                         date_of_drilling_xpath)
+                                         paths['date of drilling'])
         year, month, day = date_of_drilling.split('-')
         date = datetime(year=int(year), month=int(month), day=int(day))
-        self.borehole.add_detail('date of drilling', date)
+        borehole.add_detail('date of drilling', date)
 
         # Borehole start point
-        start_point_xpath = './/{{{0}}}startPoint'.format(NS[self.ns_key])
-        start_point_attrib_xpath = '{{{0}}}title'.format(NS['xlink'])
-        start_point = _element_attrib(details_elt, start_point_xpath,
-                                      start_point_attrib_xpath)
-        self.borehole.add_detail('start point', start_point)
+        start_point = _element_attrib(details_elt, paths['start point'],
+                                      XLINK_TITLE)
+        borehole.add_detail('start point', start_point)
 
         # Borehole inclination type
-        inclination_type_xpath = \
-            './/{{{0}}}inclinationType'.format(NS[self.ns_key])
-        inclination_type_attrib_xpath = '{{{0}}}title'.format(NS['xlink'])
         inclination_type = _element_attrib(details_elt,
-                                            inclination_type_xpath,
-                                            inclination_type_attrib_xpath)
-        self.borehole.add_detail('inclination type', inclination_type)
+                                            paths['inclination type'],
+                                            XLINK_TITLE)
+        borehole.add_detail('inclination type', inclination_type)
         
         # Borehole shape
         # Notes: 
         # o This is a child of the Borehole element rather than BoreholeDetails.
         # o Currently chooses the first one (if more than one exists).
-        shape_xpath = './/{{{0}}}shape/{{{1}}}CompositeCurve' \
-                      '/{{{2}}}curveMember/{{{3}}}LineString/{{{4}}}posList'
-        shape = \
-            _element_text(borehole_elt,
-                          shape_xpath.format(SHAPE_NS[self.ns_key],
-                                             GML_NS[self.ns_key],
-                                             GML_NS[self.ns_key],
-                                             GML_NS[self.ns_key],
-                                             GML_NS[self.ns_key]))
-        shape_list = [float(x) for x in self.whitespace_pattern.split(shape)]
-        self.borehole.add_detail('shape', shape_list)
+        shape = _element_text(borehole_elt, paths['shape'])
+        shape_list = [float(x) for x in
+                      self.whitespace_pattern.split(shape.strip())]
+        borehole.add_detail('shape', shape_list)
         
         # Borehole cored interval
         # Note: No units; haven't used a PropertyType here.
-        cored_interval_xpath = ('.//{{{0}}}downholeDrillingDetails'
-                                 '/{{{1}}}DrillingDetails'
-                                 '/{{{2}}}interval/{{{3}}}LineString'
-                                 '/{{{4}}}posList'). \
-                                 format(NS[self.ns_key],
-                                        NS[self.ns_key],
-                                        NS[self.ns_key],
-                                        GML_NS[self.ns_key],
-                                        GML_NS[self.ns_key])
-        
         cored_interval = _element_text(borehole_elt,
-                                       cored_interval_xpath)
-        cored_interval_list = self.whitespace_pattern.split(cored_interval)
+                                       paths['cored interval'])
+        cored_interval_list = \
+            self.whitespace_pattern.split(cored_interval.strip())
         lower_corner = float(cored_interval_list[0])
         upper_corner = float(cored_interval_list[1])
         envelope_dict = {'lower corner': lower_corner,
                          'upper corner': upper_corner}
-        self.borehole.add_detail('cored interval', envelope_dict)
+        borehole.add_detail('cored interval', envelope_dict)
     
-    def _add_driller(self, details_elt):
+    def _add_driller(self, borehole, details_elt, ns_key):
         """Add borehole driller detail from a GeoSciML 3.0
            BoreholeDetails element.
         
+        :param borehole: The Borehole object to add details to
+        :type borehole: Borehole
         :param details_elt: A GeoSciML 3.0 BoreholeDetails element
         :type details_elt: Element
+        :param ns_key: The GeoSciML namespace key ('gsml' or 'gsmlbh')
+        :type ns_key: string
         """
-        driller_xpath = './/{{{0}}}driller'.format(NS[self.ns_key])
-        driller_attrib_xpath = '{{{0}}}title'.format(NS['xlink'])
-        driller = _element_attrib(details_elt, driller_xpath,
-                                  driller_attrib_xpath)
-        self.borehole.add_detail('driller', driller)
+        driller = _element_attrib(details_elt,
+                                  PATHS[ns_key]['driller'],
+                                  XLINK_TITLE)
+        borehole.add_detail('driller', driller)
+
+def _iter_borehole_elts(geo_source):
+    """Stream through a GeoSciML document, yielding a (namespace key,
+       element) pair for each Borehole element in turn.
+
+       Each Borehole element is complete when it is yielded. Once the caller
+       is done with it, the element and anything before it in the document
+       is thrown away, so memory use doesn't grow with the document size.
+
+    :param geo_source: A filename or file-like object containing GeoSciML
+    :type geo_source: string or file-like object
+    """
+    context = etree.iterparse(geo_source, events=('end',),
+                              tag=BOREHOLE_TAGS.keys())
+    for _, element in context:
+        yield BOREHOLE_TAGS[element.tag], element
+
+        # Free up the element and all the finished elements before it
+        element.clear()
+        free_preceding(element)
+
 
 def _element_text(element, xpath_str):
     """Look for and return the detail corresponding to the text 
@@ -0,0 +1,465 @@
+""" file:   storage.py (pysiss.borehole)
+
+    description: Fast local storage for boreholes and their datasets.
+
+    Boreholes are stored in an archive directory. A small JSON header holds
+    the borehole metadata (details, origin positions, features and property
+    types), while depths and property values are stored as raw contiguous
+    `.npy` arrays, one file per dataset block:
+
+        archive/
+            header.json
+            0/                  # one directory per borehole
+                0/              # one directory per dataset
+                    depths.npy  # or from_depths.npy & to_depths.npy
+                    numeric.npy
+                    categorical.npy
+                    labels.json
+
+    When an archive is opened the arrays are memory-mapped rather than read,
+    so only the parts of an archive that you actually touch are read from
+    disk. Since the numeric block is stored column by column, reading one
+    property reads only that property's values.
+
+    Categorical values are stored as integer codes in `categorical.npy`,
+    again column by column, with the distinct values for each column (the
+    labels) in `labels.json`. Labels and header values are limited to the
+    types which `_to_json` knows how to store.
+"""
+
+from .borehole import Borehole, Feature, OriginPosition
+from .datasets import ColumnStore, PointDataSet, IntervalDataSet
+from .datasets.dataset import DatasetDetails
+from .properties import PropertyType
+from ..utilities import parse_units
+
+from datetime import datetime
+import numbers
+import numpy
+import os
+import shutil
+import simplejson
+
+# Version of the archive format
+ARCHIVE_VERSION = 2
+
+HEADER_FILE = 'header.json'
+
+# Values which are stored as-is in JSON
+_PLAIN_TYPES = (bool, numbers.Integral, float, str, type(u''))
+
+
+def save_boreholes(path, boreholes):
+    """ Save boreholes to an archive directory
+
+        Any existing archive at path is overwritten: the borehole directories
+        listed in its header are removed before the new boreholes are
+        written. Other files in the directory are left alone.
+
+        :param path: The archive directory. It is created if it doesn't exist.
+        :type path: string
+        :param boreholes: The boreholes to save
+        :type boreholes: list of `pysiss.borehole.Borehole` instances
+    """
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    else:
+        _remove_archive(path)
+    header = {'version': ARCHIVE_VERSION, 'boreholes': []}
+    for bh_idx, borehole in enumerate(boreholes):
+        bh_dir = str(bh_idx)
+        bh_header = {
+            'name': borehole.name,
+            'directory': bh_dir,
+            'origin_position': _to_json(borehole.origin_position),
+            'details': _dump_details(borehole.details),
+            'features': [_dump_feature(f)
+                         for f in borehole.features.values()],
+            'datasets': []
+        }
+        datasets = list(borehole.point_datasets.values()) \
+            + list(borehole.interval_datasets.values())
+        for ds_idx, dataset in enumerate(datasets):
+            ds_dir = os.path.join(bh_dir, str(ds_idx))
+            bh_header['datasets'].append(
+                _save_dataset(os.path.join(path, ds_dir), ds_dir, dataset))
+        header['boreholes'].append(bh_header)
+
+    # Write the header last so that we never have a header pointing at
+    # missing arrays
+    _write_json(os.path.join(path, HEADER_FILE), header)
+
+
+def save_borehole(path, borehole):
+    """ Save a single borehole to an archive directory
+
+        :param path: The archive directory.
+        :type path: string
+        :param borehole: The borehole to save
+        :type borehole: `pysiss.borehole.Borehole`
+    """
+    save_boreholes(path, [borehole])
+
+
+def load_borehole(path, name=None, mmap_mode='r'):
+    """ Load a borehole from an archive directory
+
+        :param path: The archive directory.
+        :type path: string
+        :param name: The name of the borehole to load. Optional, if None then
+            the archive must contain exactly one borehole.
+        :type name: string
+        :param mmap_mode: How to memory-map the arrays, as in `numpy.load`.
+            Optional, defaults to 'r' (read-only). None reads the arrays into
+            memory.
+        :type mmap_mode: string or None
+        :returns: a `pysiss.borehole.Borehole` instance
+    """
+    archive = BoreholeArchive(path, mmap_mode=mmap_mode)
+    if name is None:
+        if len(archive) != 1:
+            raise ValueError('Archive {0} contains {1} boreholes, you need to '
+                             'specify a name'.format(path, len(archive)))
+        name = archive.keys()[0]
+    return archive[name]
+
+
+class BoreholeArchive(object):
+
+    """ A read-only view of the boreholes in an archive directory
+
+        Opening an archive only reads the header. Boreholes are loaded when
+        they are requested, and their arrays are memory-mapped so no values
+        are read until they are used.
+
+        :param path: The archive directory.
+        :type path: string
+        :param mmap_mode: How to memory-map the arrays, as in `numpy.load`.
+            Optional, defaults to 'r' (read-only). None reads the arrays into
+            memory.
+        :type mmap_mode: string or None
+    """
+
+    def __init__(self, path, mmap_mode='r'):
+        super(BoreholeArchive, self).__init__()
+        self.path = path
+        self.mmap_mode = mmap_mode
+        header = _read_json(os.path.join(path, HEADER_FILE))
+        if header['version'] > ARCHIVE_VERSION:
+            raise ValueError('Archive {0} has format version {1}, I can only '
+                             'read up to version {2}'.format(
+                                 path, header['version'], ARCHIVE_VERSION))
+        self._headers = dict((bh['name'], bh) for bh in header['boreholes'])
+        self._names = [bh['name'] for bh in header['boreholes']]
+
+    def __repr__(self):
+        return 'BoreholeArchive {0}: {1} boreholes'.format(self.path,
+                                                           len(self))
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, name):
+        return name in self._headers
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def keys(self):
+        """ Return the names of the boreholes in the archive
+        """
+        return list(self._names)
+
+    def __getitem__(self, name):
+        """ Load the given borehole
+        """
+        bh_header = self._headers[name]
+        borehole = Borehole(
+            name, origin_position=_from_json(bh_header['origin_position']))
+        _load_details(borehole.details, bh_header['details'])
+        for dumped in bh_header['features']:
+            feature = _load_feature(dumped)
+            borehole.features[feature.name] = feature
+        for ds_header in bh_header['datasets']:
+            borehole.add_dataset(self._load_dataset(ds_header))
+        return borehole
+
+    def _load_dataset(self, header):
+        """ Load a dataset from the given dataset header
+        """
+        directory = os.path.join(self.path, header['directory'])
+        load = lambda fname: numpy.load(os.path.join(directory, fname),
+                                        mmap_mode=self.mmap_mode)
+
+        # Make the dataset
+        details = None
+        if header['details'] is not None:
+            details = _load_details(DatasetDetails(), header['details'])
+        if header['type'] == 'point':
+            dataset = PointDataSet(header['name'], load('depths.npy'),
+                                   details=details, trusted=True)
+        else:
+            dataset = IntervalDataSet(header['name'], load('from_depths.npy'),
+                                      load('to_depths.npy'), details=details,
+                                      trusted=True)
+        dataset.gaps = _from_json(header['gaps'])
+        dataset.subdatasets = _from_json(header['subdatasets'])
+
+        # Wrap the stored blocks as the dataset's columns
+        if header['numeric_names']:
+            numeric = load('numeric.npy')
+        else:
+            numeric = numpy.empty((dataset.size, 0))
+        categorical = numpy.empty((dataset.size,
+                                   len(header['categorical_names'])),
+                                  dtype=object, order='F')
+        if header['categorical_names']:
+            codes = load('categorical.npy')
+            labels = _read_json(os.path.join(directory, 'labels.json'))
+            for idx, column_labels in enumerate(labels):
+                categorical[:, idx] = _decode_column(codes[:, idx],
+                                                     column_labels)
+        property_types = dict(
+            (name, _from_json(ptype))
+            for name, ptype in header['property_types'].items())
+        dataset._set_columns(
+            ColumnStore.from_blocks(numeric, header['numeric_names'],
+                                    categorical, header['categorical_names']),
+            property_types)
+        return dataset
+
+
+def _remove_archive(path):
+    """ Remove an existing archive from a directory, if there is one
+
+        The header is removed first, so we never have a header pointing at
+        missing arrays.
+    """
+    header_file = os.path.join(path, HEADER_FILE)
+    if not os.path.exists(header_file):
+        return
+    header = _read_json(header_file)
+    os.remove(header_file)
+    for bh_header in header['boreholes']:
+        directory = os.path.join(path, bh_header['directory'])
+        if os.path.isdir(directory):
+            shutil.rmtree(directory)
+
+
+def _save_dataset(directory, relative_dir, dataset):
+    """ Save the arrays for a dataset, returning the header for the dataset
+    """
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    save = lambda fname, array: numpy.save(os.path.join(directory, fname),
+                                           array)
+
+    # Save depths
+    if isinstance(dataset, PointDataSet):
+        dataset_type = 'point'
+        save('depths.npy', numpy.asarray(dataset.depths, dtype=float))
+    elif isinstance(dataset, IntervalDataSet):
+        dataset_type = 'interval'
+        save('from_depths.npy', numpy.asarray(dataset.from_depths,
+                                              dtype=float))
+        save('to_depths.npy', numpy.asarray(dataset.to_depths, dtype=float))
+    else:
+        raise NotImplementedError(
+            "Can't save dataset of type {0}".format(type(dataset)))
+
+    # Save values - numeric values go in a column-ordered block so that we
+    # can map properties individually. Object arrays can't be mapped so
+    # categorical values are stored as a column-ordered block of codes into
+    # the labels for each column.
+    columns = dataset.columns
+    if columns.numeric_names:
+        save('numeric.npy', numpy.asfortranarray(columns.numeric))
+    if columns.categorical_names:
+        codes = numpy.empty(columns.categorical.shape, dtype=int, order='F')
+        labels = []
+        for idx in range(len(columns.categorical_names)):
+            codes[:, idx], column_labels = \
+                _encode_column(columns.categorical[:, idx])
+            labels.append(column_labels)
+        save('categorical.npy', codes)
+        _write_json(os.path.join(directory, 'labels.json'), labels)
+
+    return {
+        'name': dataset.name,
+        'type': dataset_type,
+        'directory': relative_dir,
+        'details': (_dump_details(dataset.details)
+                    if dataset.details is not None else None),
+        'gaps': _to_json(dataset.gaps),
+        'subdatasets': _to_json(dataset.subdatasets),
+        'property_types': dict(
+            (name, _to_json(ptype))
+            for name, ptype in dataset.get_property_types().items()),
+        'numeric_names': list(columns.numeric_names),
+        'categorical_names': list(columns.categorical_names)
+    }
+
+
+def _dump_details(details):
+    """ Convert a Details instance to a list of lists for the header
+    """
+    return [[d.name, _to_json(d.values), _to_json(d.property_type)]
+            for d in details.values()]
+
+
+def _load_details(details, dumped):
+    """ Add dumped details back into a Details instance
+    """
+    for name, values, property_type in dumped:
+        details.add_detail(name, _from_json(values),
+                           _from_json(property_type))
+    return details
+
+
+def _dump_feature(feature):
+    """ Convert a Feature to a dict for the header
+    """
+    return {
+        'name': feature.name,
+        'depth': _to_json(feature.depth),
+        'properties': [[_to_json(prop.property_type), _to_json(prop.values)]
+                       for prop in feature.properties.values()]
+    }
+
+
+def _load_feature(dumped):
+    """ Make a Feature from a dumped feature
+    """
+    feature = Feature(dumped['name'], _from_json(dumped['depth']))
+    for property_type, values in dumped['properties']:
+        feature.add_property(_from_json(property_type), _from_json(values))
+    return feature
+
+
+def _encode_column(values):
+    """ Convert a column of categorical values to an array of integer codes
+        and the list of distinct values (dumped with `_to_json`)
+    """
+    codes = numpy.empty(len(values), dtype=int)
+    index, labels = {}, []
+    for idx, value in enumerate(values):
+        # Unhashable values (e.g. multivalued categories) are keyed by their
+        # JSON representation
+        try:
+            key = (type(value), value)
+            hash(key)
+        except TypeError:
+            key = simplejson.dumps(_to_json(value), sort_keys=True)
+        if key not in index:
+            index[key] = len(labels)
+            labels.append(_to_json(value))
+        codes[idx] = index[key]
+    return codes, labels
+
+
+def _decode_column(codes, labels):
+    """ Convert integer codes and dumped labels back to an object array of
+        categorical values
+    """
+    values = numpy.empty(len(labels), dtype=object)
+    for idx, label in enumerate(labels):
+        values[idx] = _from_json(label)
+    return values[numpy.asarray(codes)]
+
+
+def _to_json(value):
+    """ Convert a value to something which can be stored as JSON
+
+        Lists, strings, numbers, booleans and None are stored as-is. Every
+        other value is stored as a dict with a 'type' tag so that
+        `_from_json` can rebuild it.
+
+        :raises TypeError: if we don't know how to store the value
+    """
+    if isinstance(value, numpy.generic):
+        return _to_json(value.item())
+    elif value is None or isinstance(value, _PLAIN_TYPES):
+        return value
+    elif isinstance(value, list):
+        return [_to_json(v) for v in value]
+    elif isinstance(value, tuple):
+        return {'type': 'tuple', 'value': [_to_json(v) for v in value]}
+    elif isinstance(value, dict):
+        return {'type': 'dict',
+                'value': [[_to_json(k), _to_json(v)]
+                          for k, v in value.items()]}
+    elif isinstance(value, numpy.ndarray):
+        return {'type': 'array', 'dtype': value.dtype.str,
+                'value': _to_json(value.tolist())}
+    elif isinstance(value, datetime):
+        return {'type': 'datetime',
+                'value': [value.year, value.month, value.day, value.hour,
+                          value.minute, value.second, value.microsecond]}
+    elif hasattr(value, 'magnitude') and hasattr(value, 'units'):
+        # A pint quantity
+        return {'type': 'quantity', 'value': _to_json(value.magnitude),
+                'units': str(value.units)}
+    elif isinstance(value, PropertyType):
+        return {'type': 'property_type', 'name': value.name,
+                'long_name': value._long_name,
+                'description': value.description,
+                'units': _to_json(value.units),
+                'isnumeric': value.isnumeric,
+                'detection_limit': _to_json(value.detection_limit)}
+    elif isinstance(value, OriginPosition):
+        return {'type': 'origin_position',
+                'latitude': _to_json(value.latitude),
+                'longitude': _to_json(value.longitude),
+                'elevation': _to_json(value.elevation),
+                'property_type': _to_json(value.property_type)}
+    raise TypeError("Can't store value {0!r} of type {1} in an "
+                    "archive".format(value, type(value)))
+
+
+def _from_json(value):
+    """ Rebuild a value stored with `_to_json`
+    """
+    if isinstance(value, list):
+        return [_from_json(v) for v in value]
+    elif not isinstance(value, dict):
+        return value
+
+    kind = value['type']
+    if kind == 'tuple':
+        return tuple(_from_json(v) for v in value['value'])
+    elif kind == 'dict':
+        return dict((_from_json(k), _from_json(v))
+                    for k, v in value['value'])
+    elif kind == 'array':
+        return numpy.array(_from_json(value['value']), dtype=value['dtype'])
+    elif kind == 'datetime':
+        return datetime(*value['value'])
+    elif kind == 'quantity':
+        return _from_json(value['value']) * parse_units(value['units'])
+    elif kind == 'property_type':
+        return PropertyType(value['name'], long_name=value['long_name'],
+                            description=value['description'],
+                            units=_from_json(value['units']),
+                            isnumeric=value['isnumeric'],
+                            detection_limit=_from_json(
+                                value['detection_limit']))
+    elif kind == 'origin_position':
+        return OriginPosition(_from_json(value['latitude']),
+                              _from_json(value['longitude']),
+                              _from_json(value['elevation']),
+                              _from_json(value['property_type']))
+    raise ValueError('Unknown stored value type {0}'.format(kind))
+
+
+def _write_json(filename, value):
+    """ Write a value to a JSON file
+    """
+    with open(filename, 'w') as fhandle:
+        simplejson.dump(value, fhandle)
+
+
+def _read_json(filename):
+    """ Read a value from a JSON file
+    """
+    with open(filename, 'r') as fhandle:
+        return simplejson.load(fhandle)
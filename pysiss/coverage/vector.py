@@ -9,12 +9,27 @@
 from ..utilities import id_object
 from ..metadata import MetadataRegistry
 
+import numpy
+from shapely.geometry import Polygon, LineString
+
+# Shapely constructors for lazily-built geometries
+GEOMETRY_TYPES = {
+    'Polygon': Polygon,
+    'LineString': LineString
+}
+
 
 class MappedFeature(id_object):
 
     """ Class containing vector GIS data.
 
         Corresponds roughly to gsml:MappedFeatures
+
+        Building Shapely geometries for complex polygons is expensive, so
+        features can also be made from raw coordinate arrays using
+        `MappedFeature.from_coordinates`. The shape and centroid are then
+        only built when they are first used, and the bounds are calculated
+        from the coordinates directly.
     """
 
     md_registry = MetadataRegistry()
@@ -24,9 +39,9 @@ class MappedFeature(id_object):
         self.ident = ident or self.uuid
 
         # Store some info on the shape
+        self._coordinates = None
         self.shape = shape
         self.projection = projection
-        self.centroid = self.shape.representative_point()
 
         # Store other metadata
         for attrib, value in kwargs.items():
@@ -34,11 +49,87 @@ class MappedFeature(id_object):
         self.specification = specification
         self.type = self.md_registry[self.specification].type
 
+    @classmethod
+    def from_coordinates(cls, geometry_type, coordinates, projection,
+                         specification, ident=None, **kwargs):
+        """ Make a MappedFeature whose shape is built on first access
+
+            :param geometry_type: The type of geometry, one of the keys of
+                `GEOMETRY_TYPES`
+            :type geometry_type: string
+            :param coordinates: The arguments for the Shapely constructor
+                for the geometry type. For a Polygon this is
+                (exterior, interiors) and for a LineString it's
+                (coordinates,), where each set of coordinates is an
+                (N, dim) array.
+            :type coordinates: tuple
+            :param projection: The identifier for the projection
+            :param specification: The key for the feature's metadata record
+            :param ident: An identifier for the feature. Optional, if None
+                then a UUID is used.
+            :returns: a `MappedFeature` instance
+        """
+        if geometry_type not in GEOMETRY_TYPES:
+            raise ValueError(
+                'Unknown geometry type {0}, available types are {1}'.format(
+                    geometry_type, GEOMETRY_TYPES.keys()))
+        feature = cls(None, projection, specification, ident=ident, **kwargs)
+        feature._coordinates = (geometry_type, tuple(coordinates))
+        return feature
+
+    @property
+    def shape(self):
+        """ The Shapely geometry for the feature
+        """
+        if self._shape is None and self._coordinates is not None:
+            geometry_type, coordinates = self._coordinates
+            self._shape = GEOMETRY_TYPES[geometry_type](*coordinates)
+            self._coordinates = None
+        return self._shape
+
+    @shape.setter
+    def shape(self, shape):
+        """ Set the shape, clearing any cached values
+        """
+        self._shape = shape
+        self._coordinates = None
+        self._centroid = None
+        self._bounds = None
+
+    @property
+    def centroid(self):
+        """ A representative point which is guaranteed to be in the shape
+        """
+        if self._centroid is None:
+            self._centroid = self.shape.representative_point()
+        return self._centroid
+
+    @property
+    def bounds(self):
+        """ The bounding box of the feature, as (minx, miny, maxx, maxy)
+
+            If the shape hasn't been built yet this is calculated from the
+            coordinates, without building the shape.
+        """
+        if self._bounds is None:
+            if self._shape is None and self._coordinates is not None:
+                # The exterior (or the line) bounds the whole geometry
+                points = numpy.asarray(self._coordinates[1][0])
+                self._bounds = tuple(
+                    float(b) for b in numpy.concatenate(
+                        (points[:, :2].min(axis=0),
+                         points[:, :2].max(axis=0))))
+            else:
+                self._bounds = self.shape.bounds
+        return self._bounds
+
     def __repr__(self):
         """ String representation
         """
-        info = 'MappedFeature {0} somewhere near {1} contains '
-        info_str = info.format(self.ident, self.centroid)
+        # Use the bounds so that we don't build lazy shapes just to print
+        # them
+        info = 'MappedFeature {0} with bounds {1}'
+        info_str = info.format(self.ident, self.bounds)
         return info_str
 
     def reproject(self, new_projection):
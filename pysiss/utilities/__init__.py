@@ -10,5 +10,7 @@
 from pysiss.utilities.maths import *
 from pysiss.utilities.collection import Collection
 from pysiss.utilities.id_object import id_object
+from pysiss.utilities.iterparse import free_preceding
 # from projection import project
 from pysiss.utilities.singleton import Singleton
+from pysiss.utilities.units import get_unit_registry, parse_units
@@ -0,0 +1,23 @@
+""" file:   iterparse.py (pysiss.utilities)
+
+    description: Helpers for streaming through XML documents with
+        `lxml.etree.iterparse`.
+"""
+
+
+def free_preceding(element):
+    """ Remove everything before an element from a partially parsed document
+
+        This removes the earlier siblings of the element and of each of its
+        ancestors, so that memory use doesn't grow as we stream through a
+        document. Comments and processing instructions before the root
+        element can't be removed, so they are left alone.
+
+        :param element: The element to free the preceding elements of
+        :type element: `lxml.etree._Element`
+    """
+    parent = element.getparent()
+    while parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+        element, parent = parent, parent.getparent()
@@ -0,0 +1,46 @@
+""" file:   units.py (pysiss.utilities)
+
+    description: A shared, lazily-built pint unit registry.
+
+    Building a `pint.UnitRegistry` parses pint's whole definitions file, which
+    is slow, and quantities from different registries can't be combined. So
+    pysiss uses a single registry for the whole process, which is only built
+    the first time it's needed.
+"""
+
+import threading
+from pint import UnitRegistry
+
+_REGISTRY = None
+_REGISTRY_LOCK = threading.Lock()
+_UNITS = {}
+
+
+def get_unit_registry():
+    """ Return the shared pint UnitRegistry, building it if required
+
+        :returns: a `pint.UnitRegistry` instance
+    """
+    global _REGISTRY
+    if _REGISTRY is None:
+        with _REGISTRY_LOCK:
+            if _REGISTRY is None:
+                _REGISTRY = UnitRegistry()
+    return _REGISTRY
+
+
+def parse_units(label):
+    """ Return the quantity for a units label (e.g. 'm' or 'degree') from the
+        shared registry.
+
+        Parsed labels are cached, so each label is only parsed once.
+
+        :param label: The units label
+        :type label: string
+        :returns: a `pint` quantity of one of the given units
+    """
+    try:
+        return _UNITS[label]
+    except KeyError:
+        units = _UNITS[label] = get_unit_registry()[label]
+        return units
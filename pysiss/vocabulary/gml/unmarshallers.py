@@ -6,60 +6,131 @@
     description: Unmarshalling functions for GeoSciML/GML objects
 """
 
+import numpy
 from shapely.geometry import Polygon, LineString
-from ..namespaces import NamespaceRegistry
+from ..namespaces import NamespaceRegistry, expand_namespace, xpath
 
 NAMESPACES = NamespaceRegistry()
 
+POS_TAG = expand_namespace('gml:pos')
+COORDINATES_TAG = expand_namespace('gml:coordinates')
+
 
 def position(elem):
     """ Unmarshal a gml:posList, gml:pos or gml:coordinates element
+
+        The whole coordinate string is parsed in one go, so it doesn't
+        matter how the positions are split over lines. The dimension of
+        the positions is taken from the srsDimension attribute of the
+        element or its ancestors; if there isn't one then gml:coordinates
+        tuples set the dimension and positions are assumed to be 2D.
+
+        :returns: an (N, dim) array of positions, or None if the element
+            is empty
+        :raises: ValueError if any of the values aren't numbers, or if the
+            number of values doesn't match the dimension, or the count
+            attribute if there is one
     """
-    if elem.text:
-        token_pairs = elem.text.split('\n')[1:-1]
-        return [map(float, p.split()) for p in token_pairs]
-    else:
+    text = elem.text
+    if not text or not text.strip():
         return None
 
+    # gml:coordinates uses its own tuple and coordinate separators
+    dim = _srs_dimension(elem)
+    if elem.tag == COORDINATES_TAG:
+        tuple_sep = elem.get('ts', ' ')
+        coord_sep = elem.get('cs', ',')
+        if dim is None:
+            first = text.split(tuple_sep)[0] if tuple_sep.strip() \
+                else text.split()[0]
+            dim = len(first.split(coord_sep))
+        text = text.replace(tuple_sep, ' ').replace(coord_sep, ' ')
+
+    values = numpy.array(text.split(), dtype=float)
+    dim = dim or (values.size if elem.tag == POS_TAG else 2)
+    if values.size == 0 or values.size % dim != 0:
+        raise ValueError(
+            "Can't parse {0} values from {1} into {2}D positions".format(
+                values.size, elem.tag, dim))
+    positions = values.reshape(-1, dim)
+
+    count = elem.get('count')
+    if count is not None and int(count) != len(positions):
+        raise ValueError(
+            'Expected {0} positions in {1}, found {2}'.format(
+                count, elem.tag, len(positions)))
+    return positions
+
+
+def _srs_dimension(elem):
+    """ Return the srsDimension for an element, which can be inherited from
+        the geometry which contains it, or None if it isn't specified
+    """
+    while elem is not None:
+        dim = elem.get('srsDimension')
+        if dim is not None:
+            return int(dim)
+        elem = elem.getparent()
+    return None
+
 
 def polygon(elem):
     """ Unmarshal a gml:Polygon element
     """
+    data = polygon_coordinates(elem)
+    return {'projection': data['projection'],
+            'shape': Polygon(*data['coordinates'])}
+
+
+def polygon_coordinates(elem):
+    """ Unmarshal a gml:Polygon element into coordinate arrays, without
+        building the Shapely geometry
+
+        :returns: a dictionary with the projection, the geometry type and
+            the coordinates as (exterior, interiors)
+    """
     # Get the projection
-    projection = elem.xpath('.//@srsName',
-                            namespaces=NAMESPACES)[0]
+    projection = xpath('.//@srsName')(elem)[0]
 
     # Get outer boundary first, we always have this
-    outer = position(
-        elem.xpath('.//gml:outerBoundaryIs//gml:posList',
-                   namespaces=NAMESPACES)[0])
+    outer = position(xpath('.//gml:outerBoundaryIs//gml:posList')(elem)[0])
 
     # We may have 0, 1 or more inner boundaries
-    inners = elem.xpath('.//gml:innerBoundaryIs//gml:posList',
-                        namespaces=NAMESPACES)
+    inners = xpath('.//gml:innerBoundaryIs//gml:posList')(elem)
     if not inners:
         inners = None
     else:
         inners = map(position, inners)
 
     return {'projection': projection,
-            'shape': Polygon(outer, inners)}
+            'type': 'Polygon',
+            'coordinates': (outer, inners)}
 
 
 def linestring(elem):
     """ Unmarshal a gml:LineString element
     """
+    data = linestring_coordinates(elem)
+    return {'projection': data['projection'],
+            'shape': LineString(*data['coordinates'])}
+
+
+def linestring_coordinates(elem):
+    """ Unmarshal a gml:LineString element into a coordinate array, without
+        building the Shapely geometry
+
+        :returns: a dictionary with the projection, the geometry type and
+            the coordinates as a 1-tuple
+    """
     # Get the projection
-    projection = elem.xpath('.//@srsName',
-                            namespaces=NAMESPACES)[0]
+    projection = xpath('.//@srsName')(elem)[0]
 
     # Get the LineString text
-    string = position(
-        elem.xpath('./gml:posList',
-                   namespaces=NAMESPACES)[0])
+    string = position(xpath('./gml:posList')(elem)[0])
 
     return {'projection': projection,
-            'shape': LineString(string)}
+            'type': 'LineString',
+            'coordinates': (string,)}
 
 
 def description(elem):
@@ -77,4 +148,11 @@ UNMARSHALLERS = {
     'gml:description': description,
 }
 
-__all__ = (position, polygon, linestring, UNMARSHALLERS)
+# Unmarshallers which return coordinates rather than Shapely geometries
+COORDINATE_UNMARSHALLERS = {
+    'gml:Polygon': polygon_coordinates,
+    'gml:LineString': linestring_coordinates
+}
+
+__all__ = (position, polygon, linestring, polygon_coordinates,
+           linestring_coordinates, UNMARSHALLERS, COORDINATE_UNMARSHALLERS)
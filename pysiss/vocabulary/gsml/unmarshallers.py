@@ -8,30 +8,36 @@
 
 from ...coverage.vector import MappedFeature
 from ...metadata import Metadata
-from ..namespaces import NamespaceRegistry, expand_namespace, shorten_namespace
-from ..gml.unmarshallers import UNMARSHALLERS as GML_UNMARSHALLERS
+from ..namespaces import NamespaceRegistry, expand_namespace, \
+    shorten_namespace, xpath
+from ..gml.unmarshallers import UNMARSHALLERS as GML_UNMARSHALLERS, \
+    COORDINATE_UNMARSHALLERS as GML_COORDINATE_UNMARSHALLERS
+
+from lxml import etree
 
 NAMESPACES = NamespaceRegistry()
 
 
 def mapped_feature(elem):
     """ Unmarshal a gsml:MappedFeature element
+
+        The feature's shape is only built when it's first used.
     """
     # Shape and projection data
-    shape_elem = elem.find('./gsml:shape', namespaces=NAMESPACES)
-    shape_data = shape(shape_elem)
+    shape_elem = xpath('./gsml:shape')(elem)[0]
+    shape_data = shape_coordinates(shape_elem)
     shape_elem.clear()  # Remove shape element from metadata
 
     # Identifier
     ident = elem.get(expand_namespace('gml:id')) or None
 
     # Get specification metadata records
-    spec_elem = elem.find('./gsml:specification', namespaces=NAMESPACES)
+    spec_elem = xpath('./gsml:specification')(elem)[0]
     spec = specification(spec_elem)
 
-    return MappedFeature(ident=ident, shape=shape_data['shape'],
-                         projection=shape_data['projection'],
-                         specification=spec)
+    return MappedFeature.from_coordinates(
+        shape_data['type'], shape_data['coordinates'],
+        ident=ident, projection=shape_data['projection'], specification=spec)
 
 
 def specification(elem):
@@ -55,6 +61,58 @@ def specification(elem):
         return mdata.ident
 
 
+def pack_mapped_feature(elem):
+    """ Unmarshal a gsml:MappedFeature element into a compact picklable form
+
+        This lets the unmarshalling be done in a worker process. The
+        MappedFeature is created (and any metadata registered) by
+        `unpack_mapped_feature` in the parent process.
+    """
+    shape_data = shape_coordinates(xpath('./gsml:shape')(elem)[0])
+    return (elem.get(expand_namespace('gml:id')) or None,
+            shape_data['type'],
+            shape_data['coordinates'],
+            shape_data['projection'],
+            pack_specification(xpath('./gsml:specification')(elem)[0]))
+
+
+def unpack_mapped_feature(packed):
+    """ Make a MappedFeature from the output of `pack_mapped_feature`
+    """
+    ident, geometry_type, coordinates, projection, spec = packed
+    return MappedFeature.from_coordinates(
+        geometry_type, coordinates, ident=ident, projection=projection,
+        specification=unpack_specification(spec))
+
+
+def pack_specification(elem):
+    """ Unmarshal a gsml:specification element into a compact picklable
+        form
+
+        Returns the metadata key for xlinks, otherwise the identifier, type
+        and serialized tree for a new metadata record.
+    """
+    xlink = elem.get(expand_namespace('xlink:href'))
+    if xlink:
+        return xlink.lstrip('#')
+    else:
+        spec_elem = elem.iterchildren().next()
+        return (spec_elem.get(expand_namespace('gml:id')),
+                shorten_namespace(spec_elem.tag),
+                etree.tostring(spec_elem, with_tail=False))
+
+
+def unpack_specification(packed):
+    """ Register the metadata record from the output of `pack_specification`
+        and return the relevant key
+    """
+    if isinstance(packed, basestring):
+        return packed
+    ident, type_, tree = packed
+    mdata = Metadata(ident=ident, type=type_, tree=etree.fromstring(tree))
+    return mdata.ident
+
+
 def shape(elem):
     """ Unmarshal a gsml:shape element
 
@@ -65,6 +123,17 @@ def shape(elem):
     return unmarshal(child)
 
 
+def shape_coordinates(elem):
+    """ Unmarshal a gsml:shape element into coordinate arrays
+
+        Like `shape`, but returns the geometry type and coordinates rather
+        than building the Shapely geometry
+    """
+    child = elem[0]
+    unmarshal = GML_COORDINATE_UNMARSHALLERS[shorten_namespace(child.tag)]
+    return unmarshal(child)
+
+
 def get_value(elem):
     """ Unmashall an element containing a gsml:value element somewhere in its
         descendents.
@@ -72,7 +141,11 @@ def get_value(elem):
         Returns the text value for a given element, stripping out children of
         the given element
     """
-    return elem.find('.//gsml:value/text()', namespaces=NAMESPACES)
+    values = xpath('.//gsml:value/text()')(elem)
+    if values:
+        return values[0]
+    else:
+        return None
 
 
 def cgi_termrange(elem):
@@ -80,8 +153,7 @@ def cgi_termrange(elem):
 
         Return the value range for a given element
     """
-    return map(get_value,
-               elem.xpath('.//gsml:CGI_TermValue', namespaces=NAMESPACES))
+    return map(get_value, xpath('.//gsml:CGI_TermValue')(elem))
 
 
 def sampling_frame(elem):
@@ -103,4 +175,11 @@ UNMARSHALLERS = {
     'gsml:specification': specification
 }
 
-__all__ = (UNMARSHALLERS,)
+# Functions to unmarshal elements in worker processes, as
+# (pack, unpack) pairs
+PACKERS = {
+    'gsml:MappedFeature': (pack_mapped_feature, unpack_mapped_feature),
+    'gsml:specification': (pack_specification, unpack_specification)
+}
+
+__all__ = (UNMARSHALLERS, PACKERS)
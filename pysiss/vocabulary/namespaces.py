@@ -10,6 +10,7 @@
 
 import simplejson
 import pkg_resources
+from lxml import etree
 from ..utilities import Singleton
 
 
@@ -33,14 +34,41 @@ class NamespaceRegistry(dict):
     def __setitem__(self, key, value):
         super(NamespaceRegistry, self).__setitem__(key, value)
         self.inverse[value] = key
+        _XPATHS.clear()
 
     def __delitem__(self, key):
         del self.inverse[self[key]]
         super(NamespaceRegistry, self).__delitem__(key)
+        _XPATHS.clear()
 
 
 _NAMESPACE_REGISTRY = NamespaceRegistry()
 
+# Compiled XPath expressions, bound to the registered namespaces. This is
+# cleared whenever the namespaces change.
+_XPATHS = {}
+
+
+def xpath(expression):
+    """ Return a compiled XPath expression which uses the registered
+        namespace prefixes
+
+        Expressions are only compiled once (until the namespace registry
+        changes), so this is much faster than calling `elem.xpath(...)`
+        with a namespace dictionary for every element.
+
+        :param expression: The XPath expression, e.g. './/gml:posList'
+        :type expression: string
+        :returns: an `lxml.etree.XPath` instance. Call this with an element
+            to evaluate the expression.
+    """
+    try:
+        return _XPATHS[expression]
+    except KeyError:
+        compiled = _XPATHS[expression] = \
+            etree.XPath(expression, namespaces=dict(_NAMESPACE_REGISTRY))
+        return compiled
+
 
 def add_namespace(abbrev, url):
     """ Add an XML namespace to the registry
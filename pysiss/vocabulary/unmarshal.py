@@ -10,14 +10,27 @@ from .namespaces import shorten_namespace, expand_namespace
 from .gml import unmarshallers as gml
 from .gsml import unmarshallers as gsml
 from .erml import unmarshallers as erml
+from ..utilities import free_preceding
 
 from lxml import etree
+import bz2
+import collections
+import multiprocessing
+import zlib
 
 UNMARSHALLERS = {}
 UNMARSHALLERS.update(gml.UNMARSHALLERS)
 UNMARSHALLERS.update(gsml.UNMARSHALLERS)
 UNMARSHALLERS.update(erml.UNMARSHALLERS)
 
+# Unmarshallers which can run in worker processes
+PACKERS = {}
+PACKERS.update(gsml.PACKERS)
+
+# Magic numbers for compressed streams
+GZIP_MAGIC = b'\x1f\x8b'
+BZIP2_MAGIC = b'BZh'
+
 
 def unmarshal(elem):
     """ Unmarshal an lxml.etree.Element element
@@ -33,17 +46,202 @@ def unmarshal(elem):
         return None
 
 
-def unmarshal_all(filename, tag='gsml:MappedFeature'):
+def unmarshal_all(filename, tag='gsml:MappedFeature', processes=1):
     """ Unmarshall all instances of a tag from an xml file
         and return them as a list of objects
+
+        Parsing stops quietly at the first XML syntax error, returning the
+        objects unmarshalled up to that point. Use `iter_unmarshal` to
+        process large files without holding all of the results in memory.
+        See `iter_unmarshal` for the processes argument.
+    """
+    results = []
+    try:
+        for result in iter_unmarshal(filename, tag=tag, processes=processes):
+            results.append(result)
+    except etree.XMLSyntaxError:
+        pass
+    return results
+
+
+def iter_unmarshal(source, tag='gsml:MappedFeature', processes=1,
+                   batchsize=100):
+    """ Unmarshall all instances of a tag from an xml source, yielding the
+        objects as they are parsed
+
+        Each element is detached from the document once it has been
+        unmarshalled, and the elements which have already been processed
+        are dropped, so the parsed document never grows beyond one element
+        at a time. Anything that an unmarshalled object keeps hold of (e.g.
+        the trees stored in `pysiss.metadata.Metadata` records) stays alive.
+
+        Unmarshalling is CPU-bound, so it can be spread over a pool of
+        worker processes. The document is still parsed in this process, and
+        the elements are sent to the workers in batches. For tags with an
+        entry in `PACKERS` (e.g. gsml:MappedFeature) the workers return a
+        compact form which is turned back into objects here, so metadata
+        records end up in this process's registry. Other results are just
+        pickled. Objects are yielded in document order.
+
+        :param source: The XML file name, or a file-like object to read the
+            XML from. Gzip and bzip2 compressed data are decompressed on the
+            fly.
+        :type source: string or file-like object
+        :param tag: The tag to unmarshal. Optional, defaults to
+            'gsml:MappedFeature'
+        :type tag: string
+        :param processes: The number of worker processes to use. Optional,
+            defaults to 1, which unmarshals everything in this process. If
+            None, uses one process per CPU.
+        :type processes: int
+        :param batchsize: The number of elements to send to a worker at a
+            time. Optional, defaults to 100.
+        :type batchsize: int
+        :raises: `lxml.etree.XMLSyntaxError` if the XML is malformed
+    """
+    if processes == 1:
+        for elem in _iter_elements(source, tag):
+            yield unmarshal(elem)
+        return
+
+    packer = PACKERS.get(shorten_namespace(expand_namespace(tag)))
+    if packer:
+        unpack = packer[1]
+    else:
+        unpack = lambda result: result
+
+    # Keep a bounded number of batches in flight so we don't read too far
+    # ahead of the consumer
+    processes = processes or multiprocessing.cpu_count()
+    pool = multiprocessing.Pool(processes)
+    try:
+        max_pending = 2 * processes
+        pending = collections.deque()
+        batch = []
+        for elem in _iter_elements(source, tag):
+            batch.append(etree.tostring(elem, with_tail=False))
+            if len(batch) == batchsize:
+                pending.append(pool.apply_async(_unmarshal_batch, (batch,)))
+                batch = []
+                if len(pending) >= max_pending:
+                    for result in pending.popleft().get():
+                        yield unpack(result)
+        if batch:
+            pending.append(pool.apply_async(_unmarshal_batch, (batch,)))
+        while pending:
+            for result in pending.popleft().get():
+                yield unpack(result)
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def _iter_elements(source, tag):
+    """ Iterate over all instances of a tag in an xml source, freeing each
+        element once the caller is done with it
     """
     tag = expand_namespace(tag)
+    if isinstance(source, basestring):
+        fhandle = open(source, 'rb')
+    else:
+        fhandle = source
+    try:
+        context = etree.iterparse(_DecompressingReader(fhandle),
+                                  events=('end',), tag=tag)
+        for _, elem in context:
+            yield elem
+
+            # Free the processed parts of the document. We detach the element
+            # rather than clearing it so that results can keep references
+            # into its subtree.
+            parent = elem.getparent()
+            if parent is not None:
+                parent.remove(elem)
+                free_preceding(parent)
+    finally:
+        if fhandle is not source:
+            fhandle.close()
+
+
+def _unmarshal_batch(fragments):
+    """ Unmarshal a batch of serialized elements in a worker process
+    """
     results = []
-    with open(filename, 'rb') as fhandle:
-        try:
-            context = iter(etree.iterparse(fhandle, events=('end',), tag=tag))
-            for event, elem in context:
-                results.append(unmarshal(elem))
-        except etree.XMLSyntaxError:
-            pass
+    for fragment in fragments:
+        elem = etree.fromstring(fragment)
+        packer = PACKERS.get(shorten_namespace(elem.tag))
+        if packer:
+            results.append(packer[0](elem))
+        else:
+            results.append(unmarshal(elem))
     return results
+
+
+class _DecompressingReader(object):
+
+    """ Wraps a binary file-like object, decompressing gzip or bzip2 data
+        if the stream starts with the appropriate magic number
+
+        This doesn't need to seek, so it works on network streams as well as
+        files.
+    """
+
+    def __init__(self, fhandle, chunksize=2 ** 16):
+        super(_DecompressingReader, self).__init__()
+        self.fhandle = fhandle
+        self.chunksize = chunksize
+        self._buffer = b''
+        self._pending = fhandle.read(chunksize)
+        self._new_decompressor = None
+        if self._pending.startswith(GZIP_MAGIC):
+            self._new_decompressor = \
+                lambda: zlib.decompressobj(16 + zlib.MAX_WBITS)
+        elif self._pending.startswith(BZIP2_MAGIC):
+            self._new_decompressor = bz2.BZ2Decompressor
+        self._decompressor = self._new_decompressor and \
+            self._new_decompressor()
+
+    def read(self, size=-1):
+        """ Read up to size bytes of decompressed data
+        """
+        if size is None or size < 0:
+            chunks = [self._buffer]
+            self._buffer = b''
+            while True:
+                chunk = self._read_chunk()
+                if chunk is None:
+                    return b''.join(chunks)
+                chunks.append(chunk)
+        while len(self._buffer) < size:
+            chunk = self._read_chunk()
+            if chunk is None:
+                break
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+    def _read_chunk(self):
+        """ Returns the next chunk of decompressed data, or None at the end
+            of the stream
+        """
+        while True:
+            data = self._pending or self.fhandle.read(self.chunksize)
+            self._pending = b''
+            if not data:
+                return None
+            elif self._decompressor is None:
+                return data
+            try:
+                chunk = self._decompressor.decompress(data)
+            except EOFError:
+                # bzip2 streams can be concatenated too
+                self._decompressor = self._new_decompressor()
+                chunk = self._decompressor.decompress(data)
+
+            # Handle concatenated compressed streams
+            unused = getattr(self._decompressor, 'unused_data', b'')
+            if unused:
+                self._decompressor = self._new_decompressor()
+                self._pending = unused
+            if chunk:
+                return chunk
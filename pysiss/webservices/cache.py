@@ -0,0 +1,266 @@
+""" file: cache.py (pysiss.webservices)
+
+    description: Persistent on-disk cache for web service responses.
+
+    Responses are stored in a directory, keyed by a hash of the full request
+    URL (so the endpoint and all of the request parameters). Cached responses
+    are revalidated with the server using their ETag and Last-Modified
+    headers, so unchanged data isn't downloaded again. The cache can be
+    limited in size, in which case the least recently used responses are
+    evicted first, and it can be used offline to serve recorded responses
+    without touching the network.
+"""
+
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+
+import requests
+import simplejson
+from requests.structures import CaseInsensitiveDict
+
+
+# Headers which don't apply to the decoded body that we store
+_SKIP_HEADERS = ('content-encoding', 'content-length', 'transfer-encoding')
+
+
+class ResponseCache(object):
+
+    """ A content-addressed disk cache for HTTP GET responses.
+
+        Only successful (200) responses are cached; anything else is passed
+        through untouched.
+
+        :param path: The directory to store responses in. It is created if it
+            doesn't exist.
+        :type path: string
+        :param max_size: The maximum total size of the cached responses in
+            bytes. Optional, if None then the cache is unbounded.
+        :type max_size: int
+        :param max_age: How long a cached response can be served without
+            revalidating it with the server, in seconds. Optional, if None
+            then responses are always revalidated.
+        :type max_age: float
+        :param offline: If True, responses are only served from the cache
+            and a KeyError is raised for uncached requests.
+        :type offline: bool
+    """
+
+    def __init__(self, path, max_size=None, max_age=None, offline=False):
+        super(ResponseCache, self).__init__()
+        self.path = path
+        self.max_size = max_size
+        self.max_age = max_age
+        self.offline = offline
+        self._lock = threading.Lock()
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def __repr__(self):
+        return 'ResponseCache(path="{0}")'.format(self.path)
+
+    def __len__(self):
+        return len(self._keys())
+
+    @staticmethod
+    def key(url, params=None):
+        """ Returns the cache key for a request
+
+            :param url: The request URL
+            :type url: string
+            :param params: Extra query parameters for the request
+            :type params: dict
+            :returns: a hex digest identifying the request
+        """
+        url = requests.Request('GET', url, params=params).prepare().url
+        return hashlib.sha1(url.encode('utf-8')).hexdigest()
+
+    def get(self, session, url, params=None, stream=False, **kwargs):
+        """ Make a GET request, using a cached response if possible
+
+            The response is downloaded into the cache in chunks, so large
+            responses don't need to fit in memory. If stream is True then
+            the `raw` attribute of the returned response is an open file
+            containing the decoded body.
+
+            :param session: The session to make any requests with
+            :type session: `requests.Session`
+            :param url: The request URL
+            :type url: string
+            :param params: Extra query parameters for the request
+            :type params: dict
+            :param stream: Whether to stream the response body
+            :type stream: bool
+            :returns: a `requests.Response` instance
+        """
+        key = self.key(url, params)
+        meta = self._read_meta(key)
+        if meta is not None and (self.offline or self._is_fresh(meta)):
+            return self._response(key, meta, stream)
+        elif self.offline:
+            raise KeyError('No cached response for {0} '
+                           '(cache is offline)'.format(url))
+
+        # Ask the server whether our copy is still valid
+        headers = CaseInsensitiveDict(kwargs.pop('headers', None) or {})
+        if meta is not None:
+            if meta['etag'] is not None:
+                headers['If-None-Match'] = meta['etag']
+            if meta['last_modified'] is not None:
+                headers['If-Modified-Since'] = meta['last_modified']
+        response = session.get(url, params=params, headers=headers,
+                               stream=True, **kwargs)
+
+        if response.status_code == 304 and meta is not None:
+            response.close()
+            meta['fetched'] = time.time()
+            self._write_meta(key, meta)
+            return self._response(key, meta, stream)
+        elif response.status_code != 200:
+            # Pass errors through uncached
+            if stream:
+                response.raw.decode_content = True
+            else:
+                response.content
+            return response
+
+        response = self._response(key, self._store(key, response), stream)
+        self._evict()
+        return response
+
+    def clear(self):
+        """ Remove all responses from the cache
+        """
+        for key in self._keys():
+            self._remove(key)
+
+    def _keys(self):
+        """ Returns the keys of all cached responses
+        """
+        return [fname[:-5] for fname in os.listdir(self.path)
+                if fname.endswith('.json')]
+
+    def _filename(self, key, ext):
+        return os.path.join(self.path, key + ext)
+
+    def _is_fresh(self, meta):
+        return self.max_age is not None \
+            and time.time() - meta['fetched'] < self.max_age
+
+    def _read_meta(self, key):
+        """ Returns the metadata for a cached response or None if it isn't
+            cached
+        """
+        try:
+            with open(self._filename(key, '.json'), 'r') as fhandle:
+                return simplejson.load(fhandle)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def _write_meta(self, key, meta):
+        """ Write the metadata for a response, which also marks the response
+            as recently used
+        """
+        self._write_atomic(self._filename(key, '.json'),
+                           simplejson.dumps(meta).encode('utf-8'))
+
+    def _write_atomic(self, filename, data=None, chunks=None):
+        """ Write data (or an iterable of chunks) to a file atomically, so
+            that other threads and processes never see a partial file
+        """
+        fdesc, tmpname = tempfile.mkstemp(dir=self.path, suffix='.tmp')
+        try:
+            with os.fdopen(fdesc, 'wb') as fhandle:
+                for chunk in (chunks if chunks is not None else [data]):
+                    fhandle.write(chunk)
+            replace_file(tmpname, filename)
+        except Exception:
+            os.remove(tmpname)
+            raise
+
+    def _store(self, key, response):
+        """ Stream a response body into the cache, returning its metadata
+        """
+        self._write_atomic(self._filename(key, '.dat'),
+                           chunks=response.iter_content(2 ** 16))
+        headers = dict((k, v) for k, v in response.headers.items()
+                       if k.lower() not in _SKIP_HEADERS)
+        meta = {
+            'url': response.url,
+            'headers': headers,
+            'encoding': response.encoding,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched': time.time()
+        }
+        self._write_meta(key, meta)
+        return meta
+
+    def _response(self, key, meta, stream):
+        """ Make a response object for a cached response
+        """
+        now = time.time()
+        os.utime(self._filename(key, '.json'), (now, now))
+        response = requests.Response()
+        response.status_code = 200
+        response.url = meta['url']
+        response.headers = CaseInsensitiveDict(meta['headers'])
+        response.encoding = meta['encoding']
+        response.raw = io.open(self._filename(key, '.dat'), 'rb')
+        if not stream:
+            with response.raw:
+                response._content = response.raw.read()
+        return response
+
+    def _remove(self, key):
+        for ext in ('.json', '.dat'):
+            try:
+                os.remove(self._filename(key, ext))
+            except OSError:
+                pass
+
+    def _evict(self):
+        """ Remove the least recently used responses until the cache is
+            smaller than max_size
+        """
+        if self.max_size is None:
+            return
+        with self._lock:
+            entries = []
+            for key in self._keys():
+                try:
+                    used = os.path.getmtime(self._filename(key, '.json'))
+                    size = os.path.getsize(self._filename(key, '.dat'))
+                except OSError:
+                    continue
+                entries.append((used, size, key))
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            for _, size, key in entries:
+                if total <= self.max_size:
+                    break
+                self._remove(key)
+                total -= size
+
+
+def replace_file(source, destination):
+    """ Rename source to destination, replacing destination if it exists
+
+        os.rename does this atomically on POSIX systems, but fails on Windows
+        if the destination exists, in which case we remove it first.
+
+        :param source: The file to rename
+        :type source: string
+        :param destination: The new name for the file
+        :type destination: string
+    """
+    try:
+        os.rename(source, destination)
+    except OSError:
+        if not os.path.exists(destination):
+            raise
+        os.remove(destination)
+        os.rename(source, destination)
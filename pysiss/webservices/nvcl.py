@@ -7,16 +7,30 @@
 """
 
 from ..borehole import PropertyType, SISSBoreholeGenerator
-from ..borehole.datasets import PointDataSet  # , IntervalDataSet
+from ..borehole.datasets import ColumnStore, PointDataSet  # , IntervalDataSet
 from ..utilities import Singleton
-
-from owslib.wfs import WebFeatureService
+from .cache import replace_file
+
+from contextlib import closing
+from multiprocessing.pool import ThreadPool
+import os
+import simplejson
+import tempfile
+import threading
+import time
 import numpy
 import pandas
 import requests
+from requests.adapters import HTTPAdapter
+from requests.compat import urlparse
+from requests.packages.urllib3.util.retry import Retry
 from lxml import etree
-from io import StringIO
+from io import BytesIO, StringIO
+
 
+# Depth columns in NVCL scalar CSV downloads
+SCALAR_START_COLUMN = 'StartDepth'
+SCALAR_END_COLUMN = 'EndDepth'
 
 NVCL_DEFAULT_ENDPOINTS = {
     'CSIRO': {
@@ -115,11 +129,57 @@ class NVCLImporter(object):
             registered endpoints, call `NVCLEndpointRegistry().keys()`. A
             KeyError is raised if an unknown endpoint is used.
         :type endpoint: string
+        :param max_per_host: The maximum number of concurrent requests to make
+            to any one host. Optional, defaults to 4.
+        :type max_per_host: int
+        :param pool_size: The number of connections to keep alive for each
+            host. Optional, defaults to 10.
+        :type pool_size: int
+        :param retries: The number of times to retry failed connections and
+            server errors. Optional, defaults to 3.
+        :type retries: int
+        :param backoff_factor: The base delay between retries, in seconds. The
+            delay doubles after each retry. Optional, defaults to 0.5.
+        :type backoff_factor: float
+        :param timeout: The connect and read timeout for each request, in
+            seconds, or None to wait forever. Optional, defaults to 60.
+        :type timeout: float
+        :param index_ttl: How long to keep the index of scanned boreholes
+            before refetching it, in seconds, or None to keep it forever.
+            Optional, defaults to one hour.
+        :type index_ttl: float
+        :param index_path: A JSON file used to persist the index of scanned
+            boreholes between runs. Optional, if None then the index is only
+            kept in memory.
+        :type index_path: string
+        :param cache: A cache to store responses from the web services in.
+            Optional, if None then responses aren't cached.
+        :type cache: `pysiss.webservices.cache.ResponseCache`
     """
 
-    def __init__(self, endpoint='CSIRO'):
+    def __init__(self, endpoint='CSIRO', max_per_host=4, pool_size=10,
+                 retries=3, backoff_factor=0.5, timeout=60,
+                 index_ttl=3600, index_path=None, cache=None):
         super(NVCLImporter, self).__init__()
         self.endpoint = endpoint
+        self.cache = cache
+        self.max_per_host = max_per_host
+        self.timeout = timeout
+        self.index_ttl = index_ttl
+        self.index_path = index_path
+        self._index = None
+        self._index_time = None
+        self._index_lock = threading.Lock()
+        self._host_limits = {}
+        self._host_lock = threading.Lock()
+
+        # Set up a pooled adapter so that connections are reused between
+        # requests. Sessions are made per thread, see `session`.
+        self.adapter = HTTPAdapter(
+            pool_connections=pool_size, pool_maxsize=pool_size,
+            max_retries=Retry(total=retries, backoff_factor=backoff_factor,
+                              status_forcelist=(500, 502, 503, 504)))
+        self._local = threading.local()
 
         # Get URL data associated with endpoint
         registry = NVCLEndpointRegistry()
@@ -140,6 +200,23 @@ class NVCLImporter(object):
         str = 'NVCLImporter(endpoint="{0}")'.format(self.endpoint)
         return str
 
+    @property
+    def session(self):
+        """ The `requests.Session` to use in the current thread
+
+            requests doesn't guarantee that sessions (which hold cookies and
+            other per-request state) are thread-safe, so each thread gets its
+            own session. The sessions all share `adapter`, whose urllib3
+            connection pools are thread-safe, so connections are still reused
+            across threads.
+        """
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.mount('http://', self.adapter)
+            session.mount('https://', self.adapter)
+        return session
+
     def get_borehole_idents_and_urls(self, maxids=None):
         """ Generates a dictionary containing identifiers and urls for
             boreholes with NVCL scanned data at this endpoint
@@ -149,14 +226,21 @@ class NVCLImporter(object):
             :type maxids: integer
             :returns: an dictionary of urls keyed by borehole identifiers
         """
-        wfs = WebFeatureService(self.urls['wfsurl'], version="1.1.0")
-        wfsresponse = wfs.getfeature(
-            typename="nvcl:ScannedBoreholeCollection",
-            maxfeatures=maxids)
+        # We make a KVP GetFeature request directly rather than going through
+        # OWSLib so that we can reuse our pooled connections
+        params = {
+            'service': 'WFS',
+            'version': '1.1.0',
+            'request': 'GetFeature',
+            'typename': 'nvcl:ScannedBoreholeCollection'
+        }
+        if maxids is not None:
+            params['maxFeatures'] = maxids
+        response = self._get(self.urls['wfsurl'], params=params)
+        response.raise_for_status()
 
-        wfs_content = StringIO(wfsresponse.read())
         parser = etree.XMLParser(recover=True, encoding='utf-8')
-        xmltree = etree.parse(wfs_content, parser)
+        xmltree = etree.parse(BytesIO(response.content), parser)
 
         idents = {}
         bhstring = ".//{http://www.auscope.org/nvcl}scannedBorehole"
@@ -168,13 +252,95 @@ class NVCLImporter(object):
     def get_borehole_idents(self, maxids=None):
         """ Returns the identifiers of boreholes with NVCL scanned data
 
+            If maxids is None, the identifiers come from the cached borehole
+            index (see `get_borehole_index`).
+
             :param maxids: The maximum number of boreholes to request or
                 None for no limit
             :type maxids: integer
             :returns: a list borehole identifiers
         """
+        if maxids is None:
+            return self.get_borehole_index().keys()
         return self.get_borehole_idents_and_urls(maxids).keys()
 
+    def get_borehole_index(self, refresh=False):
+        """ Returns a cached dictionary of urls keyed by borehole identifiers
+            for all the boreholes with NVCL scanned data at this endpoint.
+
+            The index is only refetched from the WFS once it is older than
+            `index_ttl`, or if refresh is True. If `index_path` is set, the
+            index is also saved to disk and reused by later importers while
+            it is fresh.
+
+            :param refresh: Whether to refetch the index even if the cached
+                copy is still fresh
+            :type refresh: bool
+            :returns: an dictionary of urls keyed by borehole identifiers
+        """
+        with self._index_lock:
+            if refresh or not self._index_is_fresh():
+                if not refresh and self._load_index():
+                    return self._index
+                self._index = self.get_borehole_idents_and_urls()
+                self._index_time = time.time()
+                self._save_index()
+            return self._index
+
+    def refresh_borehole_index(self):
+        """ Refetch the index of scanned boreholes from the WFS
+        """
+        self.get_borehole_index(refresh=True)
+
+    def _index_is_fresh(self, index_time=None):
+        """ Returns whether an index fetched at index_time (defaulting to the
+            cached index) is younger than the TTL
+        """
+        if index_time is None:
+            if self._index is None:
+                return False
+            index_time = self._index_time
+        return self.index_ttl is None \
+            or time.time() - index_time < self.index_ttl
+
+    def _load_index(self):
+        """ Load a fresh borehole index from index_path, returning whether
+            one was found
+        """
+        if self.index_path is None or not os.path.exists(self.index_path):
+            return False
+        try:
+            with open(self.index_path, 'r') as fhandle:
+                cached = simplejson.load(fhandle)
+            if cached.get('wfsurl') != self.urls['wfsurl'] \
+                    or not self._index_is_fresh(cached['time']):
+                return False
+        except (IOError, OSError, ValueError, KeyError, AttributeError):
+            # Treat unreadable or corrupt indices as missing
+            return False
+        self._index, self._index_time = cached['index'], cached['time']
+        return True
+
+    def _save_index(self):
+        """ Save the borehole index to index_path, if set
+        """
+        if self.index_path is None:
+            return
+
+        # Write to a temporary file and move it into place, so that other
+        # importers never see a partial index
+        directory = os.path.dirname(os.path.abspath(self.index_path))
+        fdesc, tmpname = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fdesc, 'w') as fhandle:
+                simplejson.dump({'wfsurl': self.urls['wfsurl'],
+                                 'time': self._index_time,
+                                 'index': self._index}, fhandle)
+            replace_file(tmpname, self.index_path)
+        except Exception:
+            os.remove(tmpname)
+            raise
+
     def get_dataset_idents(self, hole_ident):
         """ Generates a dictionary of tuples representing all the NVCL datasets
             associated with this particular borehole
@@ -187,7 +353,7 @@ class NVCLImporter(object):
         xmltree = None
         holeurl = (self.urls['dataurl'] + 'getDatasetCollection.html?'
                    'holeidentifier={0}').format(hole_ident)
-        response = requests.get(holeurl)
+        response = self._get(holeurl)
         if response:
             xmltree = etree.fromstring(response.content)
 
@@ -210,30 +376,48 @@ class NVCLImporter(object):
             :returns: a dictionary keyed by analyte name, where each value is
                 the GUID for a given analyte.
         """
-        analyte_idents = None
+        return dict((name, log_ident) for name, log_ident, _
+                    in self._get_logs(dataset_ident))
+
+    def _get_logs(self, dataset_ident):
+        """ Returns a list of (name, GUID, sample count) tuples for each NVCL
+            analyte in the given dataset.
+
+            The sample count is None if the service doesn't report it.
+        """
         dseturl = 'getLogCollection.html?mosaicsvc=no&datasetid={0}'
-        response = requests.get(self.urls['dataurl']
-                                + dseturl.format(dataset_ident))
+        response = self._get(self.urls['dataurl']
+                             + dseturl.format(dataset_ident))
 
         # Parse XML tree to return analytes
         if response:
             xmltree = etree.fromstring(response.content)
-            analyte_idents = {}
+            logs = []
             for analyte in xmltree.findall(".//Log"):
                 log_ident = analyte.find("LogID").text
                 name = analyte.find("logName").text
-                # sample_count = analyte.find('SampleCount').text
-                analyte_idents[name] = log_ident
-            return analyte_idents
+                sample_count = analyte.findtext('SampleCount')
+                if sample_count is not None:
+                    sample_count = int(sample_count)
+                logs.append((name, log_ident, sample_count))
+            return logs
         else:
             raise Exception(
-                'Request for data returned {0}'.format(response.code))
+                'Request for data returned {0}'.format(response.status_code))
 
     def get_analytes(self, hole_ident, dataset_name, dataset_ident,
                      analyte_idents=None,
-                     from_depth=None, to_depth=None,):
+                     from_depth=None, to_depth=None, stream=False,
+                     chunksize=10000):
         """ Get the analytes from the given borehole and dataset
 
+            By default the whole CSV response is downloaded and parsed in one
+            go. For large datasets you can set `stream` to True, in which case
+            the response is parsed in chunks of `chunksize` rows directly into
+            preallocated arrays, so peak memory stays close to the size of the
+            final dataset. In streaming mode, analytes which only contain
+            numbers are marked as numeric properties.
+
             :param hole_ident: The identifier for a borehole
             :type hole_ident: string
             :param dataset_name: An identifier for the generated dataset
@@ -248,33 +432,52 @@ class NVCLImporter(object):
                 dataset. Optional, defaults to the entire depths defined in
                 the NVCL.
             :type from_depth/to_depth: float
+            :param stream: Whether to stream the data. Optional, defaults to
+                False.
+            :type stream: bool
+            :param chunksize: The number of rows to parse at a time when
+                streaming. Optional, defaults to 10000.
+            :type chunksize: int
         """
         # Get analyte data
-        analyte_ident_dict = self.get_analyte_idents(hole_ident, dataset_ident)
-        if len(analyte_ident_dict) == 0:
+        logs = self._get_logs(dataset_ident)
+        if len(logs) == 0:
             # This dataset has no analytes
             print ('Warning, dataset {0} has no analytes'.format(dataset_ident))
             return None
 
         # Generate request URL
         if analyte_idents is None:
-            analyte_idents = analyte_ident_dict.values()
+            analyte_idents = [log_ident for _, log_ident, _ in logs]
         url = self.urls['dataurl'] + 'downloadscalars.html?'
         for ident in analyte_idents:
             url += '&logid={0}'.format(ident)
 
+        # Stream the data if required, using the sample counts to work out
+        # how much space we need
+        if stream:
+            counts = [count for _, log_ident, count in logs
+                      if log_ident in analyte_idents and count is not None]
+            # Closing the response closes the cache file or releases the
+            # connection back to the pool
+            with closing(self._get(url, stream=True)) as response:
+                response.raise_for_status()
+                return _read_scalars(response.raw, dataset_name,
+                                     chunksize=chunksize,
+                                     size_hint=max(counts) if counts else None)
+
         # We'll use pandas to slurp the csv direct from the web service
-        analytedata = pandas.read_csv(url)
-        startcol = 'StartDepth'
-        endcol = 'EndDepth'
+        response = self._get(url)
+        response.raise_for_status()
+        analytedata = pandas.read_csv(StringIO(response.text))
         analytecols = [k for k in analytedata.keys()
-                       if k not in (startcol, endcol)]
+                       if k not in (SCALAR_START_COLUMN, SCALAR_END_COLUMN)]
 
         # NVCL data results in start depths == end depths.
         # Ranges aren't really appropriate. Better to use sampling
         # dataset
-        analytedata = analytedata.drop_duplicates(startcol)
-        startdepths = numpy.asarray(analytedata[startcol])
+        analytedata = analytedata.drop_duplicates(SCALAR_START_COLUMN)
+        startdepths = numpy.asarray(analytedata[SCALAR_START_COLUMN])
         dataset = PointDataSet(dataset_name, startdepths)
 
         # Make a property for each analyte in the borehole
@@ -333,19 +536,74 @@ class NVCLImporter(object):
                 (e.g. 404'd). If false, get_borehole returns None.
             :returns: a `pysiss.borehole.Borehole` object
         """
+        return self._get_borehole(hole_ident, name=name,
+                                  get_analytes=get_analytes,
+                                  raise_error=raise_error)
+
+    def get_boreholes(self, hole_idents=None, get_analytes=True,
+                      raise_error=True, max_workers=8):
+        """ Generates pysiss.borehole.Borehole instances for many boreholes at
+            once.
+
+            The boreholes are downloaded concurrently using a pool of worker
+            threads, with at most `max_per_host` requests in flight to any one
+            host. Boreholes are yielded as soon as they have been downloaded,
+            so they won't necessarily be in the same order as hole_idents.
+
+            :param hole_idents: The hole identifiers. Optional, if None then
+                all of the boreholes at this endpoint are downloaded.
+            :type hole_idents: list of strings
+            :param get_analytes: If True, the analytes will also be downloaded
+            :type get_analytes: bool
+            :param raise_error: Whether to raise an exception on an HTTP error
+                (e.g. 404'd). If false, failed boreholes are returned as None.
+            :type raise_error: bool
+            :param max_workers: The number of worker threads to use. Optional,
+                defaults to 8.
+            :type max_workers: int
+            :returns: an iterator over (hole_ident, borehole) tuples
+        """
+        urls = self.get_borehole_index()
+        if hole_idents is None:
+            hole_idents = urls.keys()
+        hole_idents = list(hole_idents)
+        if not hole_idents:
+            return
+
+        def _worker(hole_ident):
+            return hole_ident, self._get_borehole(
+                hole_ident, urls, get_analytes=get_analytes,
+                raise_error=raise_error)
+
+        pool = ThreadPool(min(max_workers, len(hole_idents)))
+        try:
+            for result in pool.imap_unordered(_worker, hole_idents):
+                yield result
+        finally:
+            pool.terminate()
+
+    def _get_borehole(self, hole_ident, urls=None, name=None,
+                      get_analytes=True, raise_error=True):
+        """ Generates a pysiss.borehole.Borehole instance for the given
+            borehole. See `get_borehole` for details.
+
+            urls maps borehole identifiers to their urls, and defaults to the
+            cached borehole index.
+        """
         try:
             # Generate pysiss.borehole.Borehole instance to hold the data
             if name is None:
                 name = hole_ident
+            if urls is None:
+                urls = self.get_borehole_index()
             siss_bhl_generator = SISSBoreholeGenerator()
-            bh_url = self.get_borehole_idents_and_urls()[hole_ident]
-            response = requests.get(bh_url)
+            response = self._get(urls[hole_ident])
 
             # Break out now if the request fails
             if not response:
                 return None
             bhl = siss_bhl_generator.geosciml_to_borehole(
-                name, StringIO(response.content))
+                name, BytesIO(response.content), parser='iterparse')
 
             # For each dataset in the NVCL we want to add a dataset and store
             # the dataset information in the DatasetDetails
@@ -365,3 +623,168 @@ class NVCLImporter(object):
                 raise err
             else:
                 return None
+
+    def _get(self, url, stream=False, **kwargs):
+        """ Make a GET request using the pooled adapter, limiting the number
+            of concurrent requests to the host to `max_per_host`.
+
+            If the importer has a cache, the response is served from the cache
+            where possible. Keyword arguments are passed through to
+            `requests.Session.get`. For streamed requests, `response.raw`
+            yields the decoded body. Note that for uncached streamed requests
+            the limit only applies until the response headers have been
+            received.
+        """
+        host = urlparse(url).netloc
+        with self._host_lock:
+            if host not in self._host_limits:
+                self._host_limits[host] = \
+                    threading.BoundedSemaphore(self.max_per_host)
+            limit = self._host_limits[host]
+        kwargs.setdefault('timeout', self.timeout)
+        with limit:
+            if self.cache is not None:
+                return self.cache.get(self.session, url, stream=stream,
+                                      **kwargs)
+            response = self.session.get(url, stream=stream, **kwargs)
+        if stream:
+            response.raw.decode_content = True
+        return response
+
+
+def _read_scalars(fhandle, dataset_name, chunksize=10000, size_hint=None):
+    """ Parse an NVCL scalar CSV download into a PointDataSet in chunks.
+
+        Depths are parsed as floats, and each analyte is parsed into a column
+        of a preallocated block: analytes which contain only numbers go into a
+        float block, anything else into an object block. The blocks are
+        sized using `size_hint` and only grown if we run out of space, so peak
+        memory stays close to the size of the final dataset. Rows with
+        repeated start depths are dropped (as in `pandas.drop_duplicates`,
+        assuming that the rows are in depth order).
+
+        :param fhandle: A file-like object containing the CSV data
+        :type fhandle: file-like object
+        :param dataset_name: An identifier for the generated dataset
+        :type dataset_name: string
+        :param chunksize: The number of rows to parse at a time
+        :type chunksize: int
+        :param size_hint: The expected number of rows. Optional, defaults to
+            chunksize.
+        :type size_hint: int
+        :returns: a PointDataSet containing the analytes, or None if there is
+            no data
+    """
+    reader = pandas.read_csv(
+        fhandle, chunksize=chunksize,
+        dtype={SCALAR_START_COLUMN: numpy.float64,
+               SCALAR_END_COLUMN: numpy.float64})
+    nrows, last_depth = 0, None
+    depths = numeric = categorical = None
+    for chunk in reader:
+        # Set up our blocks using the first chunk
+        if depths is None:
+            analytes = [k for k in chunk.keys()
+                        if k not in (SCALAR_START_COLUMN, SCALAR_END_COLUMN)]
+            numeric_names = [k for k in analytes
+                             if _numeric_column(chunk[k]) is not None]
+            categorical_names = [k for k in analytes
+                                 if k not in numeric_names]
+            size = max(size_hint or 0, len(chunk))
+            depths = numpy.empty(size, dtype=numpy.float64)
+            numeric = numpy.empty((size, len(numeric_names)), order='F')
+            categorical = numpy.empty((size, len(categorical_names)),
+                                      dtype=object, order='F')
+
+        # Drop repeated depths
+        chunk_depths = chunk[SCALAR_START_COLUMN].values
+        keep = numpy.ones(len(chunk_depths), dtype=bool)
+        keep[1:] = chunk_depths[1:] != chunk_depths[:-1]
+        if last_depth is not None and len(chunk_depths):
+            keep[0] = chunk_depths[0] != last_depth
+        if len(chunk_depths):
+            last_depth = chunk_depths[-1]
+        chunk = chunk[keep]
+        nkeep = len(chunk)
+
+        # Grow our blocks if we've run out of space
+        if nrows + nkeep > len(depths):
+            size = max(2 * len(depths), nrows + nkeep)
+            depths = _grow_rows(depths, size)
+            numeric = _grow_rows(numeric, size)
+            categorical = _grow_rows(categorical, size)
+
+        # Copy data across
+        rows = slice(nrows, nrows + nkeep)
+        depths[rows] = chunk[SCALAR_START_COLUMN].values
+        for idx, name in enumerate(list(numeric_names)):
+            if name is None:
+                # Already moved to the categorical block
+                continue
+            values = _numeric_column(chunk[name])
+            if values is None:
+                # We've found a non-numeric value, so we need to treat this
+                # analyte as categorical from here on
+                numeric_names[idx] = None
+                categorical_names.append(name)
+                categorical = _add_column(categorical, numeric[:nrows, idx])
+                numeric[:, idx] = numpy.nan
+            else:
+                numeric[rows, idx] = values
+        for idx, name in enumerate(categorical_names):
+            categorical[rows, idx] = chunk[name].values
+        nrows += nkeep
+
+    # Check that we actually have some data
+    if not nrows:
+        return None
+
+    # Drop any columns which turned out not to be numeric
+    if None in numeric_names:
+        keep = [idx for idx, name in enumerate(numeric_names)
+                if name is not None]
+        numeric = numpy.asfortranarray(numeric[:, keep])
+        numeric_names = [numeric_names[idx] for idx in keep]
+
+    # Generate dataset, trimming our blocks to size
+    dataset = PointDataSet(dataset_name, depths[:nrows])
+    property_types = dict(
+        (name, PropertyType(name=name, long_name=name, units=None,
+                            description=None,
+                            isnumeric=name in numeric_names))
+        for name in numeric_names + categorical_names)
+    dataset._set_columns(
+        ColumnStore.from_blocks(numeric[:nrows], numeric_names,
+                                categorical[:nrows], categorical_names),
+        property_types)
+    return dataset
+
+
+def _numeric_column(series):
+    """ Return the values of a pandas series as floats, or None if they
+        aren't all numeric
+    """
+    try:
+        return pandas.to_numeric(series).values.astype(numpy.float64)
+    except (TypeError, ValueError):
+        return None
+
+
+def _grow_rows(block, size):
+    """ Return a copy of the block with room for the given number of rows
+    """
+    new_block = numpy.empty((size,) + block.shape[1:], dtype=block.dtype,
+                            order='F')
+    new_block[:len(block)] = block
+    return new_block
+
+
+def _add_column(block, values):
+    """ Return a copy of the block with an extra column, whose first values
+        are given by values
+    """
+    new_block = numpy.empty((block.shape[0], block.shape[1] + 1),
+                            dtype=block.dtype, order='F')
+    new_block[:, :-1] = block
+    new_block[:len(values), -1] = values
+    return new_block
@@ -50,8 +50,7 @@ setup(
     install_requires=[
         'matplotlib>=1.0',
         'numpy>=1.6',
-        'scipy>=0.9',
-        'OWSLib>=0.8',
+        'scipy>=0.19',
         'lxml',
         'simplejson>=3.0',
         'pandas>=0.10',
@@ -81,12 +81,9 @@ class BoreholeTest(unittest.TestCase):
         dataset.add_property(IMPEDANCE, impedances)
         self.assertTrue(
             all(depths == self.borehole.point_datasets["samples"].depths))
-        self.assertEquals(
-            densities,
-            self.borehole.point_datasets["samples"].properties["d"].values)
-        self.assertEquals(
-            impedances,
-            self.borehole.point_datasets["samples"].properties["imp"].values)
+        properties = self.borehole.point_datasets["samples"].properties
+        self.assertTrue(all(densities == properties["d"].values))
+        self.assertTrue(all(impedances == properties["imp"].values))
         self.assertEquals(
             "samples",
             self.borehole.point_datasets['samples'].name)
@@ -0,0 +1,138 @@
+""" file:   test_cache.py
+
+    description: Tests for the web service response cache
+"""
+
+import unittest
+import io
+import os
+import shutil
+import tempfile
+
+import requests
+from pysiss.webservices.cache import ResponseCache, replace_file
+
+
+class RecordingSession(object):
+
+    """ Stands in for a requests.Session, serving canned bodies and recording
+        the requests made
+    """
+
+    def __init__(self, bodies, etag=None):
+        self.bodies = bodies
+        self.etag = etag
+        self.requests = []
+
+    def get(self, url, params=None, headers=None, stream=False, **kwargs):
+        url = requests.Request('GET', url, params=params).prepare().url
+        self.requests.append((url, dict(headers or {})))
+        response = requests.Response()
+        response.url = url
+        if url not in self.bodies:
+            response.status_code = 404
+            response.raw = io.BytesIO(b'')
+        elif self.etag is not None \
+                and (headers or {}).get('If-None-Match') == self.etag:
+            response.status_code = 304
+            response.raw = io.BytesIO(b'')
+        else:
+            response.status_code = 200
+            response.raw = io.BytesIO(self.bodies[url])
+            if self.etag is not None:
+                response.headers['ETag'] = self.etag
+        return response
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.session = RecordingSession({
+            'http://a.org/data?id=1': b'one',
+            'http://a.org/data?id=2': b'two' * 10,
+        }, etag='"v1"')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def test_revalidate(self):
+        """ Check that cached responses are revalidated with their ETag
+        """
+        cache = ResponseCache(self.path)
+        for _ in range(2):
+            response = cache.get(self.session, 'http://a.org/data',
+                                 params={'id': 1})
+            self.assertEqual(response.content, b'one')
+        self.assertEqual(len(self.session.requests), 2)
+        self.assertEqual(self.session.requests[1][1]['If-None-Match'],
+                         '"v1"')
+
+    def test_max_age(self):
+        """ Check that fresh responses are served without a request
+        """
+        cache = ResponseCache(self.path, max_age=3600)
+        cache.get(self.session, 'http://a.org/data?id=1')
+        response = cache.get(self.session, 'http://a.org/data?id=1')
+        self.assertEqual(response.text, u'one')
+        self.assertEqual(len(self.session.requests), 1)
+
+    def test_stream(self):
+        """ Check that streamed responses give a file-like raw attribute
+        """
+        cache = ResponseCache(self.path)
+        response = cache.get(self.session, 'http://a.org/data?id=2',
+                             stream=True)
+        with response.raw:
+            self.assertEqual(response.raw.read(), b'two' * 10)
+
+    def test_errors_not_cached(self):
+        """ Check that error responses are passed through
+        """
+        cache = ResponseCache(self.path)
+        response = cache.get(self.session, 'http://a.org/missing')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(cache), 0)
+
+    def test_offline(self):
+        """ Check that offline caches only serve recorded responses
+        """
+        ResponseCache(self.path).get(self.session, 'http://a.org/data?id=1')
+        cache = ResponseCache(self.path, offline=True)
+        response = cache.get(self.session, 'http://a.org/data?id=1')
+        self.assertEqual(response.content, b'one')
+        self.assertRaises(KeyError, cache.get, self.session,
+                          'http://a.org/data?id=2')
+        self.assertEqual(len(self.session.requests), 1)
+
+    def test_evict(self):
+        """ Check that least recently used responses are evicted
+        """
+        cache = ResponseCache(self.path, max_size=32)
+        cache.get(self.session, 'http://a.org/data?id=1')
+
+        # Make sure the first response looks older than the second
+        fname = os.path.join(self.path,
+                             cache.key('http://a.org/data?id=1') + '.json')
+        used = os.path.getmtime(fname) - 10
+        os.utime(fname, (used, used))
+        cache.get(self.session, 'http://a.org/data?id=2')
+        self.assertEqual(len(cache), 1)
+        self.assertEqual(cache._keys(), [cache.key('http://a.org/data?id=2')])
+
+    def test_replace_file(self):
+        """ Check that files can be replaced
+        """
+        source, destination = [os.path.join(self.path, fname)
+                               for fname in ('source', 'destination')]
+        for fname, data in ((source, b'new'), (destination, b'old')):
+            with open(fname, 'wb') as fhandle:
+                fhandle.write(data)
+        replace_file(source, destination)
+        self.assertFalse(os.path.exists(source))
+        with open(destination, 'rb') as fhandle:
+            self.assertEqual(fhandle.read(), b'new')
+
+
+if __name__ == '__main__':
+    unittest.main()
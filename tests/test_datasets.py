@@ -0,0 +1,570 @@
+#!/usr/bin/env python
+""" file:   test_datasets.py
+
+    description: Unit tests for resampling and querying borehole datasets.
+"""
+
+from pysiss import borehole as pybh
+from pysiss.borehole.datasets import point_dataset
+import numpy
+import os
+import shutil
+import tempfile
+import unittest
+from scipy.interpolate import InterpolatedUnivariateSpline as Spline
+
+DENSITY = pybh.PropertyType(name="d",
+                            long_name="density",
+                            units="g/cm3")
+
+# bogus unit from original spreadsheet
+IMPEDANCE = pybh.PropertyType(name="imp",
+                              long_name="impedance",
+                              units="kg/m2.s.10-3")
+
+ROCK_TYPE = pybh.PropertyType(name="rock", long_name="rock type")
+
+
+class PointDataSetResampleTest(unittest.TestCase):
+
+    """ Tests for PointDataSet resampling
+    """
+
+    def setUp(self):
+        numpy.random.seed(42)
+        self.depths = numpy.cumsum(numpy.random.uniform(0.1, 1, 200))
+        self.dataset = pybh.PointDataSet('test', self.depths)
+        self.dataset.add_property(DENSITY, numpy.random.normal(size=200))
+        self.dataset.add_property(IMPEDANCE, numpy.random.normal(size=200))
+        self.dataset.split_at_gaps()
+
+    def test_nearest_indices(self):
+        """ Nearest neighbour indices should match a brute-force search
+        """
+        new_depths = numpy.linspace(self.depths[0] - 1,
+                                    self.depths[-1] + 1, 1000)
+        expected = numpy.argmin(
+            (self.depths - new_depths[:, numpy.newaxis]) ** 2, axis=-1)
+        self.assertTrue(numpy.all(
+            expected == self.dataset.get_nearest_indices(new_depths)))
+
+    def test_nearest_indices_ties(self):
+        """ Ties should be broken towards the shallower sample
+        """
+        dataset = pybh.PointDataSet('test', [1., 2., 3.])
+        self.assertTrue(numpy.all(
+            dataset.get_nearest_indices([1.5, 2.5]) == [0, 1]))
+
+    def test_resample_nearest(self):
+        """ Nearest neighbour resampling should pick existing values
+        """
+        new_depths = numpy.linspace(self.depths[0], self.depths[-1], 50)
+        resampled = self.dataset.resample(new_depths, degree=0,
+                                          fill_method='interpolate')
+        indices = self.dataset.get_nearest_indices(new_depths)
+        self.assertTrue(numpy.all(
+            resampled.properties['d'].values
+            == self.dataset.properties['d'].values[indices]))
+
+    def test_resample_spline(self):
+        """ Stacked spline resampling should match a per-property spline
+        """
+        new_depths = numpy.linspace(self.depths[0], self.depths[-1], 500)
+        for degree in (1, 2, 3):
+            resampled = self.dataset.resample(new_depths, degree=degree,
+                                              fill_method='interpolate')
+            for name, prop in self.dataset.properties.items():
+                expected = Spline(self.depths, prop.values,
+                                  k=degree)(new_depths)
+                self.assertTrue(numpy.allclose(
+                    expected, resampled.properties[name].values))
+
+    def test_fill_methods(self):
+        """ Gaps should be filled for every fill method
+        """
+        depths = numpy.concatenate((numpy.arange(0, 10, 0.1),
+                                    numpy.arange(20, 30, 0.1)))
+        dataset = pybh.PointDataSet('gappy', depths)
+        dataset.add_property(DENSITY, numpy.arange(len(depths), dtype=float))
+        dataset.split_at_gaps()
+        self.assertEqual(len(dataset.gaps), 1)
+        for fill_method in ('mean', 'median', 'local mean', 'local median'):
+            resampled = dataset.regularize(fill_method=fill_method)
+            gap_values = resampled.get_interval(12, 18).properties['d'].values
+            self.assertTrue(len(gap_values) > 0)
+            self.assertTrue(numpy.allclose(gap_values, gap_values[0]))
+        self.assertRaises(NotImplementedError,
+                          dataset.regularize, fill_method='bogus')
+
+
+class MemmapPointDataSetTest(unittest.TestCase):
+
+    """ Tests for memory-mapped PointDataSets
+    """
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.depths = numpy.concatenate([numpy.arange(0, 10, 0.1),
+                                         numpy.arange(20, 30, 0.1)])
+        self.depths_file = os.path.join(self.tempdir, 'depths.npy')
+        numpy.save(self.depths_file, self.depths)
+        self.numeric_file = os.path.join(self.tempdir, 'numeric.npy')
+        numeric = numpy.lib.format.open_memmap(
+            self.numeric_file, mode='w+', shape=(200, 2), fortran_order=True)
+        numeric[:, 0] = numpy.sin(self.depths)
+        numeric[:, 1] = numpy.cos(self.depths)
+        del numeric
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def test_from_npy(self):
+        """ Values should be mapped from disk
+        """
+        dataset = pybh.PointDataSet.from_npy(
+            'test', self.depths_file, self.numeric_file, ['d', 'imp'],
+            property_types={'d': DENSITY})
+        self.assertEqual(dataset.size, 200)
+        self.assertTrue(isinstance(dataset.columns.column('d').base,
+                                   numpy.memmap))
+        self.assertEqual(dataset.properties['d'].property_type.units,
+                         'g/cm3')
+        self.assertTrue(numpy.allclose(dataset.properties['imp'].values,
+                                       numpy.cos(self.depths)))
+
+        # Intervals are views onto the mapped data
+        interval = dataset.get_interval(20, 25)
+        self.assertTrue(numpy.allclose(interval.properties['d'].values,
+                                       numpy.sin(interval.depths)))
+
+    def test_unsorted(self):
+        """ Unsorted depths should be caught unless trusted
+        """
+        numpy.save(self.depths_file, self.depths[::-1])
+        self.assertRaises(AssertionError, pybh.PointDataSet.from_npy,
+                          'test', self.depths_file)
+        pybh.PointDataSet.from_npy('test', self.depths_file, trusted=True)
+
+    def test_blockwise(self):
+        """ Blockwise checks should match the whole-array versions
+        """
+        self.assertTrue(point_dataset._is_increasing(self.depths, 7))
+        depths = self.depths.copy()
+        depths[70] = depths[69]
+        self.assertFalse(point_dataset._is_increasing(depths, 7))
+        self.assertTrue(numpy.allclose(
+            point_dataset._median_spacing(self.depths, 7), 0.1))
+
+        # Blocks should cover the whole array
+        blocks = list(point_dataset._iter_blocks(self.depths, 7, overlap=1))
+        self.assertEqual(blocks[-1][0] + len(blocks[-1][1]), 200)
+
+    def test_median_spacing(self):
+        """ The median spacing should be exact for mapped depths
+        """
+        # The block medians are 1, 1, 3 and 3 but the true median is 1
+        spacings = [1] * 14 + [3] * 10
+        depths = numpy.concatenate([[0], numpy.cumsum(spacings)]) * 1.
+        self.assertEqual(point_dataset._median_spacing(depths, 7),
+                         numpy.median(spacings))
+        numpy.save(self.depths_file, depths)
+        mapped = numpy.load(self.depths_file, mmap_mode='r')
+        self.assertEqual(point_dataset._median_spacing(mapped, 7),
+                         numpy.median(spacings))
+
+    def test_select_spacing(self):
+        """ Blockwise selection should match a full sort of the spacings
+        """
+        random = numpy.random.RandomState(0)
+        for npoints in (30, 31):
+            depths = numpy.cumsum(random.exponential(size=npoints))
+            spacings = numpy.sort(numpy.diff(depths))
+            self.assertEqual(point_dataset._median_spacing(depths, 7),
+                             numpy.median(spacings))
+            for k in range(len(spacings)):
+                self.assertEqual(
+                    point_dataset._select_spacing(depths, k, 7, nbins=4),
+                    spacings[k])
+
+    def test_split_and_iterate(self):
+        """ Gaps and dataframes should be found a block at a time
+        """
+        dataset = pybh.PointDataSet.from_npy(
+            'test', self.depths_file, self.numeric_file, ['d', 'imp'])
+        subdatasets, gaps = dataset.split_at_gaps()
+        self.assertEqual(len(gaps), 1)
+        self.assertTrue(numpy.allclose(gaps[0], (9.9, 20)))
+        frames = list(dataset.iter_dataframes(blocksize=64))
+        self.assertEqual([len(f) for f in frames], [64, 64, 64, 8])
+        self.assertTrue(numpy.allclose(frames[-1]['d'],
+                                       numpy.sin(self.depths[-8:])))
+
+
+class ExtendPointDataSetTest(unittest.TestCase):
+
+    """ Tests for appending samples to PointDataSets
+    """
+
+    def setUp(self):
+        numpy.random.seed(42)
+        self.dataset = pybh.PointDataSet('test', numpy.arange(10.))
+        self.dataset.add_property(DENSITY, numpy.arange(10.))
+        self.dataset.add_property(ROCK_TYPE, ['a'] * 10)
+
+    def test_extend(self):
+        """ New samples should be added to every property
+        """
+        self.dataset.extend([10., 11.], {'d': [1., 2.], 'rock': ['b', 'c']})
+        self.dataset.append(12., {'d': 3., 'rock': 'd'})
+        self.assertEqual(self.dataset.size, 13)
+        self.assertTrue(numpy.allclose(self.dataset.depths, numpy.arange(13)))
+        self.assertTrue(numpy.allclose(
+            self.dataset.properties['d'].values[-3:], [1., 2., 3.]))
+        self.assertEqual(list(self.dataset.properties['rock'].values[-4:]),
+                         ['a', 'b', 'c', 'd'])
+        self.assertEqual(len(self.dataset.to_dataframe()), 13)
+
+    def test_bad_extend(self):
+        """ Samples should be deeper than existing ones and have every value
+        """
+        self.assertRaises(AssertionError, self.dataset.extend, [5.],
+                          {'d': [1.], 'rock': ['b']})
+        self.assertRaises(KeyError, self.dataset.extend, [15.], {'d': [1.]})
+        self.assertEqual(self.dataset.size, 10)
+
+    def test_gaps(self):
+        """ Tracked gaps should match gaps found from scratch
+        """
+        self.dataset.split_at_gaps()
+        last = self.dataset.depths[-1]
+        for batch in range(50):
+            # Halfway through, the sample spacing drops so that old spacings
+            # become gaps
+            spacings = numpy.random.uniform(0.5, 1.5, 50)
+            if batch >= 20:
+                spacings /= 20.
+            if numpy.random.uniform() < 0.3:
+                spacings[numpy.random.randint(50)] = 20.
+            depths = last + numpy.cumsum(spacings)
+            last = depths[-1]
+            self.dataset.extend(depths, {'d': spacings, 'rock': ['a'] * 50})
+
+            fresh = pybh.PointDataSet('fresh', self.dataset.depths)
+            fresh.split_at_gaps()
+            self.assertEqual(self.dataset.gaps, fresh.gaps)
+            self.assertEqual(self.dataset.subdatasets, fresh.subdatasets)
+
+    def test_gap_tracker(self):
+        """ The running median should match the exact median
+        """
+        tracker = pybh.datasets.GapTracker()
+        depths = numpy.cumsum(numpy.random.uniform(0.1, 1, 101))
+        for stop in (1, 2, 3, 40, 41, 101):
+            tracker.update(depths[:stop])
+            if stop > 1:
+                self.assertAlmostEqual(tracker.median,
+                                       numpy.median(numpy.diff(depths[:stop])))
+
+
+class ColumnStoreTest(unittest.TestCase):
+
+    """ Tests for the columnar property store
+    """
+
+    def setUp(self):
+        self.dataset = pybh.IntervalDataSet('test', [1, 2, 4], [2, 3, 5])
+        self.dataset.add_property(DENSITY, [2.8, 2.9, 3.0])
+        self.dataset.add_property(ROCK_TYPE,
+                                  [['SA', 'CA'], ['SL', 'CA'], ['SC', 'FE']])
+
+    def test_blocks(self):
+        """ Numeric and categorical values should go in separate blocks
+        """
+        columns = self.dataset.columns
+        self.assertEqual(columns.numeric_names, ['d'])
+        self.assertEqual(columns.categorical_names, ['rock'])
+        self.assertEqual(columns.numeric.shape, (3, 1))
+        self.assertEqual(['SC', 'FE'],
+                         self.dataset.properties['rock'].values[-1])
+
+    def test_property_views(self):
+        """ Properties should stay views onto the store as it grows
+        """
+        prop = self.dataset.properties['d']
+        for idx in range(10):
+            self.dataset.add_property(
+                pybh.PropertyType('p{0}'.format(idx)), numpy.ones(3) * idx)
+        self.dataset.columns.numeric[0, 0] = 10
+        self.assertEqual(prop.values[0], 10)
+        self.assertEqual(self.dataset.columns.numeric.shape, (3, 11))
+
+    def test_take_slice_is_view(self):
+        """ Taking a slice of the store shouldn't copy the values
+        """
+        view = self.dataset.columns.take(slice(1, 3))
+        view.column('d')[0] = 10
+        self.assertEqual(self.dataset.properties['d'].values[1], 10)
+
+    def test_to_dataframe(self):
+        """ Dataframes should contain all the columns
+        """
+        frame = self.dataset.to_dataframe()
+        self.assertEqual(sorted(frame.columns), ['d', 'rock'])
+        self.assertTrue(numpy.allclose(frame['d'], [2.8, 2.9, 3.0]))
+
+    def test_to_point_dataset_copies(self):
+        """ Point datasets made from interval datasets shouldn't share values
+        """
+        points = self.dataset.to_point_dataset()
+        points.properties['d'].values[0] = 10
+        self.assertEqual(self.dataset.properties['d'].values[0], 2.8)
+
+    def test_to_point_dataset_unicode(self):
+        """ Unicode method names should work too
+        """
+        points = self.dataset.to_point_dataset(depths=u'midpoint')
+        self.assertTrue(numpy.allclose(
+            points.depths, self.dataset.to_point_dataset().depths))
+
+
+class GetIntervalTest(unittest.TestCase):
+
+    """ Tests for selecting depth windows from datasets
+    """
+
+    def setUp(self):
+        self.points = pybh.PointDataSet('points', numpy.arange(0, 10, 0.5))
+        self.points.add_property(DENSITY, numpy.arange(20, dtype=float))
+        self.intervals = pybh.IntervalDataSet(
+            'intervals', [0, 1, 3, 4], [1, 2, 4, 6])
+        self.intervals.add_property(DENSITY, [1., 2., 3., 4.])
+
+    def test_point_interval(self):
+        """ Point windows should include both end points
+        """
+        window = self.points.get_interval(2, 4)
+        self.assertTrue(numpy.all(window.depths == [2, 2.5, 3, 3.5, 4]))
+        self.assertTrue(numpy.all(
+            window.properties['d'].values == [4, 5, 6, 7, 8]))
+        self.assertTrue(numpy.all(
+            self.points.get_interval_indices(2, 4) == [4, 5, 6, 7, 8]))
+
+    def test_point_interval_is_view(self):
+        """ Point windows should share data with the parent dataset
+        """
+        window = self.points.get_interval(2, 4)
+        self.assertTrue(numpy.may_share_memory(window.depths,
+                                               self.points.depths))
+        window.properties['d'].values[0] = -1
+        self.assertEqual(self.points.properties['d'].values[4], -1)
+
+    def test_interval_interval(self):
+        """ Interval windows should only contain complete intervals
+        """
+        window = self.intervals.get_interval(0.5, 4.5)
+        self.assertTrue(numpy.all(window.from_depths == [1, 3]))
+        self.assertTrue(numpy.all(window.to_depths == [2, 4]))
+        self.assertTrue(numpy.all(window.properties['d'].values == [2, 3]))
+        self.assertTrue(numpy.may_share_memory(
+            window.columns.numeric, self.intervals.columns.numeric))
+
+    def test_empty_interval(self):
+        """ Empty windows should raise an AssertionError
+        """
+        self.assertRaises(AssertionError,
+                          self.points.get_interval, 2.1, 2.2)
+        self.assertRaises(AssertionError,
+                          self.intervals.get_interval, 1.5, 2.5)
+
+
+class IntervalIndexTest(unittest.TestCase):
+
+    """ Tests for looking up intervals in an IntervalDataSet
+    """
+
+    def setUp(self):
+        self.dataset = pybh.IntervalDataSet(
+            'intervals', [0, 1, 3, 4], [1, 2, 4, 6])
+
+    def test_lookup(self):
+        """ Depths should map to the interval containing them
+        """
+        depths = [-1, 0, 0.5, 1, 1.5, 2, 2.5, 3, 4, 5, 6, 7]
+        expected = [-1, 0, 0, 1, 1, 1, -1, 2, 3, 3, 3, -1]
+        self.assertEqual(list(self.dataset.index.lookup(depths)), expected)
+
+    def test_lookup_matches_scan(self):
+        """ Lookups should match a brute-force scan over the intervals
+        """
+        depths = numpy.random.uniform(-1, 7, 1000)
+        found = self.dataset.index.lookup(depths)
+        for depth, idx in zip(depths, found):
+            inside = numpy.flatnonzero(
+                (self.dataset.from_depths <= depth)
+                & (self.dataset.to_depths > depth))
+            self.assertEqual(idx, inside[0] if len(inside) else -1)
+
+    def test_overlapping(self):
+        """ Ranges should return the intervals overlapping them
+        """
+        index = self.dataset.index
+        self.assertEqual(index.overlapping(0.5, 3.5), slice(0, 3))
+        self.assertEqual(index.overlapping(2, 3), slice(2, 2))
+        self.assertEqual(index.overlapping(5, 10), slice(3, 4))
+        starts, stops = index.overlapping_ranges([0.5, 2, 5], [3.5, 3, 10])
+        self.assertEqual(list(starts), [0, 2, 3])
+        self.assertEqual(list(stops), [3, 2, 4])
+
+
+class MergeIntervalDataSetTest(unittest.TestCase):
+
+    """ Tests for merging interval datasets
+    """
+
+    def setUp(self):
+        self.borehole = pybh.Borehole('test')
+        geology = self.borehole.add_interval_dataset(
+            'geology', [0, 2, 5], [2, 4, 8])
+        geology.add_property(ROCK_TYPE, ['SA', 'SL', 'SC'])
+        assay = self.borehole.add_interval_dataset(
+            'assay', [1, 3, 6], [3, 5, 7])
+        assay.add_property(DENSITY, [1., 2., 3.])
+
+    def test_merge(self):
+        """ Merged intervals should have the union of the boundaries
+        """
+        merged = self.borehole.add_merged_interval_dataset(
+            'merged', 'geology', 'assay')
+        self.assertTrue(self.borehole.interval_datasets['merged'] is merged)
+        self.assertEqual(list(merged.from_depths), [0, 1, 2, 3, 4, 5, 6, 7])
+        self.assertEqual(list(merged.to_depths), [1, 2, 3, 4, 5, 6, 7, 8])
+        self.assertEqual(list(merged.properties['rock'].values),
+                         ['SA', 'SA', 'SL', 'SL', None, 'SC', 'SC', 'SC'])
+        density = merged.properties['d'].values
+        self.assertTrue(numpy.allclose(density[[1, 2, 3, 4, 6]],
+                                       [1, 1, 2, 2, 3]))
+        self.assertTrue(numpy.all(numpy.isnan(density[[0, 5, 7]])))
+
+    def test_merge_many(self):
+        """ We should be able to merge more than two datasets, with name
+            clashes being resolved by prefixing the dataset name
+        """
+        extra = self.borehole.add_interval_dataset('extra', [10], [12])
+        extra.add_property(DENSITY, [4.])
+        merged = self.borehole.add_merged_interval_dataset(
+            'merged', 'geology', 'assay', 'extra')
+        self.assertEqual(sorted(merged.properties.keys()),
+                         ['d', 'extra: d', 'rock'])
+        self.assertEqual(merged.to_depths[-1], 12)
+        self.assertEqual(merged.properties['extra: d'].values[-1], 4.)
+        self.assertEqual(merged.properties['extra: d'].property_type.units,
+                         DENSITY.units)
+        # The gap between 8 and 10 shouldn't be filled
+        self.assertEqual(merged.index.lookup(9), -1)
+
+
+class ProjectIntervalDataSetTest(unittest.TestCase):
+
+    """ Tests for projecting interval datasets onto point datasets
+    """
+
+    def setUp(self):
+        self.intervals = pybh.IntervalDataSet('assay', [0, 1, 3], [1, 2, 4])
+        self.intervals.add_property(DENSITY, [1., 2., 3.])
+        self.intervals.add_property(ROCK_TYPE, ['SA', 'SL', 'SC'])
+
+    def test_project_depths(self):
+        """ Interval values should be projected onto arbitrary depths
+        """
+        points = self.intervals.to_point_dataset(
+            depths=[0.5, 1.5, 2.5, 3.5, 4.5])
+        density = points.properties['d'].values
+        self.assertTrue(numpy.allclose(density[[0, 1, 3]], [1, 2, 3]))
+        self.assertTrue(numpy.all(numpy.isnan(density[[2, 4]])))
+        self.assertEqual(list(points.properties['rock'].values),
+                         ['SA', 'SL', None, 'SC', None])
+
+    def test_project_dataset(self):
+        """ Interval values should be projected onto an existing dataset
+        """
+        scanner = pybh.PointDataSet('scanner', numpy.arange(0, 5, 0.25))
+        points = self.intervals.to_point_dataset(
+            name='projected', depths=scanner, fill_value=-1)
+        self.assertEqual(points.name, 'projected')
+        self.assertTrue(numpy.all(points.depths == scanner.depths))
+        self.assertEqual(points.properties['d'].values[-1], -1)
+        self.assertEqual(points.properties['d'].values[5], 2)
+
+    def test_unknown_method(self):
+        """ Unknown depth converters should raise a ValueError
+        """
+        self.assertRaises(ValueError, self.intervals.to_point_dataset,
+                          depths='bogus')
+
+
+class CompositeIntervalDataSetTest(unittest.TestCase):
+
+    """ Tests for compositing interval datasets
+    """
+
+    def setUp(self):
+        self.intervals = pybh.IntervalDataSet(
+            'assay', [0, 0.5, 2, 3.5], [0.5, 1.5, 3, 4])
+        self.intervals.add_property(DENSITY, [1., 2., 3., numpy.nan])
+        self.intervals.add_property(IMPEDANCE, [1., 1., 1., 1.])
+        self.intervals.add_property(ROCK_TYPE, ['SA', 'SL', 'SC', 'SC'])
+
+    def brute_force(self, from_depth, to_depth, values):
+        """ Length-weighted mean over a single interval using a loop
+        """
+        total, covered = 0., 0.
+        for top, bottom, value in zip(self.intervals.from_depths,
+                                      self.intervals.to_depths, values):
+            overlap = min(bottom, to_depth) - max(top, from_depth)
+            if overlap > 0 and not numpy.isnan(value):
+                total += overlap * value
+                covered += overlap
+        return total / covered if covered else numpy.nan, covered
+
+    def test_composite(self):
+        """ Composites should be the length-weighted mean of the values
+        """
+        composite = self.intervals.composite(interval=1.)
+        self.assertEqual(list(composite.from_depths), [0, 1, 2, 3])
+        self.assertEqual(list(composite.to_depths), [1, 2, 3, 4])
+        self.assertEqual(sorted(composite.properties.keys()), ['d', 'imp'])
+        for name in ('d', 'imp'):
+            values = self.intervals.properties[name].values
+            for idx, top in enumerate(composite.from_depths):
+                expected, _ = self.brute_force(top, top + 1, values)
+                result = composite.properties[name].values[idx]
+                if numpy.isnan(expected):
+                    self.assertTrue(numpy.isnan(result))
+                else:
+                    self.assertAlmostEqual(expected, result)
+
+    def test_min_coverage(self):
+        """ Intervals with too little coverage should be NaN
+        """
+        composite = self.intervals.composite(interval=1., min_coverage=0.75)
+        density = composite.properties['d'].values
+        impedance = composite.properties['imp'].values
+        self.assertTrue(numpy.allclose(density[[0, 2]], [1.5, 3]))
+        self.assertTrue(numpy.all(numpy.isnan(density[[1, 3]])))
+        self.assertTrue(numpy.allclose(impedance[[0, 2]], 1))
+        self.assertTrue(numpy.all(numpy.isnan(impedance[[1, 3]])))
+        composite = self.intervals.composite(interval=1., min_coverage=0.5)
+        self.assertTrue(numpy.allclose(composite.properties['imp'].values, 1))
+
+    def test_partial_last_interval(self):
+        """ The last interval should be truncated to the range
+        """
+        composite = self.intervals.composite(interval=1.5, from_depth=0.25)
+        self.assertTrue(numpy.allclose(composite.from_depths,
+                                       [0.25, 1.75, 3.25]))
+        self.assertTrue(numpy.allclose(composite.to_depths,
+                                       [1.75, 3.25, 4]))
+
+
+if __name__ == "__main__":
+    unittest.main()
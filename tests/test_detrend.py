@@ -9,6 +9,7 @@
 
 import unittest
 import numpy
+from pysiss.borehole import PointDataSet, PropertyType
 from pysiss.borehole.analysis import detrend
 
 
@@ -53,3 +54,36 @@ class TestDetrend(unittest.TestCase):
         data = numpy.linspace(0, 1)
         detrend(data)
         self.assertTrue(self.narray_eq(data, self.expected['linear']))
+
+    def test_detrend_2d(self):
+        """ Each column of a 2D array should be detrended at once
+        """
+        depths = numpy.linspace(0, 1)
+        for trend, degree in (('linear', 1), ('quadratic', 2),
+                              ('cubic', 3)):
+            data = numpy.column_stack(
+                [numpy.polyval(numpy.random.normal(size=degree + 1), depths)
+                 for _ in range(5)])
+            self.assertEqual(detrend(data, trend), None)
+            self.assertTrue(self.narray_eq(data, 0))
+
+    def test_detrend_dataset(self):
+        """ All the numeric properties in a dataset should be detrended
+            against depth
+        """
+        depths = numpy.cumsum(numpy.random.uniform(0.1, 1, 50))
+        dataset = PointDataSet('test', depths)
+        dataset.add_property(PropertyType('a'), 2 * depths + 1)
+        dataset.add_property(PropertyType('b'), depths ** 2 - depths)
+        detrend(dataset, 'quadratic')
+        self.assertTrue(self.narray_eq(dataset.properties['a'].values, 0))
+        self.assertTrue(self.narray_eq(dataset.properties['b'].values, 0))
+
+    def test_detrend_func_2d(self):
+        """ Custom trend functions should be fitted column by column
+        """
+        data = numpy.column_stack((numpy.linspace(0, 1),
+                                   numpy.linspace(1, 3)))
+        detrend(data, func=lambda b, x: b[1] * x + b[0],
+                param_guess=[1, 0])
+        self.assertTrue(self.narray_eq(data, 0))
@@ -7,6 +7,18 @@
 """
 
 import unittest
+import BaseHTTPServer
+import collections
+import numpy
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+import requests
+from multiprocessing.pool import ThreadPool
+from requests.compat import urlparse
 import pysiss.webservices.nvcl as nvcl
 
 
@@ -57,6 +69,332 @@ class TestNVCLEndpointRegistry(unittest.TestCase):
             pass
 
 
+class TestReadScalars(unittest.TestCase):
+
+    """ Test chunked parsing of NVCL scalar downloads
+    """
+
+    csv = (u'StartDepth,EndDepth,Albedo,Min1\n'
+           u'1.0,1.0,0.5,Kaolinite\n'
+           u'1.0,1.0,0.5,Kaolinite\n'
+           u'2.0,2.0,0.6,Muscovite\n'
+           u'3.0,3.0,,Kaolinite\n'
+           u'3.0,3.0,,Kaolinite\n'
+           u'4.0,4.0,0.8,\n'
+           u'5.0,5.0,0.9,Chlorite\n')
+
+    def read(self, **kwargs):
+        return nvcl._read_scalars(io.StringIO(self.csv), 'test', **kwargs)
+
+    def test_read(self):
+        """ Check that the CSV is parsed and duplicate depths are dropped
+        """
+        for chunksize in (1, 2, 3, 100):
+            dataset = self.read(chunksize=chunksize, size_hint=2)
+            self.assertTrue(numpy.allclose(dataset.depths,
+                                           [1., 2., 3., 4., 5.]))
+            albedo = dataset.properties['Albedo']
+            self.assertTrue(albedo.property_type.isnumeric)
+            self.assertTrue(numpy.allclose(albedo.values,
+                                           [0.5, 0.6, numpy.nan, 0.8, 0.9],
+                                           equal_nan=True))
+            mineral = dataset.properties['Min1']
+            self.assertFalse(mineral.property_type.isnumeric)
+            self.assertEqual(list(mineral.values[:3]),
+                             ['Kaolinite', 'Muscovite', 'Kaolinite'])
+
+    def test_late_categorical(self):
+        """ Check that a column which turns out not to be numeric is kept
+        """
+        self.csv = self.csv.replace(u'5.0,5.0,0.9', u'5.0,5.0,high')
+        dataset = self.read(chunksize=2)
+        albedo = dataset.properties['Albedo']
+        self.assertFalse(albedo.property_type.isnumeric)
+        self.assertEqual(albedo.values[1], 0.6)
+        self.assertEqual(albedo.values[-1], 'high')
+        self.assertEqual(dataset.columns.numeric.shape, (5, 0))
+
+    def test_middle_categorical(self):
+        """ Check that a column can turn non-numeric before the last chunk
+        """
+        self.csv = self.csv.replace(u'2.0,2.0,0.6', u'2.0,2.0,high')
+        for chunksize in (1, 2):
+            dataset = self.read(chunksize=chunksize)
+            albedo = dataset.properties['Albedo']
+            self.assertFalse(albedo.property_type.isnumeric)
+            self.assertEqual(list(albedo.values[[0, 1, 3, 4]]),
+                             [0.5, 'high', 0.8, 0.9])
+            self.assertEqual(dataset.columns.numeric.shape, (5, 0))
+
+    def test_stream_closed(self):
+        """ Check that streamed responses are closed after parsing
+        """
+        response = requests.Response()
+        response.status_code = 200
+        response.raw = io.BytesIO(self.csv.encode('utf-8'))
+        importer = nvcl.NVCLImporter('CSIRO')
+        importer._get_logs = lambda ident: [('Albedo', 'albedo', 7),
+                                            ('Min1', 'min1', 7)]
+        importer._get = lambda url, stream=False: response
+        dataset = importer.get_analytes('hole', 'test', 'dataset',
+                                        stream=True)
+        self.assertEqual(dataset.size, 5)
+        self.assertTrue(response.raw.closed)
+
+    def test_empty(self):
+        """ Check that an empty download gives no dataset
+        """
+        self.csv = u'StartDepth,EndDepth,Albedo\n'
+        self.assertTrue(self.read() is None)
+
+
+class TestBoreholeIndex(unittest.TestCase):
+
+    """ Test caching of the scanned borehole index
+    """
+
+    def setUp(self):
+        self.tempdir = tempfile.mkdtemp()
+        self.index_path = os.path.join(self.tempdir, 'index.json')
+        self.fetches = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.tempdir)
+
+    def make_importer(self, **kwargs):
+        """ Make an importer which counts index fetches instead of hitting
+            the WFS
+        """
+        def fetch(maxids=None):
+            self.fetches += 1
+            return {'hole_a': 'a/url', 'hole_b': 'b/url'}
+
+        importer = nvcl.NVCLImporter('CSIRO', **kwargs)
+        importer.get_borehole_idents_and_urls = fetch
+        return importer
+
+    def test_cached(self):
+        """ Check that the index is only fetched once
+        """
+        importer = self.make_importer()
+        for _ in range(3):
+            self.assertEqual(importer.get_borehole_index()['hole_b'],
+                             'b/url')
+        self.assertEqual(sorted(importer.get_borehole_idents()),
+                         ['hole_a', 'hole_b'])
+        self.assertEqual(self.fetches, 1)
+        importer.refresh_borehole_index()
+        self.assertEqual(self.fetches, 2)
+
+    def test_ttl(self):
+        """ Check that a stale index is refetched
+        """
+        importer = self.make_importer(index_ttl=0)
+        importer.get_borehole_index()
+        importer.get_borehole_index()
+        self.assertEqual(self.fetches, 2)
+
+    def test_persist(self):
+        """ Check that the index is shared between runs via index_path
+        """
+        self.make_importer(index_path=self.index_path).get_borehole_index()
+        index = self.make_importer(
+            index_path=self.index_path).get_borehole_index()
+        self.assertEqual(index['hole_a'], 'a/url')
+        self.assertEqual(self.fetches, 1)
+
+        # Stale indices on disk are ignored
+        self.make_importer(index_path=self.index_path,
+                           index_ttl=0).get_borehole_index()
+        self.assertEqual(self.fetches, 2)
+
+    def test_corrupt(self):
+        """ Check that a corrupt index on disk is refetched and replaced
+        """
+        with open(self.index_path, 'w') as fhandle:
+            fhandle.write('{"wfsurl": "http://')
+        index = self.make_importer(
+            index_path=self.index_path).get_borehole_index()
+        self.assertEqual(index['hole_a'], 'a/url')
+        self.assertEqual(self.fetches, 1)
+        self.make_importer(index_path=self.index_path).get_borehole_index()
+        self.assertEqual(self.fetches, 1)
+        self.assertEqual(os.listdir(self.tempdir), ['index.json'])
+
+
+class FlakyHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+
+    """ Fails with a 503 for the first `failures` requests
+    """
+
+    failures = 0
+    requests = 0
+
+    def do_GET(self):
+        FlakyHandler.requests += 1
+        if FlakyHandler.requests <= FlakyHandler.failures:
+            self.send_response(503)
+            self.end_headers()
+        else:
+            self.send_response(200)
+            self.send_header('Content-Length', '2')
+            self.end_headers()
+            self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+class CountingAdapter(requests.adapters.BaseAdapter):
+
+    """ Stands in for an HTTPAdapter, recording the number of requests in
+        flight to each host
+    """
+
+    def __init__(self):
+        super(CountingAdapter, self).__init__()
+        self.lock = threading.Lock()
+        self.active = collections.defaultdict(int)
+        self.max_active = collections.defaultdict(int)
+
+    def send(self, request, **kwargs):
+        host = urlparse(request.url).netloc
+        with self.lock:
+            self.active[host] += 1
+            self.max_active[host] = max(self.max_active[host],
+                                        self.active[host])
+        time.sleep(0.01)
+        with self.lock:
+            self.active[host] -= 1
+        response = requests.Response()
+        response.status_code = 200
+        response.url = request.url
+        response._content = b'ok'
+        return response
+
+    def close(self):
+        pass
+
+
+class TestSession(unittest.TestCase):
+
+    """ Test the pooled session without hitting the network
+    """
+
+    def setUp(self):
+        FlakyHandler.requests = 0
+        self.server = BaseHTTPServer.HTTPServer(('127.0.0.1', 0),
+                                                FlakyHandler)
+        self.url = 'http://127.0.0.1:{0}/data'.format(
+            self.server.server_address[1])
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_retries(self):
+        """ Check that server errors are retried
+        """
+        FlakyHandler.failures = 2
+        importer = nvcl.NVCLImporter('CSIRO', retries=3, backoff_factor=0)
+        self.assertEqual(importer._get(self.url).text, u'ok')
+        self.assertEqual(FlakyHandler.requests, 3)
+
+        # Give up once we run out of retries
+        FlakyHandler.requests = 0
+        importer = nvcl.NVCLImporter('CSIRO', retries=1, backoff_factor=0)
+        self.assertRaises(requests.exceptions.RetryError,
+                          importer._get, self.url)
+        self.assertEqual(FlakyHandler.requests, 2)
+
+    def test_per_host_limit(self):
+        """ Check that concurrent requests to each host are limited
+        """
+        importer = nvcl.NVCLImporter('CSIRO', max_per_host=2)
+        importer.adapter = CountingAdapter()
+        urls = ['http://{0}.org/{1}'.format(host, idx)
+                for idx in range(10) for host in ('a', 'b')]
+        pool = ThreadPool(8)
+        try:
+            pool.map(importer._get, urls)
+        finally:
+            pool.terminate()
+        self.assertEqual(dict(importer.adapter.max_active),
+                         {'a.org': 2, 'b.org': 2})
+
+    def test_thread_sessions(self):
+        """ Check that each thread gets its own session
+        """
+        importer = nvcl.NVCLImporter('CSIRO')
+        self.assertTrue(importer.session is importer.session)
+        sessions = []
+        thread = threading.Thread(
+            target=lambda: sessions.append(importer.session))
+        thread.start()
+        thread.join()
+        self.assertFalse(sessions[0] is importer.session)
+        self.assertTrue(sessions[0].get_adapter(self.url)
+                        is importer.session.get_adapter(self.url))
+
+
+class TestGetBoreholes(unittest.TestCase):
+
+    """ Test concurrent borehole downloads without hitting the network
+    """
+
+    idents = ['hole_{0}'.format(idx) for idx in range(10)]
+
+    def setUp(self):
+        fname = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                             'geosciml', 'geo2test.xml')
+        with open(fname, 'rb') as fhandle:
+            self.content = fhandle.read()
+
+        # Serve the GeoSciML test document for every borehole, failing for
+        # any url containing 'bad'
+        self.importer = nvcl.NVCLImporter('CSIRO')
+        self.importer.get_borehole_idents_and_urls = \
+            lambda maxids=None: dict((ident, 'http://a.org/' + ident)
+                                     for ident in self.idents)
+        self.importer._get = self.get
+
+    def get(self, url, stream=False, **kwargs):
+        if 'bad' in url:
+            raise requests.ConnectionError('Failed to get ' + url)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = self.content
+        return response
+
+    def test_all_idents(self):
+        """ Check that every borehole is yielded
+        """
+        results = dict(self.importer.get_boreholes(get_analytes=False,
+                                                   max_workers=4))
+        self.assertEqual(sorted(results.keys()), sorted(self.idents))
+        for ident, borehole in results.items():
+            self.assertEqual(borehole.name, ident)
+
+    def test_errors(self):
+        """ Check that failures are skipped unless raise_error is set
+        """
+        idents = self.idents[:3] + ['bad_hole']
+        self.importer.get_borehole_idents_and_urls = \
+            lambda maxids=None: dict((ident, 'http://a.org/' + ident)
+                                     for ident in idents)
+        results = dict(self.importer.get_boreholes(
+            get_analytes=False, raise_error=False, max_workers=2))
+        self.assertEqual(sorted(results.keys()), sorted(idents))
+        self.assertTrue(results['bad_hole'] is None)
+        self.assertTrue(all(results[ident] is not None
+                            for ident in self.idents[:3]))
+        self.assertRaises(requests.ConnectionError, list,
+                          self.importer.get_boreholes(get_analytes=False))
+
+
 class TestNVCLImporter(unittest.TestCase):
 
     """ Test NVCLImporter class
@@ -95,3 +433,11 @@ class TestNVCLImporter(unittest.TestCase):
         """ Test some sample usage using the GSWA endpoint
         """
         self.importers['GSWA'].get_borehole('PDP2C', get_analytes=True)
+
+    def test_usage_4(self):
+        """ Test downloading several boreholes at once from the GSWA endpoint
+        """
+        importer = self.importers['GSWA']
+        bh_idents = importer.get_borehole_idents(maxids=3)
+        boreholes = dict(importer.get_boreholes(bh_idents, max_workers=2))
+        self.assertEqual(set(boreholes.keys()), set(bh_idents))
@@ -9,12 +9,18 @@
 """
 
 from datetime import datetime
+import io
 import os
 import unittest
 import requests
 
 import pysiss.borehole as pybh
 
+# The gml:ids of the boreholes in geo2test.xml
+BOREHOLE_IDS = ['gsml.borehole.150390', 'gsml.borehole.205822',
+                'gsml.borehole.BUGD049', 'gsml.borehole.EBSAE6',
+                'gsml.borehole.GSDD006']
+
 
 class SissTest(unittest.TestCase):
 
@@ -58,6 +64,69 @@ class SissTest(unittest.TestCase):
         self.assertEquals(1 * self.siss.unit_reg.meter,
                           bh.details.get('cored interval').property_type.units)
 
+    def test_iterparse(self):
+        """ The iterparse parser should give the same boreholes as the
+            default parser
+        """
+        for fname in ('geo2test.xml', 'geo3test.xml'):
+            xml_file = '{0}/geosciml/{1}'.format(self.test_dir, fname)
+            expected = self.siss.geosciml_to_borehole('test', xml_file)
+            generator = pybh.SISSBoreholeGenerator()
+            bh = generator.geosciml_to_borehole('test', xml_file,
+                                                parser='iterparse')
+            self.assertEquals(repr(expected.origin_position),
+                              repr(bh.origin_position))
+            self.assertEquals(sorted(expected.details.keys()),
+                              sorted(bh.details.keys()))
+            for key, detail in expected.details.items():
+                self.assertEquals(detail.values, bh.details[key].values)
+
+    def test_iter_boreholes(self):
+        """ Every Borehole element should generate a Borehole
+        """
+        xml_file = '{0}/geosciml/geo2test.xml'.format(self.test_dir)
+        for parser in ('etree', 'iterparse'):
+            boreholes = list(self.siss.iter_boreholes(xml_file,
+                                                      parser=parser))
+            self.assertEquals(BOREHOLE_IDS, [bh.name for bh in boreholes])
+            self.assertEquals('DMITRE',
+                              boreholes[0].details.get('driller').values)
+            self.assertTrue(self.siss.borehole is None)
+
+    def test_leading_comment(self):
+        """ Comments before the root element shouldn't upset iterparse
+        """
+        xml_file = '{0}/geosciml/geo3test.xml'.format(self.test_dir)
+        with open(xml_file, 'rb') as fhandle:
+            header, body = fhandle.read().split(b'\n', 1)
+        document = header + b'\n<!-- served by geoserver -->\n' + body
+        boreholes = list(self.siss.iter_boreholes(io.BytesIO(document)))
+        self.assertEquals(['M371484R308'], [bh.name for bh in boreholes])
+
+    def test_iter_boreholes_threaded(self):
+        """ One generator should be usable from several threads at once
+        """
+        from multiprocessing.pool import ThreadPool
+        xml_files = ['{0}/geosciml/{1}'.format(self.test_dir, fname)
+                     for fname in ('geo2test.xml', 'geo3test.xml') * 4]
+        pool = ThreadPool(4)
+        try:
+            results = pool.map(
+                lambda fname: [bh.name for bh
+                               in self.siss.iter_boreholes(fname)],
+                xml_files)
+        finally:
+            pool.terminate()
+        self.assertEquals(results[:2], [BOREHOLE_IDS, ['M371484R308']])
+        self.assertEquals(results[:2] * 4, results)
+
+    def test_unknown_parser(self):
+        """ Unknown parsers should raise a ValueError
+        """
+        xml_file = '{0}/geosciml/geo2test.xml'.format(self.test_dir)
+        self.assertRaises(ValueError, self.siss.geosciml_to_borehole,
+                          'test', xml_file, parser='sax')
+
     #
     # Carsten 30/07/2018: Depends on a web resource that not longer exists
     #
@@ -0,0 +1,160 @@
+""" file:   test_storage.py
+
+    description: Unit tests for saving and loading boreholes
+"""
+
+from pysiss import borehole as pybh
+from pysiss.borehole.borehole import OriginPosition
+from pysiss.utilities import parse_units
+from datetime import datetime
+import numpy
+import simplejson
+import os
+import shutil
+import tempfile
+import unittest
+
+DENSITY = pybh.PropertyType(name="d", long_name="density", units="g/cm3")
+ROCK_TYPE = pybh.PropertyType(name="rock", long_name="rock type",
+                              isnumeric=False)
+
+
+class StorageTest(unittest.TestCase):
+
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), 'archive')
+        self.borehole = pybh.Borehole('test')
+        self.borehole.add_detail('driller', 'Jim', None)
+        feature = self.borehole.add_feature('fault-1', 27.3)
+        feature.add_property(pybh.PropertyType('age'), 'last friday')
+        points = self.borehole.add_point_dataset(
+            'density', numpy.linspace(0, 10, 21))
+        points.add_property(DENSITY, numpy.linspace(2, 3, 21))
+        points.split_at_gaps()
+        intervals = self.borehole.add_interval_dataset(
+            'geology', [1., 2., 4.], [2., 3., 5.])
+        intervals.add_property(ROCK_TYPE, [['SA'], ['SL', 'CA'], ['SC']])
+        intervals.add_property(DENSITY, [2.5, 2.6, 2.7])
+
+    def tearDown(self):
+        shutil.rmtree(os.path.dirname(self.path))
+
+    def test_roundtrip(self):
+        """ Check that boreholes survive a round trip through an archive
+        """
+        pybh.save_borehole(self.path, self.borehole)
+        borehole = pybh.load_borehole(self.path)
+        self.assertEqual(borehole.name, 'test')
+        self.assertEqual(borehole.details['driller'].values, 'Jim')
+        self.assertEqual(
+            borehole.features['fault-1'].properties['age'].values,
+            'last friday')
+
+        points = borehole.point_datasets['density']
+        original = self.borehole.point_datasets['density']
+        self.assertTrue(numpy.allclose(points.depths, original.depths))
+        self.assertTrue(numpy.allclose(points.properties['d'].values,
+                                       original.properties['d'].values))
+        self.assertEqual(points.properties['d'].property_type.units, 'g/cm3')
+        self.assertEqual(points.gaps, original.gaps)
+
+        intervals = borehole.interval_datasets['geology']
+        self.assertTrue(numpy.allclose(intervals.to_depths, [2., 3., 5.]))
+        self.assertEqual(list(intervals.properties['rock'].values),
+                         [['SA'], ['SL', 'CA'], ['SC']])
+        self.assertTrue(numpy.allclose(intervals.properties['d'].values,
+                                       [2.5, 2.6, 2.7]))
+
+    def test_metadata(self):
+        """ Check that borehole metadata survives a round trip through the
+            JSON header
+        """
+        metres = parse_units('m')
+        elevation = pybh.PropertyType('elevation', units=metres)
+        self.borehole.origin_position = OriginPosition(
+            -31.5 * parse_units('degree'), 115.9 * parse_units('degree'),
+            12. * metres, elevation)
+        self.borehole.add_detail('date of drilling', datetime(1987, 6, 5))
+        self.borehole.add_detail('cored interval',
+                                 {'lower corner': 1. * metres,
+                                  'upper corner': 2. * metres})
+        self.borehole.add_detail('shape', [(1., 2.), (3., 4.)])
+        pybh.save_borehole(self.path, self.borehole)
+        with open(os.path.join(self.path, 'header.json')) as fhandle:
+            self.assertEqual(simplejson.load(fhandle)['version'],
+                             pybh.storage.ARCHIVE_VERSION)
+
+        borehole = pybh.load_borehole(self.path)
+        position = borehole.origin_position
+        self.assertEqual(position.latitude, -31.5 * parse_units('degree'))
+        self.assertEqual(position.elevation, 12. * metres)
+        self.assertEqual(position.property_type.units, metres)
+        self.assertEqual(borehole.details['date of drilling'].values,
+                         datetime(1987, 6, 5))
+        self.assertEqual(
+            borehole.details['cored interval'].values['upper corner'],
+            2. * metres)
+        self.assertEqual(borehole.details['shape'].values,
+                         [(1., 2.), (3., 4.)])
+        self.assertTrue(
+            borehole.point_datasets['density'].properties['d']
+            .property_type.isnumeric)
+        self.assertFalse(
+            borehole.interval_datasets['geology'].properties['rock']
+            .property_type.isnumeric)
+
+    def test_categorical_codes(self):
+        """ Check that categorical values are stored as codes into the
+            distinct values for each column
+        """
+        intervals = self.borehole.interval_datasets['geology']
+        intervals.add_property(pybh.PropertyType('colour', isnumeric=False),
+                               ['red', None, 'red'])
+        pybh.save_borehole(self.path, self.borehole)
+        directory = os.path.join(self.path, '0', '1')
+        codes = numpy.load(os.path.join(directory, 'categorical.npy'))
+        self.assertEqual(codes.tolist(), [[0, 0], [1, 1], [2, 0]])
+
+        intervals = pybh.load_borehole(self.path).interval_datasets['geology']
+        self.assertEqual(list(intervals.properties['colour'].values),
+                         ['red', None, 'red'])
+
+    def test_memory_mapped(self):
+        """ Check that numeric values are mapped rather than read
+        """
+        pybh.save_borehole(self.path, self.borehole)
+        dataset = pybh.load_borehole(self.path).point_datasets['density']
+        self.assertTrue(isinstance(dataset.columns.column('d').base,
+                                   numpy.memmap))
+        self.assertTrue(isinstance(dataset.depths.base, numpy.memmap))
+
+        # Read-only by default
+        values = dataset.properties['d'].values
+        self.assertRaises(ValueError, values.__setitem__, 0, 1.)
+
+    def test_archive(self):
+        """ Check that archives can hold many boreholes
+        """
+        other = pybh.Borehole('other')
+        other.add_point_dataset('empty', [1., 2., 3.])
+        pybh.save_boreholes(self.path, [self.borehole, other])
+        archive = pybh.BoreholeArchive(self.path)
+        self.assertEqual(archive.keys(), ['test', 'other'])
+        self.assertTrue('other' in archive)
+        self.assertEqual(archive['other'].point_datasets['empty'].size, 3)
+        self.assertRaises(ValueError, pybh.load_borehole, self.path)
+        self.assertEqual(pybh.load_borehole(self.path, 'test').name, 'test')
+
+    def test_overwrite(self):
+        """ Check that overwriting an archive doesn't leave stale boreholes
+        """
+        other = pybh.Borehole('other')
+        other.add_point_dataset('empty', [1., 2., 3.])
+        pybh.save_boreholes(self.path, [self.borehole, other])
+        pybh.save_borehole(self.path, other)
+        self.assertEqual(pybh.BoreholeArchive(self.path).keys(), ['other'])
+        self.assertEqual(sorted(os.listdir(self.path)), ['0', 'header.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,250 @@
+""" file:   test_unmarshal.py
+
+    description: Tests for unmarshalling GeoSciML documents
+"""
+
+import bz2
+import gzip
+import io
+import numpy
+import os
+import shutil
+import tempfile
+import unittest
+
+from lxml import etree
+from pysiss.metadata import Metadata
+from pysiss.vocabulary.namespaces import NamespaceRegistry
+from pysiss.vocabulary.unmarshal import unmarshal_all, iter_unmarshal
+from pysiss.vocabulary.gml.unmarshallers import position
+from pysiss.vocabulary.gsml.unmarshallers import cgi_termrange
+
+NAMESPACES = NamespaceRegistry()
+GML_NS = 'xmlns:gml="http://www.opengis.net/gml"'
+
+FEATURE = """
+    <gml:featureMember>
+        <gsml:MappedFeature gml:id="mf.{0}">
+            <gsml:specification>
+                <gsml:GeologicUnit gml:id="gu.{0}">
+                    <gml:description>Unit {0}</gml:description>
+                </gsml:GeologicUnit>
+            </gsml:specification>
+            <gsml:shape>
+                <gml:Polygon srsName="EPSG:4326">
+                    <gml:outerBoundaryIs>
+                        <gml:LinearRing>
+                            <gml:posList>
+                                {0} 0
+                                {0} 1
+                                1{0} 1
+                                {0} 0
+                            </gml:posList>
+                        </gml:LinearRing>
+                    </gml:outerBoundaryIs>
+                </gml:Polygon>
+            </gsml:shape>
+        </gsml:MappedFeature>
+    </gml:featureMember>"""
+
+DOCUMENT = """<?xml version="1.0" encoding="UTF-8"?>
+<wfs:FeatureCollection xmlns:wfs="http://www.opengis.net/wfs"
+    xmlns:gml="http://www.opengis.net/gml"
+    xmlns:gsml="urn:cgi:xmlns:CGI:GeoSciML:2.0">{0}
+</wfs:FeatureCollection>
+"""
+
+
+def make_document(nfeatures):
+    """ Make a feature collection with the given number of MappedFeatures
+    """
+    return DOCUMENT.format(
+        ''.join(FEATURE.format(idx) for idx in range(nfeatures)))
+
+
+class TestIterUnmarshal(unittest.TestCase):
+
+    def setUp(self):
+        self.document = make_document(5).encode('utf-8')
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def check_features(self, features):
+        """ Check that we have the features in self.document
+        """
+        self.assertEqual([f.ident for f in features],
+                         ['mf.{0}'.format(idx) for idx in range(5)])
+        for idx, feature in enumerate(features):
+            self.assertEqual(feature.type, 'gsml:GeologicUnit')
+            self.assertEqual(feature.projection, 'EPSG:4326')
+            self.assertEqual(feature.shape.bounds, (idx, 0, 10 + idx, 1))
+
+            # Metadata trees shouldn't be cleared by the parser
+            self.assertEqual(
+                feature.metadata.tree[0].text, 'Unit {0}'.format(idx))
+
+    def test_file_like(self):
+        """ Check unmarshalling from file-like objects
+        """
+        features = iter_unmarshal(io.BytesIO(self.document))
+        self.assertFalse(isinstance(features, list))
+        self.check_features(list(features))
+
+    def test_filename(self):
+        """ Check unmarshalling from files, and that unmarshal_all still
+            works
+        """
+        fname = os.path.join(self.directory, 'features.xml')
+        with open(fname, 'wb') as fhandle:
+            fhandle.write(self.document)
+        self.check_features(list(iter_unmarshal(fname)))
+        self.check_features(unmarshal_all(fname))
+
+    def test_compressed(self):
+        """ Check that compressed streams are decompressed
+        """
+        fname = os.path.join(self.directory, 'features.xml.gz')
+        fhandle = gzip.open(fname, 'wb')
+        fhandle.write(self.document)
+        fhandle.close()
+        self.check_features(list(iter_unmarshal(fname)))
+
+        stream = io.BytesIO(bz2.compress(self.document))
+        self.check_features(list(iter_unmarshal(stream)))
+
+    def test_document_freed(self):
+        """ Check that processed elements are dropped from the document
+        """
+        stream = io.BytesIO(make_document(50).encode('utf-8'))
+        for idx, feature in enumerate(iter_unmarshal(stream)):
+            # The parser may have read ahead, but the features before this
+            # one should have been dropped
+            root = feature.metadata.tree.getroottree().getroot()
+            remaining = [int(elem.get('{http://www.opengis.net/gml}id')[3:])
+                         for elem in root.iterfind('.//gsml:MappedFeature',
+                                                   namespaces=NAMESPACES)]
+            self.assertEqual(min(remaining), idx)
+        self.assertEqual(idx, 49)
+
+    def test_processes(self):
+        """ Check unmarshalling with a pool of worker processes
+        """
+        Metadata.registry.clear()
+        features = list(iter_unmarshal(io.BytesIO(self.document),
+                                       processes=2, batchsize=2))
+        self.check_features(features)
+
+        # Metadata should be registered in this process
+        self.assertEqual(sorted(Metadata.registry.keys()),
+                         ['gu.{0}'.format(idx) for idx in range(5)])
+
+        # Other tags just come back as they are
+        descriptions = unmarshal_all(io.BytesIO(self.document),
+                                     tag='gml:description', processes=2)
+        self.assertEqual(descriptions,
+                         ['Unit {0}'.format(idx) for idx in range(5)])
+
+    def test_lazy_shapes(self):
+        """ Check that shapes are only built when they're needed
+        """
+        feature = next(iter_unmarshal(io.BytesIO(self.document)))
+        self.assertTrue(feature._shape is None)
+        self.assertEqual(feature.bounds, (0., 0., 10., 1.))
+        self.assertTrue('mf.0' in repr(feature))
+        self.assertTrue(feature._shape is None)
+
+        # Building the shape
+        self.assertEqual(feature.shape.bounds, feature.bounds)
+        self.assertTrue(feature.shape.contains(feature.centroid))
+        self.assertTrue(feature._coordinates is None)
+
+    def test_leading_comment(self):
+        """ Check that comments before the root element are left alone
+        """
+        header, body = self.document.split(b'\n', 1)
+        document = header + b'\n<!-- c -->\n' + body
+        self.check_features(list(iter_unmarshal(io.BytesIO(document))))
+        self.assertEqual(
+            unmarshal_all(io.BytesIO(document), tag='gml:description'),
+            ['Unit {0}'.format(idx) for idx in range(5)])
+
+    def test_syntax_error(self):
+        """ Check that syntax errors are raised by iter_unmarshal
+        """
+        stream = io.BytesIO(self.document[:-500])
+        features = iter_unmarshal(stream)
+        self.assertEqual(next(features).ident, 'mf.0')
+        self.assertRaises(etree.XMLSyntaxError, list, features)
+
+
+class TestPosition(unittest.TestCase):
+
+    def parse(self, xml):
+        """ Parse a GML position element
+        """
+        return position(etree.fromstring(
+            '<wrapper {0}>{1}</wrapper>'.format(GML_NS, xml))[0])
+
+    def test_layouts(self):
+        """ Check that positions are parsed however they are laid out
+        """
+        expected = numpy.array([[0., 1.], [2., 3.], [4.5, -5.]])
+        for xml in ('<gml:posList>0 1 2 3 4.5 -5</gml:posList>',
+                    '<gml:posList>\n  0 1\n  2 3\n  4.5 -5\n</gml:posList>',
+                    '<gml:coordinates>0,1 2,3 4.5,-5</gml:coordinates>',
+                    '<gml:coordinates cs=" " ts=";">0 1;2 3;4.5 -5'
+                    '</gml:coordinates>'):
+            positions = self.parse(xml)
+            self.assertEqual(positions.shape, (3, 2))
+            self.assertTrue(numpy.allclose(positions, expected))
+
+    def test_dimension(self):
+        """ Check that srsDimension and count are respected
+        """
+        positions = self.parse('<gml:posList srsDimension="3" count="2">'
+                               '0 1 2 3 4 5</gml:posList>')
+        self.assertEqual(positions.shape, (2, 3))
+        self.assertEqual(self.parse('<gml:pos>1 2 3</gml:pos>').shape, (1, 3))
+        self.assertEqual(
+            self.parse('<gml:coordinates>1,2,3</gml:coordinates>').shape,
+            (1, 3))
+
+        # Dimensions are inherited from the geometry
+        elem = etree.fromstring(
+            '<gml:LineString {0} srsDimension="3"><gml:posList>0 1 2 3 4 5'
+            '</gml:posList></gml:LineString>'.format(GML_NS))
+        self.assertEqual(position(elem[0]).shape, (2, 3))
+
+    def test_bad_positions(self):
+        """ Check that inconsistent positions raise errors
+        """
+        self.assertTrue(self.parse('<gml:posList>  </gml:posList>') is None)
+        self.assertRaises(ValueError, self.parse,
+                          '<gml:posList>0 1 2</gml:posList>')
+        self.assertRaises(ValueError, self.parse,
+                          '<gml:posList count="3">0 1 2 3</gml:posList>')
+        for bad in ('0 1 2 3 x 5 6 7', '0 1 2 3 4 5 6 1e'):
+            self.assertRaises(ValueError, self.parse,
+                              '<gml:posList>{0}</gml:posList>'.format(bad))
+
+
+class TestTermRange(unittest.TestCase):
+
+    def test_termrange(self):
+        """ Check that term values are pulled out of ranges
+        """
+        elem = etree.fromstring(
+            '<gsml:CGI_TermRange xmlns:gsml="urn:cgi:xmlns:CGI:GeoSciML:2.0">'
+            '<gsml:lower><gsml:CGI_TermValue><gsml:value>Early Permian'
+            '</gsml:value></gsml:CGI_TermValue></gsml:lower>'
+            '<gsml:upper><gsml:CGI_TermValue><gsml:value>Late Permian'
+            '</gsml:value></gsml:CGI_TermValue></gsml:upper>'
+            '</gsml:CGI_TermRange>')
+        self.assertEqual(cgi_termrange(elem),
+                         ['Early Permian', 'Late Permian'])
+
+
+if __name__ == '__main__':
+    unittest.main()
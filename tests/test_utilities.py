@@ -8,7 +8,8 @@
 
 import unittest
 import numpy
-from pysiss.utilities import mask_all_nans
+from pysiss.utilities import mask_all_nans, get_unit_registry, parse_units
+import pysiss.borehole as pybh
 
 
 class TestMaskNans(unittest.TestCase):
@@ -32,3 +33,22 @@ class TestMaskNans(unittest.TestCase):
         self.assertRaises(ValueError, mask_all_nans,
                           "i'm a string",
                           range(10))
+
+
+class TestUnits(unittest.TestCase):
+
+    """ Testing the shared unit registry
+    """
+
+    def test_shared(self):
+        "Generators should share a single registry"
+        self.assertTrue(get_unit_registry() is get_unit_registry())
+        self.assertTrue(pybh.SISSBoreholeGenerator().unit_reg
+                        is get_unit_registry())
+
+    def test_parse_units(self):
+        "Parsed units should be cached and combine with registry units"
+        metres = parse_units('m')
+        self.assertTrue(metres is parse_units('m'))
+        length = 2 * metres + 1 * get_unit_registry().meter
+        self.assertEqual(length.magnitude, 3)
@@ -1,6 +1,8 @@
 import unittest
+from lxml import etree
 from pysiss.vocabulary.namespaces import split_namespace, \
-    shorten_namespace, expand_namespace
+    shorten_namespace, expand_namespace, add_namespace, xpath, \
+    NamespaceRegistry
 
 
 class TestXMLNamespaces(unittest.TestCase):
@@ -39,6 +41,25 @@ class TestXMLNamespaces(unittest.TestCase):
             expand_namespace('gsml:MappedFeature', form='rdf'),
             'urn:cgi:xmlns:CGI:GeoSciML:2.0:MappedFeature')
 
+    def test_xpath(self):
+        """ Check that compiled XPaths are cached until the namespaces change
+        """
+        elem = etree.fromstring(
+            '<a xmlns:gml="http://www.opengis.net/gml" '
+            'xmlns:t="urn:test"><gml:b>1</gml:b><t:c>2</t:c></a>')
+        self.assertTrue(xpath('./gml:b') is xpath('./gml:b'))
+        self.assertEqual(xpath('./gml:b/text()')(elem), ['1'])
+
+        # Unknown prefixes fail until they're registered
+        self.assertRaises(etree.XPathEvalError, xpath('./test:c/text()'), elem)
+        compiled = xpath('./gml:b')
+        add_namespace('test', 'urn:test')
+        try:
+            self.assertFalse(compiled is xpath('./gml:b'))
+            self.assertEqual(xpath('./test:c/text()')(elem), ['2'])
+        finally:
+            del NamespaceRegistry()['test']
+
 
 if __name__ == '__main__':
     unittest.main()